@@ -1,25 +1,55 @@
-import autogen
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
-from autogen_bird.utils import get_table_schema, validate_sql
-from autogen_bird.table_aware import generate_table_aware_prompt, enhance_query_with_ta
+from autogen_bird.utils import get_table_schema, check_sql
+from autogen_bird.self_consistency import extract_sql, vote
+from autogen_bird.chat_context import ChatContext, run_role
+from autogen_bird.prompt_builder import PromptBuilder, PromptCacheStats
+from autogen_bird.join_graph import join_graph, join_path_text
+from autogen_bird.tracing import span, trace_agent
+
+# Prompt variants cycled through when sampling self-consistency candidates
+CANDIDATE_PROMPT_VARIANTS = [
+    "Write the SQL query that answers the question.",
+    "Think about which tables and joins are required, then write the SQL query that answers the question.",
+    "Identify the columns to select and the filters to apply, then write the SQL query that answers the question.",
+]
+
+# Roles run in order when the compact context pipeline is used
+PIPELINE_ROLES = ["schema_analyzer", "query_planner", "query_generator", "query_validator", "final_reviewer"]
 
 class AdvancedAgentSystem:
     """An advanced multi-agent system that incorporates Table-Aware techniques."""
     
-    def __init__(self, api_key: str, model: str, sql_dialect: str):
+    def __init__(self, api_key: str, model: str, sql_dialect: str,
+                 compact_context: bool = False, max_context_tokens: int = 1500,
+                 base_url: Optional[str] = None, join_hints: bool = True):
         self.api_key = api_key
+        self.base_url = base_url
         self.model = model
         self.sql_dialect = sql_dialect
-        self.agents = self._create_agents()
-    
-    def _create_agents(self):
-        # Configure agents with OpenAI API
-        config_list = [
+        self.compact_context = compact_context
+        self.max_context_tokens = max_context_tokens
+        self.join_hints = join_hints
+        self.db_path = None
+        # Callers pass the schema text itself, so the prefix is memoized per schema
+        self.prompt_builder = PromptBuilder(lambda db_schema: db_schema, system_text="Database Schema:")
+        self.cache_stats = PromptCacheStats()
+        self.config_list = [
             {
                 "model": self.model,
                 "api_key": self.api_key,
             }
         ]
+        if self.base_url:
+            self.config_list[0]["base_url"] = self.base_url
+        self.agents = self._create_agents()
+    
+    def _create_agents(self):
+        # autogen takes about a second to import, so it is loaded only when agents are built
+        import autogen
+
+        # Configure agents with OpenAI API
+        config_list = self.config_list
         
         # Create agents with enhanced prompts
         coordinator = autogen.AssistantAgent(
@@ -118,7 +148,22 @@ class AdvancedAgentSystem:
             llm_config={"config_list": config_list},
         )
         
-        return {
+        # Let the schema analyzer look up join paths instead of working them out itself. Only the
+        # group chat has an executor for the call; the compact pipeline fills in the join path
+        # from the join graph and needs the analyzer to answer in text
+        if not self.compact_context:
+            def find_join_path(tables: str) -> str:
+                return join_path_text(self.db_path, tables, self.sql_dialect)
+            
+            autogen.register_function(
+                find_join_path,
+                caller=schema_analyzer,
+                executor=coordinator,
+                name="find_join_path",
+                description="Return the JOIN clause that connects the given comma-separated tables.",
+            )
+        
+        agents = {
             "coordinator": coordinator,
             "schema_analyzer": schema_analyzer,
             "query_planner": query_planner,
@@ -126,19 +171,26 @@ class AdvancedAgentSystem:
             "query_validator": query_validator,
             "final_reviewer": final_reviewer
         }
+        # Every turn of the group chat and every LLM request gets a span when tracing is on
+        for agent in agents.values():
+            trace_agent(agent)
+        return agents
     
-    def generate_query(self, question: str, db_schema: str, evidence: Optional[str] = None) -> str:
+    def generate_query(self, question: str, db_schema: str, evidence: Optional[str] = None,
+                       db_path: Optional[str] = None) -> str:
         """Generate a SQL query using the multi-agent system."""
+        self.db_path = db_path
         
-        # Prepare the initial message
-        initial_message = f"""Question: {question}
-
-Database Schema:
-{db_schema}
-
-{f'Additional Evidence:\n{evidence}' if evidence else ''}
-
-Please analyze this request and generate a SQL query in {self.sql_dialect}."""
+        if self.compact_context:
+            return self._generate_query_compact(question, db_schema, evidence, db_path)
+        
+        # Prepare the initial message: static schema prefix first, question-specific parts after
+        initial_message = self.prompt_builder.build(
+            db_schema,
+            f"Question: {question}",
+            f"Additional Evidence:\n{evidence}" if evidence else "",
+            f"Please analyze this request and generate a SQL query in {self.sql_dialect}.",
+        )
         
         # Start the conversation with the coordinator
         chat_messages = self.agents["coordinator"].initiate_chat(
@@ -147,4 +199,97 @@ Please analyze this request and generate a SQL query in {self.sql_dialect}."""
         )
         
         # Return the final SQL query from the last message
-        return chat_messages[-1]["content"]
\ No newline at end of file
+        return chat_messages[-1]["content"]
+    
+    def _generate_query_compact(self, question: str, db_schema: str, evidence: Optional[str] = None,
+                                db_path: Optional[str] = None) -> str:
+        """Run the agents in sequence, forwarding only the context each role needs."""
+        graph = join_graph(db_path) if self.join_hints and db_path and self.sql_dialect == "SQLite" else None
+        context = ChatContext(
+            question, self.prompt_builder.prefix(db_schema), evidence,
+            max_history_tokens=self.max_context_tokens, join_graph=graph
+        )
+        for role in PIPELINE_ROLES:
+            if role == "query_planner" and context.artifacts.get("join_path"):
+                # The join path is already known, which is most of what the planner works out
+                continue
+            if role == "query_validator" and db_path:
+                context.artifacts["execution_check"] = check_sql(
+                    context.artifacts.get("draft_sql", ""), db_path, self.sql_dialect
+                )
+            run_role(self.agents[role], context, role)
+        return context.final_sql
+    
+    def _generate_candidate(self, client, question: str, db_schema: str, evidence: Optional[str],
+                            variant: int, temperature: float) -> str:
+        """Request a single SQL candidate in one LLM round trip; API errors are raised."""
+        instruction = CANDIDATE_PROMPT_VARIANTS[variant % len(CANDIDATE_PROMPT_VARIANTS)]
+        prompt = self.prompt_builder.build(
+            db_schema,
+            f"Question: {question}",
+            f"Additional Evidence:\n{evidence}" if evidence else "",
+            f"{instruction}\nUse valid {self.sql_dialect} syntax and return only the SQL query.",
+        )
+        
+        with span("llm.candidate", variant=variant, temperature=temperature) as sp:
+            try:
+                response = client.create(
+                    messages=[
+                        {"role": "system", "content": f"You are a SQL expert specialized in {self.sql_dialect}."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=temperature,
+                    cache_seed=None,
+                )
+            except Exception as e:
+                sp.set(error_message=str(e))
+                raise
+            cached_tokens = self.cache_stats.record(response.usage)
+            sp.set(
+                prompt_tokens=response.usage.prompt_tokens,
+                completion_tokens=response.usage.completion_tokens,
+                cached_tokens=cached_tokens,
+            )
+        return extract_sql(client.extract_text_or_completion_object(response)[0])
+    
+    def generate_query_self_consistency(self, question: str, db_schema: str, db_path: str,
+                                        evidence: Optional[str] = None, num_candidates: int = 5,
+                                        temperature: float = 0.8) -> str:
+        """Generate a SQL query by sampling candidates concurrently and voting on their results.
+        
+        All candidates are requested at once, so latency is roughly one LLM round trip plus
+        the execution time of the candidates instead of the full sequential agent chain.
+        A candidate whose request fails takes no part in the vote; if every request fails,
+        the first error is raised instead of returning an empty query.
+        """
+        if num_candidates < 1:
+            raise ValueError(f"num_candidates must be at least 1, got {num_candidates}")
+        import autogen
+
+        client = autogen.OpenAIWrapper(config_list=self.config_list)
+        # Keep one greedy candidate so the vote never does worse than a single sample
+        temperatures = [0.0] + [temperature] * (num_candidates - 1)
+        
+        def request(i: int):
+            try:
+                return self._generate_candidate(client, question, db_schema, evidence, i, temperatures[i]), None
+            except Exception as e:
+                return "", e
+        
+        with ThreadPoolExecutor(max_workers=num_candidates) as executor:
+            results = list(executor.map(request, range(num_candidates)))
+        candidates = [sql for sql, _ in results]
+        errors = [error for _, error in results if error is not None]
+        if len(errors) == num_candidates:
+            # Usually a bad key, model name or endpoint; every question would come back empty
+            raise errors[0]
+        
+        if self.sql_dialect != "SQLite":
+            # Only SQLite databases can be executed locally; fall back to textual majority
+            non_empty = [sql for sql in candidates if sql]
+            return max(non_empty, key=non_empty.count) if non_empty else ""
+        
+        with span("self_consistency.vote", candidates=len(candidates), failed_requests=len(errors)) as sp:
+            result = vote(candidates, db_path)
+            sp.set(votes=result["votes"])
+        return result["sql"]
@@ -1,15 +1,41 @@
-import autogen
 from typing import Dict, List, Any, Optional
-from autogen_bird.utils import get_table_schema, validate_sql
+from autogen_bird.utils import get_table_schema, check_sql
+from autogen_bird.chat_context import ChatContext, run_role
+from autogen_bird.prompt_builder import PromptBuilder
+from autogen_bird.join_graph import join_graph, join_path_text
+from autogen_bird.tracing import trace_agent
+
+# Roles run in order when the compact context pipeline is used
+PIPELINE_ROLES = ["schema_analyzer", "query_generator", "query_validator", "final_reviewer"]
 
 class AgentSystem:
-    def __init__(self, api_key: str, model: str, sql_dialect: str):
+    def __init__(self, api_key: str, model: str, sql_dialect: str,
+                 compact_context: bool = False, max_context_tokens: int = 1500,
+                 base_url: Optional[str] = None, schema_format: str = "table",
+                 schema_token_budget: Optional[int] = None, join_hints: bool = True):
         self.api_key = api_key
+        self.base_url = base_url
         self.model = model
         self.sql_dialect = sql_dialect
+        self.compact_context = compact_context
+        self.max_context_tokens = max_context_tokens
+        self.schema_format = schema_format
+        self.schema_token_budget = schema_token_budget
+        self.join_hints = join_hints
+        self.db_path = None
+        # Schema prefixes are memoized per database and always lead the prompt
+        self.prompt_builder = PromptBuilder(
+            lambda db_path: get_table_schema(
+                db_path, self.sql_dialect, self.schema_format, self.schema_token_budget
+            ),
+            system_text="DATABASE SCHEMA:",
+        )
         self.agents = self._create_agents()
         
     def _create_agents(self):
+        # autogen takes about a second to import, so it is loaded only when agents are built
+        import autogen
+
         # Configure agents with OpenAI API
         config_list = [
             {
@@ -17,6 +43,8 @@ class AgentSystem:
                 "api_key": self.api_key,
             }
         ]
+        if self.base_url:
+            config_list[0]["base_url"] = self.base_url
         
         # Create agents
         coordinator = autogen.AssistantAgent(
@@ -70,7 +98,19 @@ class AgentSystem:
             is_termination_msg=lambda msg: "FINAL SQL QUERY:" in msg["content"],
         )
         
-        return {
+        # The coordinator can ask for join paths; the user proxy runs the lookup
+        def find_join_path(tables: str) -> str:
+            return join_path_text(self.db_path, tables, self.sql_dialect)
+        
+        autogen.register_function(
+            find_join_path,
+            caller=coordinator,
+            executor=user_proxy,
+            name="find_join_path",
+            description="Return the JOIN clause that connects the given comma-separated tables.",
+        )
+        
+        agents = {
             "coordinator": coordinator,
             "schema_analyzer": schema_analyzer,
             "query_generator": query_generator,
@@ -78,27 +118,24 @@ class AgentSystem:
             "final_reviewer": final_reviewer,
             "user_proxy": user_proxy
         }
+        # Every turn of the group chat and every LLM request gets a span when tracing is on
+        for agent in agents.values():
+            trace_agent(agent)
+        return agents
     
     def generate_sql(self, question: str, db_path: str, evidence: str = "") -> str:
         """Generate SQL query using the multi-agent system."""
-        # Get database schema
-        schema = get_table_schema(db_path, self.sql_dialect)
+        self.db_path = db_path
+        if self.compact_context:
+            return self._generate_sql_compact(question, db_path, evidence)
         
-        # Prepare initial message
-        initial_message = f"""
-        I need to generate a SQL query for the following question:
-        
-        QUESTION: {question}
-        
-        DATABASE SCHEMA:
-        {schema}
-        """
-        
-        if evidence:
-            initial_message += f"""
-            EXTERNAL KNOWLEDGE EVIDENCE:
-            {evidence}
-            """
+        # Prepare initial message: static schema prefix first, question-specific parts after
+        initial_message = self.prompt_builder.build(
+            db_path,
+            f"QUESTION: {question}",
+            f"EXTERNAL KNOWLEDGE EVIDENCE:\n{evidence}" if evidence else "",
+            "I need to generate a SQL query for the question above.",
+        )
         
         # Start the conversation
         self.agents["user_proxy"].initiate_chat(
@@ -114,7 +151,27 @@ class AgentSystem:
         
         # If no final SQL query was found, return an empty string
         return ""
+    
+    def _generate_sql_compact(self, question: str, db_path: str, evidence: str = "") -> str:
+        """Run the agents in sequence, forwarding only the context each role needs."""
+        schema = self.prompt_builder.prefix(db_path)
+        graph = join_graph(db_path) if self.join_hints and self.sql_dialect == "SQLite" else None
+        context = ChatContext(
+            question, schema, evidence, max_history_tokens=self.max_context_tokens, join_graph=graph
+        )
+        for role in PIPELINE_ROLES:
+            if role == "query_validator":
+                context.artifacts["execution_check"] = check_sql(
+                    context.artifacts.get("draft_sql", ""), db_path, self.sql_dialect
+                )
+            run_role(self.agents[role], context, role)
+        return context.final_sql
 
-def create_agent_system(api_key: str, model: str, sql_dialect: str) -> AgentSystem:
+def create_agent_system(api_key: str, model: str, sql_dialect: str,
+                        base_url: Optional[str] = None, schema_format: str = "table",
+                        schema_token_budget: Optional[int] = None,
+                        compact_context: bool = False) -> AgentSystem:
     """Create and return an agent system."""
-    return AgentSystem(api_key, model, sql_dialect)
\ No newline at end of file
+    return AgentSystem(api_key, model, sql_dialect, base_url=base_url,
+                       schema_format=schema_format, schema_token_budget=schema_token_budget,
+                       compact_context=compact_context)
\ No newline at end of file
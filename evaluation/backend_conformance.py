@@ -0,0 +1,234 @@
+"""
+Conformance checks for the database backends.
+Every dialect backend must return the same rows, reuse pooled connections, survive
+failed queries, drop connections left in an unknown state, stop results at their caps,
+work from several threads and start with fresh connections in forked workers.
+SQLite-backed dialects must also serve the same rows from read-only in-memory replicas.
+By default each dialect is checked
+on the SQLite stand-in (BIRD_<DIALECT>_BACKEND=sqlite) against a small fixture database;
+pass --live to check the configured MySQL and PostgreSQL servers instead.
+
+Usage:
+    python -m evaluation.backend_conformance
+    python -m evaluation.backend_conformance --dialect MySQL --live
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+import tempfile
+import threading
+import multiprocessing as mp
+from typing import Callable, List, Optional, Tuple
+
+from evaluation import backends
+from evaluation.backends import get_backend, close_backends, ResultTooLarge
+
+FIXTURE = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, age INTEGER)",
+    "INSERT INTO users VALUES (1, 'ann', 31), (2, 'bob', 17), (3, 'cy', 45)",
+]
+FIXTURE_QUERY = "SELECT id, name FROM users WHERE age > 18 ORDER BY id"
+FIXTURE_ROWS = [(1, "ann"), (3, "cy")]
+LIVE_QUERY = "SELECT 1"
+LIVE_ROWS = [(1,)]
+
+def make_fixture(directory: str) -> str:
+    db_path = os.path.join(directory, "conformance.sqlite")
+    conn = sqlite3.connect(db_path)
+    for statement in FIXTURE:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+    return db_path
+
+def _child_stats(dialect: str, db_path: str, query: str, queue) -> None:
+    backend = get_backend(dialect)
+    backend.execute(query, db_path)
+    queue.put((os.getpid(), backend.stats()["created"]))
+
+class Checks:
+    def __init__(self, dialect: str, db_path: str, query: str, expected: List[tuple], fixture: bool):
+        self.dialect = dialect
+        self.db_path = db_path
+        self.query = query
+        self.expected = expected
+        self.fixture = fixture
+
+    def rows(self) -> None:
+        rows = [tuple(row) for row in get_backend(self.dialect).execute(self.query, self.db_path)]
+        assert rows == self.expected, f"expected {self.expected}, got {rows}"
+
+    def reuse(self) -> None:
+        backend = get_backend(self.dialect)
+        with backend.connection(self.db_path) as first:
+            pass
+        with backend.connection(self.db_path) as second:
+            pass
+        assert first is second, "connection was not reused"
+
+    def query_error(self) -> None:
+        backend = get_backend(self.dialect)
+        with backend.connection(self.db_path) as before:
+            pass
+        try:
+            backend.execute("SELECT no_such_column FROM no_such_table", self.db_path)
+        except backend.errors():
+            pass
+        else:
+            raise AssertionError("invalid query did not raise")
+        with backend.connection(self.db_path) as after:
+            pass
+        assert before is after, "connection was dropped after a query error"
+        self.rows()
+
+    def interrupted(self) -> None:
+        backend = get_backend(self.dialect)
+        try:
+            with backend.connection(self.db_path) as abandoned:
+                raise KeyboardInterrupt
+        except KeyboardInterrupt:
+            pass
+        with backend.connection(self.db_path) as fresh:
+            pass
+        assert abandoned is not fresh, "interrupted connection went back to the pool"
+        self.rows()
+
+    def limits(self) -> None:
+        backend = get_backend(self.dialect)
+        with backend.connection(self.db_path) as before:
+            pass
+        try:
+            backend.fetch(self.query, self.db_path, max_rows=0, batch_size=1)
+        except ResultTooLarge:
+            pass
+        else:
+            raise AssertionError("row cap was not enforced")
+        with backend.connection(self.db_path) as after:
+            pass
+        assert before is not after, "connection stopped at the cap went back to the pool"
+        self.rows()
+
+    def probe(self) -> None:
+        backend = get_backend(self.dialect)
+        backend.probe(self.query, self.db_path)
+        try:
+            backend.probe("SELECT no_such_column FROM no_such_table", self.db_path)
+        except backend.errors():
+            pass
+        else:
+            raise AssertionError("invalid query did not raise")
+        self.rows()
+
+    def threads(self) -> None:
+        backend = get_backend(self.dialect)
+        failures = []
+
+        def work():
+            try:
+                for _ in range(20):
+                    rows = [tuple(row) for row in backend.execute(self.query, self.db_path)]
+                    if rows != self.expected:
+                        failures.append(rows)
+            except Exception as e:
+                failures.append(e)
+
+        workers = [threading.Thread(target=work) for _ in range(backend.pool_size * 2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert not failures, f"{len(failures)} failures, first: {failures[0]!r}"
+        idle = len(backend.pool(self.db_path)._idle)
+        assert idle <= backend.pool_size, f"{idle} idle connections kept, pool size is {backend.pool_size}"
+
+    def fork(self) -> None:
+        if "fork" not in mp.get_all_start_methods():
+            return
+        get_backend(self.dialect).execute(self.query, self.db_path)
+        ctx = mp.get_context("fork")
+        queue = ctx.Queue()
+        child = ctx.Process(target=_child_stats, args=(self.dialect, self.db_path, self.query, queue))
+        child.start()
+        pid, created = queue.get(timeout=60)
+        child.join()
+        assert pid != os.getpid() and created == 1, "forked worker reused the parent's connections"
+
+    def columns(self) -> None:
+        if not self.fixture:
+            return
+        columns = get_backend(self.dialect).columns("users", self.db_path)
+        names = [(name, pk) for name, _, _, pk in columns]
+        assert names == [("id", True), ("name", False), ("age", False)], f"got {columns}"
+
+    def replicas(self) -> None:
+        backend = get_backend(self.dialect)
+        if not isinstance(backend, backends.SQLiteBackend):
+            return
+        replica_backend = backends.SQLiteBackend({"replica_mb": 16})
+        try:
+            assert replica_backend.load_replicas([self.db_path]), "fixture was not replicated"
+            rows = [tuple(row) for row in replica_backend.execute(self.query, self.db_path)]
+            assert rows == self.expected, f"replica returned {rows}"
+            try:
+                replica_backend.execute("DELETE FROM users", self.db_path)
+            except sqlite3.Error:
+                pass
+            else:
+                raise AssertionError("replica accepted a write")
+            rows = [tuple(row) for row in replica_backend.execute(self.query, self.db_path)]
+            assert rows == self.expected, "replica changed after a failed write"
+        finally:
+            replica_backend.close()
+
+    def evaluator(self) -> None:
+        from evaluation.evaluation_utils import execute_sql
+
+        res = execute_sql(self.query, self.query, self.db_path, self.dialect,
+                          lambda pred, gold: int(set(pred) == set(gold)))
+        assert res == 1, "evaluation execute_sql disagreed with itself"
+
+    def run(self) -> List[Tuple[str, Optional[str]]]:
+        results = []
+        for name in ("rows", "reuse", "query_error", "interrupted", "limits", "probe", "threads", "fork", "columns",
+                     "replicas", "evaluator"):
+            check: Callable[[], None] = getattr(self, name)
+            try:
+                check()
+                results.append((name, None))
+            except Exception as e:
+                results.append((name, f"{type(e).__name__}: {e}"))
+        return results
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="Check database backends against the backend contract")
+    args_parser.add_argument("--dialect", type=str, nargs="*", default=backends.DIALECTS)
+    args_parser.add_argument("--live", action="store_true",
+                             help="check the configured servers instead of the SQLite stand-in")
+    args_parser.add_argument("--db_path", type=str, default=None,
+                             help="SQLite file passed to the backend (live runs)")
+    args = args_parser.parse_args()
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        fixture_path = make_fixture(directory)
+        for dialect in args.dialect:
+            live = args.live and dialect != "SQLite"
+            if not live:
+                os.environ[f"BIRD_{dialect.upper()}_BACKEND"] = "sqlite"
+            close_backends()
+            checks = Checks(
+                dialect,
+                args.db_path if live else fixture_path,
+                LIVE_QUERY if live else FIXTURE_QUERY,
+                LIVE_ROWS if live else FIXTURE_ROWS,
+                fixture=not live,
+            )
+            backend_name = type(get_backend(dialect)).__name__
+            for name, error in checks.run():
+                status = "ok" if error is None else f"FAILED ({error})"
+                failed += error is not None
+                print(f"{dialect:<11} {backend_name:<18} {name:<12} {status}")
+            close_backends()
+    sys.exit(1 if failed else 0)
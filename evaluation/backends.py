@@ -0,0 +1,672 @@
+"""
+Database backends for the supported SQL dialects.
+Each dialect has one backend per process with a small pool of open connections, so
+evaluation workers and agents reuse connections instead of paying connect and auth
+costs for every query. Connection settings come from a JSON config file named by
+BIRD_DB_CONFIG and from BIRD_<DIALECT>_<SETTING> environment variables, e.g.
+BIRD_MYSQL_PASSWORD or BIRD_POSTGRESQL_HOST. Setting BIRD_<DIALECT>_BACKEND=sqlite
+runs that dialect on the SQLite copies of the databases, which is what the
+conformance check in evaluation.backend_conformance uses.
+
+Results are read in fixed-size batches from server-side cursors (psycopg2 named
+cursors, PyMySQL SSCursor), and fetch() stops with ResultTooLarge once a result passes
+its row or byte cap, so a runaway query never has to fit in worker memory.
+"""
+
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager, suppress
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+from .result_cache import estimate_bytes
+
+DIALECTS = ["SQLite", "MySQL", "PostgreSQL"]
+
+# Connections kept open per pool; more can be open at once, the extras are closed on release
+DEFAULT_POOL_SIZE = 4
+# Rows read from a cursor at a time
+FETCH_BATCH_ROWS = 1000
+# VM steps between checks of whether a query on a replica has been superseded
+REPLICA_CHECK_STEPS = 10000
+# Per-query result caps of the server backends, overridable with BIRD_MAX_RESULT_ROWS /
+# BIRD_MAX_RESULT_MB (0 = no cap); SQLite is only capped when one of those is set
+DEFAULT_MAX_RESULT_ROWS = 1000000
+DEFAULT_MAX_RESULT_MB = 256
+
+class ResultTooLarge(Exception):
+    """A query returned more rows or bytes than its cap allows."""
+
+    def __init__(self, sql: str, rows: int, nbytes: int):
+        size = f" (~{nbytes / 2 ** 20:.1f} MiB)" if nbytes else ""
+        super().__init__(f"result exceeds the limit after {rows} rows{size}")
+        self.sql = sql
+        self.rows = rows
+        self.nbytes = nbytes
+
+def result_limits(defaults: bool = True) -> Tuple[Optional[int], Optional[int]]:
+    """(max rows, max bytes) per query result from the environment; None means no cap.
+    Without defaults, only the caps set in the environment apply."""
+    rows = int(os.environ.get("BIRD_MAX_RESULT_ROWS", DEFAULT_MAX_RESULT_ROWS if defaults else 0))
+    megabytes = float(os.environ.get("BIRD_MAX_RESULT_MB", DEFAULT_MAX_RESULT_MB if defaults else 0))
+    return (rows or None), (int(megabytes * 2 ** 20) or None)
+
+DEFAULT_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "SQLite": {
+        # RAM per process for in-memory replicas of the databases (0 = off)
+        "replica_mb": 0,
+        # mmap window for databases read from disk (0 = SQLite default)
+        "mmap_mb": 0,
+        # Count VM steps of every query in units of this many steps (0 = off, see vm_steps)
+        "count_steps": 0,
+    },
+    # PyMySQL  1.1.1
+    "MySQL": {
+        "host": "localhost",
+        "port": 3306,
+        "user": "root",
+        "password": "li123911",
+        "database": "BIRD",
+        # e.g. /var/run/mysqld/mysqld.sock; when set, pymysql ignores host and port
+        "unix_socket": None,
+    },
+    # psycopg2   2.9.9
+    "PostgreSQL": {
+        "host": "localhost",
+        "port": 5432,
+        "user": "postgres",
+        "password": "li123911",
+        "dbname": "bird",
+    },
+}
+
+_steps = threading.local()
+
+def _step_counter(granularity: int) -> Callable[[], int]:
+    def count() -> int:
+        _steps.count = getattr(_steps, "count", 0) + granularity
+        return 0
+    return count
+
+def vm_steps() -> int:
+    """SQLite VM steps run by this thread's queries since reset_vm_steps(), rounded down
+    to the backend's count_steps granularity. Zero unless count_steps is set."""
+    return getattr(_steps, "count", 0)
+
+def reset_vm_steps() -> None:
+    _steps.count = 0
+
+def load_settings(dialect: str) -> Dict[str, Any]:
+    """Connection settings of a dialect: defaults, then the config file, then the environment."""
+    settings = dict(DEFAULT_SETTINGS.get(dialect, {}))
+    settings["backend"] = dialect.lower()
+    settings["pool_size"] = DEFAULT_POOL_SIZE
+    config_path = os.environ.get("BIRD_DB_CONFIG")
+    if config_path:
+        with open(config_path, "r") as f:
+            settings.update(json.load(f).get(dialect, {}))
+    prefix = f"BIRD_{dialect.upper()}_"
+    for name, value in os.environ.items():
+        if not name.startswith(prefix):
+            continue
+        key = name[len(prefix):].lower()
+        default = settings.get(key)
+        if isinstance(default, (int, float)) and not isinstance(default, bool):
+            # Numeric settings such as replica_mb=0.5 may be fractional even when the default is not
+            number = float(value)
+            settings[key] = int(number) if number.is_integer() else number
+        else:
+            settings[key] = value
+    return settings
+
+class ConnectionPool:
+    """Thread-safe pool of idle connections created on demand by factory."""
+
+    def __init__(self, factory: Callable[[], Any], max_idle: int = DEFAULT_POOL_SIZE):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle: List[Any] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self) -> Any:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.created += 1
+        return self.factory()
+
+    def release(self, conn: Any) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+class Backend:
+    """Pooled connections to the databases of one SQL dialect."""
+
+    dialect = ""
+    # Whether fetch applies DEFAULT_MAX_RESULT_ROWS / DEFAULT_MAX_RESULT_MB when no cap is set
+    default_result_limits = True
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.pool_size = int(settings.get("pool_size", DEFAULT_POOL_SIZE))
+        self._pools: Dict[Optional[str], ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, db_path: Optional[str] = None) -> Any:
+        """A new, unpooled connection."""
+        raise NotImplementedError
+
+    def errors(self) -> Tuple[Type[BaseException], ...]:
+        """Exception types raised by the driver for a failed query."""
+        raise NotImplementedError
+
+    def reset(self, conn: Any) -> None:
+        """Bring a connection back to a clean state before it is reused."""
+
+    def abandon(self, conn: Any) -> None:
+        """Give up on a connection in the middle of a result."""
+        conn.close()
+
+    def pool_key(self, db_path: Optional[str]) -> Optional[str]:
+        # Server dialects keep every BIRD database in one schema, so one pool serves them all
+        return None
+
+    def pool(self, db_path: Optional[str] = None) -> ConnectionPool:
+        key = self.pool_key(db_path)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(lambda: self.connect(db_path), self.pool_size)
+                self._pools[key] = pool
+        return pool
+
+    @contextmanager
+    def connection(self, db_path: Optional[str] = None) -> Iterator[Any]:
+        """A pooled connection; it goes back to the pool unless the block was interrupted
+        by something other than a query error (a timeout, for example)."""
+        pool = self.pool(db_path)
+        conn = pool.acquire()
+        try:
+            yield conn
+        except self.errors():
+            self._give_back(pool, conn)
+            raise
+        except BaseException:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise
+        else:
+            self._give_back(pool, conn)
+
+    def _give_back(self, pool: ConnectionPool, conn: Any) -> None:
+        try:
+            self.reset(conn)
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        pool.release(conn)
+
+    def execute(self, sql: str, db_path: Optional[str] = None) -> List[tuple]:
+        """Run a query on a pooled connection and return all rows."""
+        return self.fetch(sql, db_path, max_rows=None, max_bytes=None)
+
+    def stream(self, conn: Any, sql: str, batch_size: int = FETCH_BATCH_ROWS) -> Iterator[List[tuple]]:
+        """Batches of rows of a query, read without materializing the whole result."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            with suppress(Exception):
+                cursor.close()
+
+    def fetch(self, sql: str, db_path: Optional[str] = None, max_rows: Optional[int] = -1,
+              max_bytes: Optional[int] = -1, batch_size: int = FETCH_BATCH_ROWS) -> List[tuple]:
+        """All rows of a query, or ResultTooLarge as soon as they pass max_rows or max_bytes.
+
+        Caps default to result_limits(); pass None to lift one. A query stopped at its cap
+        leaves its connection in an unknown state, so the connection is closed, not pooled.
+        """
+        default_rows, default_bytes = result_limits(self.default_result_limits)
+        max_rows = default_rows if max_rows == -1 else max_rows
+        max_bytes = default_bytes if max_bytes == -1 else max_bytes
+        rows: List[tuple] = []
+        nbytes = 0
+        with self.connection(db_path) as conn:
+            for batch in self.stream(conn, sql, batch_size):
+                rows.extend(batch)
+                if max_bytes is not None:
+                    nbytes += estimate_bytes(batch)
+                if (max_rows is not None and len(rows) > max_rows) or (
+                    max_bytes is not None and nbytes > max_bytes
+                ):
+                    # Drop the connection rather than drain the rest of a server-side result
+                    self.abandon(conn)
+                    raise ResultTooLarge(sql, len(rows), nbytes)
+        return rows
+
+    def probe(self, sql: str, db_path: Optional[str] = None) -> None:
+        """Run a query up to its first row, which is as far as it has to get to fail, and
+        raise the driver's error if it does. The rest of the result is not read."""
+        try:
+            self.fetch(sql, db_path, max_rows=0, max_bytes=None, batch_size=1)
+        except ResultTooLarge:
+            pass
+
+    def query_cost(self, sql: str, db_path: Optional[str] = None) -> int:
+        """Work done by one execution of a query, counted by the engine rather than timed,
+        so it is the same under any load and on any machine. The unit depends on the backend."""
+        raise NotImplementedError(f"{self.dialect} backend cannot count query cost")
+
+    def columns(self, table: str, db_path: Optional[str] = None) -> List[Tuple[str, str, bool, bool]]:
+        """(name, type, nullable, primary key) for each column of a table."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pools = list(self._pools.values())
+        return {
+            "pools": len(pools),
+            "created": sum(p.created for p in pools),
+            "reused": sum(p.reused for p in pools),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+class SQLiteBackend(Backend):
+    """SQLite files opened read-only, one pool per database file.
+
+    With a replica budget (replica_mb), load_replicas copies databases into :memory:
+    with the backup API, smallest first, and queries on those run against the
+    in-memory copy with no disk reads or file locks. Databases that do not fit are
+    read through an mmap window of mmap_mb.
+
+    Also stands in for MySQL and PostgreSQL when BIRD_<DIALECT>_BACKEND=sqlite, so the
+    rest of the pipeline can be exercised without a database server.
+    """
+
+    dialect = "SQLite"
+    # Results are read from local files, so gold queries with large results are not cut off by default
+    default_result_limits = False
+
+    def __init__(self, settings: Dict[str, Any]):
+        super().__init__(settings)
+        self.replica_budget = int(float(settings.get("replica_mb", 0)) * 2 ** 20)
+        self.mmap_bytes = int(float(settings.get("mmap_mb", 0)) * 2 ** 20)
+        self.count_steps = int(settings.get("count_steps", 0))
+        self._replicas: Dict[str, sqlite3.Connection] = {}
+        # Thread whose query a replica currently serves; see connection()
+        self._replica_owners: Dict[str, int] = {}
+        self.replica_bytes = 0
+
+    def connect(self, db_path: Optional[str] = None) -> sqlite3.Connection:
+        if not db_path:
+            raise ValueError("SQLite backend needs a database path")
+        # Pooled connections may be handed to the thread func_timeout runs queries in
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        if self.mmap_bytes:
+            conn.execute(f"PRAGMA mmap_size = {self.mmap_bytes}")
+        self._set_progress_handler(conn)
+        return conn
+
+    def _superseded(self, replica_path: Optional[str]) -> bool:
+        return replica_path is not None and self._replica_owners.get(replica_path) != threading.get_ident()
+
+    def _set_progress_handler(self, conn: sqlite3.Connection, replica_path: Optional[str] = None) -> None:
+        """Install the standing progress handler: VM step counting when count_steps is set,
+        and on replicas a check that stops the query once another thread has taken over."""
+        # The handler runs in the thread executing the query, so counts stay per thread
+        counter = _step_counter(self.count_steps) if self.count_steps else None
+        if replica_path is None:
+            if counter:
+                conn.set_progress_handler(counter, self.count_steps)
+            else:
+                conn.set_progress_handler(None, 0)
+            return
+
+        def handler() -> int:
+            if self._superseded(replica_path):
+                return 1  # interrupts the query
+            return counter() if counter else 0
+
+        conn.set_progress_handler(handler, self.count_steps or REPLICA_CHECK_STEPS)
+
+    def load_replicas(self, db_paths: List[str]) -> List[str]:
+        """Copy databases into memory, smallest first, while they fit in the replica budget."""
+        loaded = []
+        for path in plan_replicas(db_paths, self.replica_budget - self.replica_bytes, exclude=self._replicas):
+            replica = sqlite3.connect(":memory:", check_same_thread=False)
+            source = self.connect(path)
+            try:
+                source.backup(replica)
+            finally:
+                source.close()
+            # Predictions must not be able to change the copy later questions run on
+            replica.execute("PRAGMA query_only = ON")
+            self._set_progress_handler(replica, path)
+            self._replicas[path] = replica
+            self.replica_bytes += os.path.getsize(path)
+            loaded.append(path)
+        return loaded
+
+    def _replica_path(self, db_path: Optional[str]) -> Optional[str]:
+        path = os.path.realpath(db_path) if db_path and self._replicas else None
+        return path if path in self._replicas else None
+
+    @contextmanager
+    def connection(self, db_path: Optional[str] = None) -> Iterator[Any]:
+        path = self._replica_path(db_path)
+        if path is None:
+            with super().connection(db_path) as conn:
+                yield conn
+            return
+        # One replica per database and process; it is never closed by a failed query.
+        # A query func_timeout gave up on keeps running in its abandoned thread and would
+        # hold the replica; taking ownership makes its progress handler interrupt it.
+        self._replica_owners[path] = threading.get_ident()
+        yield self._replicas[path]
+
+    def abandon(self, conn: Any) -> None:
+        if conn not in self._replicas.values():
+            conn.close()
+
+    def close(self) -> None:
+        super().close()
+        replicas, self._replicas = list(self._replicas.values()), {}
+        self._replica_owners.clear()
+        self.replica_bytes = 0
+        for replica in replicas:
+            replica.close()
+
+    def errors(self) -> Tuple[Type[BaseException], ...]:
+        return (sqlite3.Error,)
+
+    def reset(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+
+    def probe(self, sql: str, db_path: Optional[str] = None) -> None:
+        # Closing the cursor discards the rest of the result, so the connection stays pooled
+        with self.connection(db_path) as conn:
+            cursor = conn.execute(sql)
+            try:
+                cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def pool_key(self, db_path: Optional[str]) -> Optional[str]:
+        return os.path.realpath(db_path) if db_path else None
+
+    def query_cost(self, sql: str, db_path: Optional[str] = None) -> int:
+        """VM steps to run the query and read every row.
+
+        Every step is counted: with a coarser progress handler the count would depend on
+        how often the cached statement had run before, since SQLite carries the remainder
+        over between executions.
+        """
+        steps = [0]
+        replica_path = self._replica_path(db_path)
+
+        def count() -> int:
+            steps[0] += 1
+            if steps[0] % REPLICA_CHECK_STEPS == 0 and self._superseded(replica_path):
+                return 1
+            return 0
+
+        with self.connection(db_path) as conn:
+            # Load the schema first so its parsing is not counted against the query
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            conn.set_progress_handler(count, 1)
+            try:
+                for _ in self.stream(conn, sql):
+                    pass
+            finally:
+                self._set_progress_handler(conn, replica_path)
+        return steps[0]
+
+    def columns(self, table: str, db_path: Optional[str] = None) -> List[Tuple[str, str, bool, bool]]:
+        quoted = '"' + table.replace('"', '""') + '"'
+        rows = self.execute(f"PRAGMA table_info({quoted})", db_path)
+        return [(row[1], row[2] or "", not row[3], bool(row[5])) for row in rows]
+
+class MySQLBackend(Backend):
+    dialect = "MySQL"
+
+    def connect(self, db_path: Optional[str] = None) -> Any:
+        import pymysql
+
+        kwargs = {
+            key: self.settings[key]
+            for key in ("host", "port", "user", "password", "database", "unix_socket")
+            if self.settings.get(key) not in (None, "")
+        }
+        return pymysql.connect(autocommit=True, **kwargs)
+
+    def errors(self) -> Tuple[Type[BaseException], ...]:
+        import pymysql
+
+        return (pymysql.MySQLError,)
+
+    def reset(self, conn: Any) -> None:
+        # Reconnects if the server closed an idle connection
+        conn.ping(reconnect=True)
+
+    def stream(self, conn: Any, sql: str, batch_size: int = FETCH_BATCH_ROWS) -> Iterator[List[tuple]]:
+        import pymysql.cursors
+
+        # Unbuffered: rows stay on the server until they are read
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(sql)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield list(batch)
+        finally:
+            # Closing reads any unread rows, unless the connection was dropped first
+            with suppress(Exception):
+                cursor.close()
+
+    def query_cost(self, sql: str, db_path: Optional[str] = None) -> int:
+        """Rows the storage engine handed to the server (the session's Handler_read counters)."""
+        with self.connection(db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("FLUSH STATUS")
+                for _ in self.stream(conn, sql):
+                    pass
+                cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+                return sum(int(value) for _, value in cursor.fetchall())
+            finally:
+                cursor.close()
+
+    def columns(self, table: str, db_path: Optional[str] = None) -> List[Tuple[str, str, bool, bool]]:
+        with self.connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT column_name, column_type, is_nullable, column_key "
+                "FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND LOWER(table_name) = LOWER(%s) "
+                "ORDER BY ordinal_position",
+                (table,),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        return [(name, str(type_).upper(), nullable == "YES", "PRI" in key) for name, type_, nullable, key in rows]
+
+class PostgreSQLBackend(Backend):
+    dialect = "PostgreSQL"
+
+    def connect(self, db_path: Optional[str] = None) -> Any:
+        import psycopg2
+
+        kwargs = {
+            key: self.settings[key]
+            for key in ("host", "port", "user", "password", "dbname")
+            if self.settings.get(key) not in (None, "")
+        }
+        conn = psycopg2.connect(**kwargs)
+        # No transaction is left open (or aborted) between queries
+        conn.autocommit = True
+        return conn
+
+    def errors(self) -> Tuple[Type[BaseException], ...]:
+        import psycopg2
+
+        return (psycopg2.Error,)
+
+    def reset(self, conn: Any) -> None:
+        if conn.closed:
+            raise ConnectionError("connection closed")
+        if not conn.autocommit:
+            conn.rollback()
+            conn.autocommit = True
+
+    def stream(self, conn: Any, sql: str, batch_size: int = FETCH_BATCH_ROWS) -> Iterator[List[tuple]]:
+        # A named cursor keeps the result on the server; it needs a transaction to live in
+        conn.autocommit = False
+        cursor = conn.cursor(name=f"bird_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(sql)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            with suppress(Exception):
+                cursor.close()
+                conn.rollback()
+                conn.autocommit = True
+
+    def query_cost(self, sql: str, db_path: Optional[str] = None) -> int:
+        """Buffer blocks touched by the plan (EXPLAIN (ANALYZE, BUFFERS)), whether they were
+        found in shared buffers or read, so the count does not depend on the cache state."""
+        with self.connection(db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, TIMING OFF, FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        # Counters of the root node include those of all its children
+        return sum(root.get(key, 0) for key in (
+            "Shared Hit Blocks", "Shared Read Blocks", "Local Hit Blocks", "Local Read Blocks",
+            "Temp Read Blocks", "Temp Written Blocks",
+        ))
+
+    def columns(self, table: str, db_path: Optional[str] = None) -> List[Tuple[str, str, bool, bool]]:
+        with self.connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT c.column_name, c.data_type, c.is_nullable,
+                       EXISTS (
+                           SELECT 1 FROM information_schema.table_constraints tc
+                           JOIN information_schema.key_column_usage k
+                             ON tc.constraint_name = k.constraint_name AND tc.table_schema = k.table_schema
+                           WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_name = c.table_name
+                             AND k.column_name = c.column_name
+                       )
+                FROM information_schema.columns c
+                WHERE c.table_schema = current_schema() AND LOWER(c.table_name) = LOWER(%s)
+                ORDER BY c.ordinal_position
+                """,
+                (table,),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        return [(name, type_.upper(), nullable == "YES", bool(pk)) for name, type_, nullable, pk in rows]
+
+def plan_replicas(db_paths: List[str], budget: int, exclude: Any = ()) -> List[str]:
+    """Databases (real paths) that fit in budget bytes of replicas, smallest first."""
+    planned = []
+    for path in sorted({os.path.realpath(p) for p in db_paths if p and os.path.exists(p)} - set(exclude),
+                       key=os.path.getsize):
+        size = os.path.getsize(path)
+        if size > budget:
+            break
+        planned.append(path)
+        budget -= size
+    return planned
+
+BACKEND_TYPES: Dict[str, Type[Backend]] = {
+    "sqlite": SQLiteBackend,
+    "mysql": MySQLBackend,
+    "postgresql": PostgreSQLBackend,
+}
+
+def register_backend(name: str, backend_type: Type[Backend]) -> None:
+    """Make a backend class selectable with BIRD_<DIALECT>_BACKEND=<name>."""
+    BACKEND_TYPES[name.lower()] = backend_type
+
+_backends: Dict[str, Backend] = {}
+_backends_pid = os.getpid()
+_backends_lock = threading.Lock()
+
+def get_backend(sql_dialect: str) -> Backend:
+    """The backend of a dialect for this process, created on first use."""
+    global _backends_pid
+    if sql_dialect not in DIALECTS:
+        raise ValueError(f"Unsupported SQL dialect: {sql_dialect}")
+    with _backends_lock:
+        if _backends_pid != os.getpid():
+            # Connections inherited from the parent process must not be shared
+            _backends.clear()
+            _backends_pid = os.getpid()
+        backend = _backends.get(sql_dialect)
+        if backend is None:
+            settings = load_settings(sql_dialect)
+            backend_type = BACKEND_TYPES.get(str(settings["backend"]).lower())
+            if backend_type is None:
+                raise ValueError(f"Unknown backend for {sql_dialect}: {settings['backend']}")
+            backend = backend_type(settings)
+            _backends[sql_dialect] = backend
+    return backend
+
+def init_worker(sql_dialect: str, db_paths: List[str]) -> None:
+    """Pool initializer for evaluation workers: load replicas of the workload's databases."""
+    backend = get_backend(sql_dialect)
+    if isinstance(backend, SQLiteBackend) and backend.replica_budget:
+        backend.load_replicas(db_paths)
+
+def close_backends() -> None:
+    with _backends_lock:
+        backends = list(_backends.values())
+        _backends.clear()
+    for backend in backends:
+        backend.close()
@@ -0,0 +1,171 @@
+"""
+Context management for the multi-agent SQL chats.
+Instead of resending the whole transcript to every agent, the schema is sent once
+(to the Schema Analyzer) and each later role only receives the structured outputs
+it needs, with the shared history capped by an approximate token budget.
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Tuple
+from autogen_bird.self_consistency import extract_sql
+from autogen_bird.tracing import span
+
+# Structured inputs forwarded to each role, in prompt order
+ROLE_INPUTS = {
+    "schema_analyzer": ["schema"],
+    "query_planner": ["analysis", "join_path"],
+    "query_generator": ["table_schema", "join_path", "plan"],
+    "query_validator": ["table_schema", "join_path", "draft_sql", "execution_check"],
+    "final_reviewer": ["draft_sql", "feedback"],
+}
+
+ROLE_INSTRUCTIONS = {
+    "schema_analyzer": "Identify the tables and columns needed to answer the question. "
+                       "End your answer with a line 'TABLES: <comma-separated table names>'.",
+    "query_planner": "Outline the approach for the SQL query based on the schema analysis.",
+    "query_generator": "Write the SQL query. Return only the SQL query.",
+    "query_validator": "Check the draft SQL query for errors and explain any fixes needed.",
+    "final_reviewer": "Make sure the query answers the question and apply any needed fixes. "
+                      "Reply with 'FINAL SQL QUERY:' followed by only the SQL query.",
+}
+
+SECTION_TITLES = {
+    "analysis": "SCHEMA ANALYSIS",
+    "table_schema": "RELEVANT TABLES",
+    "join_path": "JOIN PATH",
+    "plan": "QUERY PLAN",
+    "draft_sql": "DRAFT SQL",
+    "execution_check": "EXECUTION CHECK",
+    "feedback": "VALIDATOR FEEDBACK",
+}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English and SQL)."""
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text so that it fits within max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, max_tokens * 4 - 15)].rstrip() + "\n...[truncated]"
+
+def split_schema_blocks(schema: str) -> Dict[str, str]:
+    """Split a schema prompt into per-table blocks keyed by table name."""
+    blocks = {}
+    for block in re.split(r"\n\s*\n", schema):
+        match = re.search(r"^Table:\s*(\S+)", block, re.MULTILINE) or re.search(
+            r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?[`\"\[]?([\w ]+?)[`\"\]]?\s*\(", block, re.IGNORECASE
+        ) or re.match(r"\s*`?([\w ]+?)`?\(.*\)\s*$", block.split("\n")[0])
+        if match:
+            # Sample rows were already seen by the analyzer; keep only the structure
+            structure = re.split(r"Sample data:|/\* \d+ example rows:|\n  e\.g\. ", block)[0]
+            blocks[match.group(1).strip()] = structure.strip()
+    return blocks
+
+class ChatContext:
+    """Structured state shared by the agents working on one question."""
+
+    def __init__(self, question: str, schema: str, evidence: Optional[str] = None,
+                 max_history_tokens: int = 1500, join_graph: Optional[Any] = None):
+        # schema is sent verbatim as the message prefix, so it should carry its own title
+        self.question = question
+        self.schema = schema
+        self.evidence = evidence or ""
+        self.max_history_tokens = max_history_tokens
+        # Precomputed join graph of the database, used to fill in the join path
+        self.join_graph = join_graph
+        self.schema_blocks = split_schema_blocks(schema)
+        self.artifacts: Dict[str, str] = {"schema": schema}
+        self.tables: List[str] = []
+        self.history: List[Tuple[str, str]] = []
+        self.prompt_tokens = 0
+
+    def _header(self) -> str:
+        header = f"QUESTION: {self.question}\n"
+        if self.evidence:
+            header += f"EXTERNAL KNOWLEDGE EVIDENCE: {self.evidence}\n"
+        return header.rstrip()
+
+    def message_for(self, role: str) -> str:
+        """Build the compact message for the given role."""
+        leading = []
+        sections = []
+        # Sections are added in order until the history budget runs out; the schema
+        # itself is only ever sent once and is not counted against the budget
+        budget = self.max_history_tokens
+        for key in ROLE_INPUTS[role]:
+            value = self.artifacts.get(key)
+            if not value:
+                continue
+            if key == "schema":
+                # The schema prefix is byte-identical across questions, so it leads
+                # the message to let provider-side prompt caching reuse it
+                leading.append(value.rstrip())
+                continue
+            value = truncate_to_tokens(value, budget)
+            budget -= estimate_tokens(value)
+            sections.append(f"{SECTION_TITLES[key]}:\n{value}")
+            if budget <= 0:
+                break
+
+        message = "\n\n".join(leading + [self._header()] + sections + [ROLE_INSTRUCTIONS[role]])
+        self.prompt_tokens += estimate_tokens(message)
+        return message
+
+    def record(self, role: str, content: str) -> None:
+        """Store a role's reply and extract the structured outputs later roles need."""
+        self.history.append((role, content))
+        if role == "schema_analyzer":
+            self.artifacts["analysis"] = content
+            self.tables = self._parse_tables(content)
+            # Without any recognised table the generator still needs a schema to work from
+            blocks = [self.schema_blocks[t] for t in self.tables] or list(self.schema_blocks.values())
+            self.artifacts["table_schema"] = "\n\n".join(blocks) or self.schema
+            if self.join_graph is not None and len(self.tables) > 1:
+                edges, unreachable = self.join_graph.join_path(self.tables)
+                if edges and not unreachable:
+                    self.artifacts["join_path"] = self.join_graph.join_clause(self.tables)
+        elif role == "query_planner":
+            self.artifacts["plan"] = content
+        elif role == "query_generator":
+            self.artifacts["draft_sql"] = extract_sql(content)
+        elif role == "query_validator":
+            self.artifacts["feedback"] = content
+        elif role == "final_reviewer":
+            final_sql = extract_sql(content)
+            if final_sql:
+                self.artifacts["final_sql"] = final_sql
+
+    def _parse_tables(self, content: str) -> List[str]:
+        match = re.search(r"TABLES:\s*(.+)", content, re.IGNORECASE)
+        if match:
+            # Models do not reliably keep the schema's casing, so names are matched case-insensitively
+            known = {name.lower(): name for name in self.schema_blocks}
+            tables = []
+            for name in match.group(1).split(","):
+                table = known.get(name.strip(" `\"'[].").lower())
+                if table and table not in tables:
+                    tables.append(table)
+            if tables:
+                return tables
+        # Fall back to the tables the analysis mentions by name
+        return [
+            name for name in self.schema_blocks
+            if re.search(r"\b" + re.escape(name) + r"\b", content, re.IGNORECASE)
+        ]
+
+    @property
+    def final_sql(self) -> str:
+        return self.artifacts.get("final_sql") or self.artifacts.get("draft_sql", "")
+
+def run_role(agent: Any, context: ChatContext, role: str) -> str:
+    """Ask a single agent for a reply using only the compact context for its role."""
+    message = context.message_for(role)
+    with span("agent.turn", role=role, prompt_tokens=estimate_tokens(message)) as sp:
+        reply = agent.generate_reply(messages=[{"role": "user", "content": message}])
+        if isinstance(reply, dict):
+            reply = reply.get("content") or ""
+        reply = reply or ""
+        sp.set(completion_tokens=estimate_tokens(reply))
+    context.record(role, reply)
+    return reply
@@ -2,6 +2,10 @@ import sys
 import argparse
 import multiprocessing as mp
 from func_timeout import func_timeout, FunctionTimedOut
+from evaluation import tracing, profiling
+from evaluation.sql_lint import lint_sql, LintStats
+from evaluation.sharding import select_shard, write_shard
+from evaluation.backends import ResultTooLarge, init_worker
 from evaluation.evaluation_utils import (
     load_json,
     load_jsonl,
@@ -14,6 +18,8 @@ from evaluation.evaluation_utils import (
     tokenize_sql,
     compute_f1_score,
     sort_results,
+    set_result_limits,
+    configure_replicas,
 )
 
 
@@ -108,45 +114,72 @@ def calculate_f1_score(predicted, ground_truth):
 
 
 def result_callback(result):
+    # Spans recorded inside pool workers travel back with their results
+    tracing.collect(result.pop("spans", []))
+    profiling.collect(result.pop("profile", []))
     exec_result.append(result)
 
 
 def execute_model(
-    predicted_sql, ground_truth, db_place, idx, meta_time_out, sql_dialect
+    predicted_sql, ground_truth, db_place, idx, meta_time_out, sql_dialect, lint=True, gold_store=None
 ):
-    try:
-        res = func_timeout(
-            meta_time_out,
-            execute_sql,
-            args=(
-                predicted_sql,
-                ground_truth,
-                db_place,
-                sql_dialect,
-                calculate_f1_score,
-            ),
-        )
-    except KeyboardInterrupt:
-        sys.exit(0)
-    except FunctionTimedOut:
-        result = [(f"timeout",)]
-        res = 0
-    except Exception as e:
-        result = [(f"error",)]  # possibly len(query) > 512 or not executable
-        res = 0
+    with tracing.span("question", idx=idx, db_path=db_place, sql_dialect=sql_dialect):
+        # Predictions the catalog shows cannot run are scored without touching the database
+        issues = lint_sql(predicted_sql, db_place, sql_dialect) if lint else None
+        over_limit = None
+        try:
+            if issues:
+                res = 0
+            else:
+                gold = None
+                if gold_store:
+                    # The store brings in numpy, so it is only imported by runs that use one
+                    from evaluation.gold_store import open_gold_store
+                    gold = open_gold_store(gold_store).get(idx)
+                res = func_timeout(
+                    meta_time_out,
+                    profiling.wrap(execute_sql, profiling.database_name(db_place)),
+                    args=(
+                        predicted_sql,
+                        ground_truth,
+                        db_place,
+                        sql_dialect,
+                        calculate_f1_score,
+                        gold,
+                    ),
+                )
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except FunctionTimedOut:
+            result = [(f"timeout",)]
+            res = 0
+        except ResultTooLarge as e:
+            # Scored as wrong without holding the whole result in memory
+            over_limit = "predicted" if e.sql == predicted_sql else "gold"
+            res = 0
+        except Exception as e:
+            result = [(f"error",)]  # possibly len(query) > 512 or not executable
+            res = 0
     # print(result)
     # result = str(set([ret[0] for ret in result]))
-    result = {"sql_idx": idx, "res": res}
+    result = {"sql_idx": idx, "res": res, "lint": issues, "over_limit": over_limit}
+    if tracing.is_enabled():
+        result["spans"] = tracing.drain()
+    if profiling.is_enabled():
+        result["profile"] = profiling.drain()
     # print(result)
     return result
 
 
 def run_sqls_parallel(
-    sqls, db_places, num_cpus=1, meta_time_out=30.0, sql_dialect="SQLite"
+    sqls, db_places, num_cpus=1, meta_time_out=30.0, sql_dialect="SQLite", lint=True, gold_store=None, indices=None
 ):
-    pool = mp.Pool(processes=num_cpus)
+    pool = mp.Pool(
+        processes=num_cpus, initializer=init_worker, initargs=(sql_dialect, sorted(set(db_places)))
+    )
     for i, sql_pair in enumerate(sqls):
-
+        if indices is not None and i not in indices:
+            continue
         predicted_sql, ground_truth = sql_pair
         pool.apply_async(
             execute_model,
@@ -157,6 +190,8 @@ def run_sqls_parallel(
                 i,
                 meta_time_out,
                 sql_dialect,
+                lint,
+                gold_store,
             ),
             callback=result_callback,
         )
@@ -219,9 +254,50 @@ if __name__ == "__main__":
     args_parser.add_argument("--meta_time_out", type=float, default=30.0)
     args_parser.add_argument("--diff_json_path", type=str, default="")
     args_parser.add_argument("--sql_dialect", type=str, default="SQLite")
+    args_parser.add_argument(
+        "--max_rows", type=int, default=None,
+        help="rows a query may return before it is stopped and scored as over the limit (0 = no cap)"
+    )
+    args_parser.add_argument(
+        "--max_result_mb", type=float, default=None,
+        help="approximate result size in MiB before a query is stopped (0 = no cap)"
+    )
+    args_parser.add_argument(
+        "--replica_mb", type=int, default=0,
+        help="copy SQLite databases into memory in each worker, smallest first, up to this many MiB"
+    )
+    args_parser.add_argument(
+        "--mmap_mb", type=int, default=None,
+        help="mmap window for SQLite databases read from disk (default 1024 with --replica_mb)"
+    )
+    args_parser.add_argument(
+        "--no_lint", action="store_true",
+        help="execute every prediction instead of rejecting the ones that reference unknown tables or columns"
+    )
+    args_parser.add_argument(
+        "--gold_store", type=str, default="",
+        help="directory of precomputed gold results, built on first use and rebuilt when the gold file or databases change"
+    )
+    args_parser.add_argument(
+        "--shard", type=str, default="",
+        help="evaluate only shard k of N (e.g. 2/4, balanced by estimated gold query cost) and write its "
+             "results to --shard_output for python -m evaluation.sharding merge"
+    )
+    args_parser.add_argument("--shard_output", type=str, default="", help="shard result file")
     args_parser.add_argument("--output_log_path", type=str, default="SQLite")
+    args_parser.add_argument(
+        "--trace_path", type=str, default="",
+        help="write spans to this file (.jsonl for JSONL, otherwise Chrome trace format)"
+    )
+    args_parser.add_argument(
+        "--profile", type=str, default="",
+        help="profile every question in its worker and write the merged pstats to this file, with a .txt report"
+    )
     args = args_parser.parse_args()
+    set_result_limits(args.max_rows, args.max_result_mb)
     exec_result = []
+    tracing.start(args.trace_path)
+    profiling.start(args.profile)
 
     pred_queries, db_paths = package_sqls(
         args.predicted_sql_path,
@@ -236,24 +312,56 @@ if __name__ == "__main__":
     )
 
     query_pairs = list(zip(pred_queries, gt_queries))
-
+    indices = set(select_shard(gt_queries, db_paths_gt, args.shard)) if args.shard else None
+
+    if args.sql_dialect == "SQLite":
+        configure_replicas(db_paths_gt, args.replica_mb, args.mmap_mb)
+    if args.gold_store:
+        from evaluation.gold_store import ensure_gold_store
+        if ensure_gold_store(args.gold_store, args.ground_truth_path, gt_queries, db_paths_gt,
+                             args.sql_dialect, args.num_cpus, args.meta_time_out, indices):
+            print(f"Built gold store {args.gold_store}")
     run_sqls_parallel(
         query_pairs,
         db_places=db_paths_gt,
         num_cpus=args.num_cpus,
         meta_time_out=args.meta_time_out,
         sql_dialect=args.sql_dialect,
+        lint=not args.no_lint,
+        indices=indices,
+        gold_store=args.gold_store,
     )
     exec_result = sort_results(exec_result)
 
-    print("start calculate Soft F1")
-    simple_acc, moderate_acc, challenging_acc, acc, count_lists = compute_f1_by_diff(
-        exec_result, args.diff_json_path
-    )
-    score_lists = [simple_acc, moderate_acc, challenging_acc, acc]
-    print_data(score_lists, count_lists,metric='Soft-F1',result_log_file=args.output_log_path)
+    if args.shard:
+        # Tables come from merging all the shards; this run only writes its own results
+        shard_path = write_shard(args.shard_output, "Soft-F1", args.sql_dialect, args.shard, exec_result,
+                                 args.diff_json_path, len(query_pairs))
+        print(f"Wrote {len(exec_result)} results of shard {args.shard} to {shard_path}")
+    else:
+        print("start calculate Soft F1")
+        simple_acc, moderate_acc, challenging_acc, acc, count_lists = compute_f1_by_diff(
+            exec_result, args.diff_json_path
+        )
+        score_lists = [simple_acc, moderate_acc, challenging_acc, acc]
+        print_data(score_lists, count_lists,metric='Soft-F1',result_log_file=args.output_log_path)
+    lint_stats = LintStats()
+    for result in exec_result:
+        lint_stats.record(result.get("lint"))
+    if lint_stats.checked:
+        print(lint_stats.summary())
+    over_limit = [result["over_limit"] for result in exec_result if result.get("over_limit")]
+    if over_limit:
+        print(
+            f"Over the result limit: {over_limit.count('predicted')} predictions, "
+            f"{over_limit.count('gold')} gold queries"
+        )
     print(
         "==========================================================================================="
     )
     print(f"Finished EX evaluation for {args.sql_dialect} on Mini Dev set")
     print("\n\n")
+    if args.trace_path:
+        tracing.export(args.trace_path)
+    if args.profile:
+        print(f"Profile written to {args.profile}, report in {profiling.export(args.profile)}")
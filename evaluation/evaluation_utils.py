@@ -1,8 +1,10 @@
+import os
 import json
-import psycopg2
-import pymysql
 import sqlite3
 import re
+from evaluation.tracing import span
+from evaluation.result_cache import cached_execute
+from evaluation.backends import get_backend, plan_replicas
 
 def load_jsonl(file_path):
     data = []
@@ -34,15 +36,19 @@ def normalize_sql(sql):
     return sql
 
 def get_execution_result(sql, db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    try:
-        cursor.execute(sql)
-        result = cursor.fetchall()
-    except Exception as e:
-        result = str(e)
-    finally:
-        conn.close()
+    def run():
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    with span("get_execution_result", db_path=db_path) as sp:
+        try:
+            result = cached_execute(db_path, sql, run)
+            sp.set(rows=len(result))
+        except Exception as e:
+            result = str(e)
     return result
 
 def compare_execution_results(pred_result, gold_result):
@@ -113,54 +119,44 @@ def compute_f1_score(pred_tokens, gold_tokens):
     
     return f1
 
-# psycopg2   2.9.9
-def connect_postgresql():
-    # Open database connection
-    # Connect to the database
-    db = psycopg2.connect(
-        "dbname=bird user=postgres host=localhost password=li123911 port=5432"
-    )
-    return db
-
-
-# PyMySQL  1.1.1
-def connect_mysql():
-    # Open database connection
-    # Connect to the database"
-    db = pymysql.connect(
-        host="localhost",
-        user="root",
-        password="li123911",
-        database="BIRD",
-        # unix_socket="/tmp/mysql.sock",
-        unix_socket="/var/run/mysqld/mysqld.sock"
-        # port=3306,
-    )
-    return db
+def set_result_limits(max_rows=None, max_result_mb=None):
+    # Read by every backend, including the ones in pool workers started after this call
+    if max_rows is not None:
+        os.environ["BIRD_MAX_RESULT_ROWS"] = str(max_rows)
+    if max_result_mb is not None:
+        os.environ["BIRD_MAX_RESULT_MB"] = str(max_result_mb)
+
+
+def configure_replicas(db_paths, replica_mb=None, mmap_mb=None):
+    # Read by the SQLite backend of every pool worker started after this call
+    if mmap_mb is None and replica_mb:
+        mmap_mb = 1024  # databases that do not fit in memory are read through mmap
+    if mmap_mb:
+        os.environ["BIRD_SQLITE_MMAP_MB"] = str(mmap_mb)
+    if replica_mb:
+        os.environ["BIRD_SQLITE_REPLICA_MB"] = str(replica_mb)
+        planned = plan_replicas(db_paths, replica_mb * 2 ** 20)
+        print(
+            f"In-memory replicas: {len(planned)} of {len(set(db_paths))} databases per worker "
+            f"({replica_mb} MiB budget), the rest through a {mmap_mb} MiB mmap"
+        )
 
 
 def connect_db(sql_dialect, db_path):
-    if sql_dialect == "SQLite":
-        conn = sqlite3.connect(db_path)
-    elif sql_dialect == "MySQL":
-        conn = connect_mysql()
-    elif sql_dialect == "PostgreSQL":
-        conn = connect_postgresql()
-    else:
-        raise ValueError("Unsupported SQL dialect")
-    return conn
-
-
-def execute_sql(predicted_sql, ground_truth, db_path, sql_dialect, calculate_func):
-    conn = connect_db(sql_dialect, db_path)
-    # Connect to the database
-    cursor = conn.cursor()
-    cursor.execute(predicted_sql)
-    predicted_res = cursor.fetchall()
-    cursor.execute(ground_truth)
-    ground_truth_res = cursor.fetchall()
-    conn.close()
-    res = calculate_func(predicted_res, ground_truth_res)
+    # A new connection the caller closes; execute_sql uses the dialect's pool instead
+    return get_backend(sql_dialect).connect(db_path)
+
+
+def execute_sql(predicted_sql, ground_truth, db_path, sql_dialect, calculate_func, gold=None):
+    with span("execute_sql", db_path=db_path, sql_dialect=sql_dialect) as sp:
+        # Pooled connections, results streamed in batches up to the per-query caps
+        backend = get_backend(sql_dialect)
+        predicted_res = backend.fetch(predicted_sql, db_path)
+        # A result from the gold store stands in for running the gold query
+        ground_truth_res = gold if gold is not None else backend.fetch(ground_truth, db_path)
+        sp.set(pred_rows=len(predicted_res), gold_rows=len(ground_truth_res))
+    with span("compare_results", metric=calculate_func.__name__):
+        res = calculate_func(predicted_res, ground_truth_res)
     return res
 
 
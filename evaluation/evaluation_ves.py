@@ -2,10 +2,13 @@ import sys
 import json
 import os
 import sqlite3
-import numpy as np
 import argparse
 import multiprocessing as mp
 from func_timeout import func_timeout, FunctionTimedOut
+from evaluation import tracing, profiling
+from evaluation.sql_lint import lint_sql, LintStats
+from evaluation.sharding import select_shard, write_shard
+from evaluation.backends import ResultTooLarge, get_backend, init_worker
 from evaluation.evaluation_utils import (
     load_json,
     load_jsonl,
@@ -18,16 +21,24 @@ from evaluation.evaluation_utils import (
     compare_execution_results,
     compute_ves_score,
     sort_results,
+    set_result_limits,
+    configure_replicas,
 )
 import time
 import math
 
 
 def result_callback(result):
+    # Spans recorded inside pool workers travel back with their results
+    tracing.collect(result.pop("spans", []))
+    profiling.collect(result.pop("profile", []))
     exec_result.append(result)
 
 
 def clean_abnormal(input):
+    # Only the timing loop needs numpy; steps mode and sharded merges start without it
+    import numpy as np
+
     input = np.asarray(input)
     processed_list = []
     mean = np.mean(input, axis=0)
@@ -39,13 +50,11 @@ def clean_abnormal(input):
 
 
 def execute_sql(sql, db_path, sql_dialect, return_time=False):
-    # Connect to the database
-    conn = connect_db(sql_dialect, db_path)
+    backend = get_backend(sql_dialect)
+    # Connections are pooled, so after the correctness run connecting is not timed. The
+    # correctness run already applied the result caps, so timed runs skip the size checks
     start_time = time.time()
-    cursor = conn.cursor()
-    cursor.execute(sql)
-    res = cursor.fetchall()
-    conn.close()  # Don't forget to close the connection!
+    res = backend.execute(sql, db_path) if return_time else backend.fetch(sql, db_path)
     exec_time = time.time() - start_time
     if return_time:
         return exec_time
@@ -54,14 +63,37 @@ def execute_sql(sql, db_path, sql_dialect, return_time=False):
 
 
 def iterated_execute_sql(
-    predicted_sql, ground_truth, db_path, iterate_num, sql_dialect
+    predicted_sql, ground_truth, db_path, iterate_num, sql_dialect, efficiency_mode="time"
 ):
-    diff_list = []
-    predicted_res = execute_sql(predicted_sql, db_path, sql_dialect)
-    ground_truth_res = execute_sql(ground_truth, db_path, sql_dialect)
-    reward = 0
     time_ratio = 0
-    if set(predicted_res) == set(ground_truth_res):
+    correct = results_match(predicted_sql, ground_truth, db_path, sql_dialect)
+    if efficiency_mode == "match":
+        # Correctness phase of run_sqls_isolated: the ratio is measured afterwards
+        return int(correct)
+    if correct and efficiency_mode == "steps":
+        # One counted execution each instead of the timing loop
+        time_ratio = step_ratio(predicted_sql, ground_truth, db_path, sql_dialect)
+    elif correct:
+        time_ratio = timing_ratio(predicted_sql, ground_truth, db_path, iterate_num, sql_dialect)
+    # return time_ratio
+    return reward_from_ratio(time_ratio)
+
+
+def results_match(predicted_sql, ground_truth, db_path, sql_dialect):
+    with tracing.span("execute_sql", db_path=db_path, sql_dialect=sql_dialect) as sp:
+        predicted_res = execute_sql(predicted_sql, db_path, sql_dialect)
+        ground_truth_res = execute_sql(ground_truth, db_path, sql_dialect)
+        sp.set(pred_rows=len(predicted_res), gold_rows=len(ground_truth_res))
+    return set(predicted_res) == set(ground_truth_res)
+
+
+def timing_ratio(predicted_sql, ground_truth, db_path, iterate_num, sql_dialect, warm_up=False):
+    diff_list = []
+    if warm_up:
+        # Untimed runs so the timing starts from warm page and statement caches
+        execute_sql(predicted_sql, db_path, sql_dialect)
+        execute_sql(ground_truth, db_path, sql_dialect)
+    with tracing.span("ves.timing_loop", db_path=db_path, iterate_num=iterate_num):
         for _ in range(iterate_num):
             predicted_time = execute_sql(
                 predicted_sql, db_path, sql_dialect, return_time=True
@@ -70,8 +102,23 @@ def iterated_execute_sql(
                 ground_truth, db_path, sql_dialect, return_time=True
             )
             diff_list.append(ground_truth_time / predicted_time)
-        processed_diff_list = clean_abnormal(diff_list)
-        time_ratio = sum(processed_diff_list) / len(processed_diff_list)
+    processed_diff_list = clean_abnormal(diff_list)
+    return sum(processed_diff_list) / len(processed_diff_list)
+
+
+def step_ratio(predicted_sql, ground_truth, db_path, sql_dialect):
+    """gold/predicted cost ratio from one execution of each, counted by the engine."""
+    backend = get_backend(sql_dialect)
+    with tracing.span("ves.step_count", db_path=db_path) as sp:
+        predicted_cost = backend.query_cost(predicted_sql, db_path)
+        ground_truth_cost = backend.query_cost(ground_truth, db_path)
+        sp.set(pred_cost=predicted_cost, gold_cost=ground_truth_cost)
+    # +1 keeps the ratio defined when a backend reports no work for a trivial query
+    return (ground_truth_cost + 1) / (predicted_cost + 1)
+
+
+def reward_from_ratio(time_ratio):
+    """R-VES reward bucket of a gold/predicted efficiency ratio (0 for a wrong answer)."""
     if time_ratio == 0:
         reward = 0
     elif time_ratio >= 2:
@@ -84,31 +131,46 @@ def iterated_execute_sql(
         reward = 0.5
     else:
         reward = 0.25
-    # return time_ratio
     return reward
 
 
 def execute_model(
-    predicted_sql, ground_truth, db_place, idx, iterate_num, meta_time_out, sql_dialect
+    predicted_sql, ground_truth, db_place, idx, iterate_num, meta_time_out, sql_dialect, lint=True,
+    efficiency_mode="time"
 ):
-    try:
-        # you can personalize the total timeout number
-        # larger timeout leads to more stable ves
-        # while it needs more your patience....
-        reward = func_timeout(
-            meta_time_out * iterate_num,
-            iterated_execute_sql,
-            args=(predicted_sql, ground_truth, db_place, iterate_num, sql_dialect),
-        )
-    except KeyboardInterrupt:
-        sys.exit(0)
-    except FunctionTimedOut:
-        result = [(f"timeout",)]
-        reward = 0
-    except Exception as e:
-        result = [(f"error",)]  # possibly len(query) > 512 or not executable
-        reward = 0
-    result = {"sql_idx": idx, "reward": reward}
+    with tracing.span("question", idx=idx, db_path=db_place, sql_dialect=sql_dialect):
+        # Predictions the catalog shows cannot run are scored without touching the database
+        issues = lint_sql(predicted_sql, db_place, sql_dialect) if lint else None
+        over_limit = None
+        try:
+            if issues:
+                reward = 0
+            else:
+                # you can personalize the total timeout number
+                # larger timeout leads to more stable ves
+                # while it needs more your patience....
+                reward = func_timeout(
+                    meta_time_out * iterate_num,
+                    profiling.wrap(iterated_execute_sql, profiling.database_name(db_place)),
+                    args=(predicted_sql, ground_truth, db_place, iterate_num, sql_dialect, efficiency_mode),
+                )
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except FunctionTimedOut:
+            result = [(f"timeout",)]
+            reward = 0
+        except ResultTooLarge as e:
+            # Scored as wrong without holding the whole result in memory
+            over_limit = "predicted" if e.sql == predicted_sql else "gold"
+            reward = 0
+        except Exception as e:
+            result = [(f"error",)]  # possibly len(query) > 512 or not executable
+            reward = 0
+    result = {"sql_idx": idx, "reward": reward, "lint": issues, "over_limit": over_limit}
+    if tracing.is_enabled():
+        result["spans"] = tracing.drain()
+    if profiling.is_enabled():
+        result["profile"] = profiling.drain()
     return result
 
 
@@ -119,9 +181,16 @@ def run_sqls_parallel(
     iterate_num=100,
     meta_time_out=30.0,
     sql_dialect="SQLite",
+    lint=True,
+    efficiency_mode="time",
+    indices=None,
 ):
-    pool = mp.Pool(processes=num_cpus)
+    pool = mp.Pool(
+        processes=num_cpus, initializer=init_worker, initargs=(sql_dialect, sorted(set(db_places)))
+    )
     for i, sql_pair in enumerate(sqls):
+        if indices is not None and i not in indices:
+            continue
         predicted_sql, ground_truth = sql_pair
         pool.apply_async(
             execute_model,
@@ -133,6 +202,8 @@ def run_sqls_parallel(
                 iterate_num,
                 meta_time_out,
                 sql_dialect,
+                lint,
+                efficiency_mode,
             ),
             callback=result_callback,
         )
@@ -140,6 +211,112 @@ def run_sqls_parallel(
     pool.join()
 
 
+def split_cores(timing_workers):
+    """(correctness cores, timing cores): the last timing_workers usable cores are kept for timing."""
+    # sched_getaffinity is Linux-only; elsewhere nothing is pinned
+    if not hasattr(os, "sched_getaffinity"):
+        return None, None
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) <= timing_workers:
+        return None, None
+    return set(cores[:-timing_workers]), cores[-timing_workers:]
+
+
+def init_correctness_worker(cores, sql_dialect, db_paths):
+    if cores:
+        os.sched_setaffinity(0, cores)
+    init_worker(sql_dialect, db_paths)
+
+
+def init_timing_worker(core_queue, sql_dialect, db_paths):
+    if core_queue is not None:
+        # One core per timing worker, shared with nothing else in the run
+        os.sched_setaffinity(0, {core_queue.get()})
+    init_worker(sql_dialect, db_paths)
+
+
+def time_model(predicted_sql, ground_truth, db_place, idx, iterate_num, meta_time_out, sql_dialect):
+    with tracing.span("ves.timing", idx=idx, db_path=db_place):
+        try:
+            time_ratio = func_timeout(
+                meta_time_out * iterate_num,
+                profiling.wrap(timing_ratio, profiling.database_name(db_place)),
+                args=(predicted_sql, ground_truth, db_place, iterate_num, sql_dialect, True),
+            )
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except FunctionTimedOut:
+            time_ratio = 0
+        except Exception as e:
+            time_ratio = 0
+    result = {"sql_idx": idx, "reward": reward_from_ratio(time_ratio)}
+    if tracing.is_enabled():
+        result["spans"] = tracing.drain()
+    if profiling.is_enabled():
+        result["profile"] = profiling.drain()
+    return result
+
+
+def run_sqls_isolated(
+    sqls,
+    db_places,
+    num_cpus=1,
+    iterate_num=100,
+    meta_time_out=30.0,
+    sql_dialect="SQLite",
+    lint=True,
+    timing_workers=1,
+    indices=None,
+):
+    """R-VES in two phases: num_cpus workers check correctness, and the predictions that
+    match are timed by timing_workers workers pinned to cores of their own, while the
+    checks of the remaining questions go on on the other cores."""
+    correctness_cores, timing_cores = split_cores(timing_workers)
+    core_queue = None
+    if timing_cores:
+        core_queue = mp.Queue()
+        for core in timing_cores:
+            core_queue.put(core)
+    else:
+        print(f"Cannot set {timing_workers} cores aside for timing; timing workers are not pinned")
+    db_paths = sorted(set(db_places))
+    timing_pool = mp.Pool(
+        processes=timing_workers, initializer=init_timing_worker, initargs=(core_queue, sql_dialect, db_paths)
+    )
+    check_pool = mp.Pool(
+        processes=num_cpus, initializer=init_correctness_worker, initargs=(correctness_cores, sql_dialect, db_paths)
+    )
+
+    def checked(result):
+        if not result["reward"]:
+            result_callback(result)
+            return
+        tracing.collect(result.pop("spans", []))
+        profiling.collect(result.pop("profile", []))
+        i = result["sql_idx"]
+        predicted_sql, ground_truth = sqls[i]
+        timing_pool.apply_async(
+            time_model,
+            args=(predicted_sql, ground_truth, db_places[i], i, iterate_num, meta_time_out, sql_dialect),
+            callback=lambda timed: result_callback({**result, **timed}),
+        )
+
+    for i, sql_pair in enumerate(sqls):
+        if indices is not None and i not in indices:
+            continue
+        predicted_sql, ground_truth = sql_pair
+        check_pool.apply_async(
+            execute_model,
+            args=(predicted_sql, ground_truth, db_places[i], i, iterate_num, meta_time_out, sql_dialect, lint, "match"),
+            callback=checked,
+        )
+    check_pool.close()
+    # Every check has been handed on by now, so the timing pool gets no more work
+    check_pool.join()
+    timing_pool.close()
+    timing_pool.join()
+
+
 def compute_ves(exec_results):
     num_queries = len(exec_results)
     total_reward = 0
@@ -209,9 +386,55 @@ if __name__ == "__main__":
     args_parser.add_argument("--meta_time_out", type=float, default=30.0)
     args_parser.add_argument("--diff_json_path", type=str, default="")
     args_parser.add_argument("--sql_dialect", type=str, default="SQLite")
+    args_parser.add_argument(
+        "--max_rows", type=int, default=None,
+        help="rows a query may return before it is stopped and scored as over the limit (0 = no cap)"
+    )
+    args_parser.add_argument(
+        "--max_result_mb", type=float, default=None,
+        help="approximate result size in MiB before a query is stopped (0 = no cap)"
+    )
+    args_parser.add_argument(
+        "--replica_mb", type=int, default=0,
+        help="copy SQLite databases into memory in each worker, smallest first, up to this many MiB"
+    )
+    args_parser.add_argument(
+        "--mmap_mb", type=int, default=None,
+        help="mmap window for SQLite databases read from disk (default 1024 with --replica_mb)"
+    )
+    args_parser.add_argument(
+        "--no_lint", action="store_true",
+        help="execute every prediction instead of rejecting the ones that reference unknown tables or columns"
+    )
+    args_parser.add_argument(
+        "--efficiency_mode", type=str, default="time", choices=["time", "steps"],
+        help="time: wall-clock ratio over repeated runs; steps: engine-counted cost of one run each (deterministic)"
+    )
+    args_parser.add_argument(
+        "--timing_workers", type=int, default=0,
+        help="time matching predictions in this many workers pinned to dedicated cores, apart from the "
+             "correctness checks (0 = time inside the checking workers; ignored with --efficiency_mode steps)"
+    )
+    args_parser.add_argument(
+        "--shard", type=str, default="",
+        help="evaluate only shard k of N (e.g. 2/4, balanced by estimated gold query cost) and write its "
+             "results to --shard_output for python -m evaluation.sharding merge"
+    )
+    args_parser.add_argument("--shard_output", type=str, default="", help="shard result file")
     args_parser.add_argument("--output_log_path", type=str, default="SQLite")
+    args_parser.add_argument(
+        "--trace_path", type=str, default="",
+        help="write spans to this file (.jsonl for JSONL, otherwise Chrome trace format)"
+    )
+    args_parser.add_argument(
+        "--profile", type=str, default="",
+        help="profile every question in its worker and write the merged pstats to this file, with a .txt report"
+    )
     args = args_parser.parse_args()
+    set_result_limits(args.max_rows, args.max_result_mb)
     exec_result = []
+    tracing.start(args.trace_path)
+    profiling.start(args.profile)
 
     pred_queries, db_paths = package_sqls(
         args.predicted_sql_path,
@@ -225,23 +448,62 @@ if __name__ == "__main__":
         mode="gt",
     )
     query_pairs = list(zip(pred_queries, gt_queries))
-    run_sqls_parallel(
-        query_pairs,
-        db_places=db_paths_gt,
-        num_cpus=args.num_cpus,
-        meta_time_out=args.meta_time_out,
-        sql_dialect=args.sql_dialect,
-    )
+    indices = set(select_shard(gt_queries, db_paths_gt, args.shard)) if args.shard else None
+    if args.sql_dialect == "SQLite":
+        configure_replicas(db_paths_gt, args.replica_mb, args.mmap_mb)
+    if args.timing_workers and args.efficiency_mode == "time":
+        run_sqls_isolated(
+            query_pairs,
+            db_places=db_paths_gt,
+            num_cpus=args.num_cpus,
+            meta_time_out=args.meta_time_out,
+            sql_dialect=args.sql_dialect,
+            lint=not args.no_lint,
+            indices=indices,
+            timing_workers=args.timing_workers,
+        )
+    else:
+        run_sqls_parallel(
+            query_pairs,
+            db_places=db_paths_gt,
+            num_cpus=args.num_cpus,
+            meta_time_out=args.meta_time_out,
+            sql_dialect=args.sql_dialect,
+            lint=not args.no_lint,
+            indices=indices,
+            efficiency_mode=args.efficiency_mode,
+        )
     exec_result = sort_results(exec_result)
     # print_reward_category(exec_result, args.engine, args.sql_dialect)
-    print("start calculate R-VES")
-    simple_ves, moderate_ves, challenging_ves, ves, count_lists = compute_ves_by_diff(
-        exec_result, args.diff_json_path
-    )
-    score_lists = [simple_ves, moderate_ves, challenging_ves, ves]
-    print_data(score_lists, count_lists, metric="R-VES",result_log_file=args.output_log_path)
+    if args.shard:
+        # Tables come from merging all the shards; this run only writes its own results
+        shard_path = write_shard(args.shard_output, "R-VES", args.sql_dialect, args.shard, exec_result,
+                                 args.diff_json_path, len(query_pairs))
+        print(f"Wrote {len(exec_result)} results of shard {args.shard} to {shard_path}")
+    else:
+        print("start calculate R-VES")
+        simple_ves, moderate_ves, challenging_ves, ves, count_lists = compute_ves_by_diff(
+            exec_result, args.diff_json_path
+        )
+        score_lists = [simple_ves, moderate_ves, challenging_ves, ves]
+        print_data(score_lists, count_lists, metric="R-VES",result_log_file=args.output_log_path)
+    lint_stats = LintStats()
+    for result in exec_result:
+        lint_stats.record(result.get("lint"))
+    if lint_stats.checked:
+        print(lint_stats.summary())
+    over_limit = [result["over_limit"] for result in exec_result if result.get("over_limit")]
+    if over_limit:
+        print(
+            f"Over the result limit: {over_limit.count('predicted')} predictions, "
+            f"{over_limit.count('gold')} gold queries"
+        )
     print(
         "==========================================================================================="
     )
     print(f"Finished R-VES evaluation for {args.sql_dialect} on Mini Dev set")
     print("\n\n")
+    if args.trace_path:
+        tracing.export(args.trace_path)
+    if args.profile:
+        print(f"Profile written to {args.profile}, report in {profiling.export(args.profile)}")
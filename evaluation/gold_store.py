@@ -0,0 +1,252 @@
+"""
+Precomputed gold results in a columnar, memory-mapped store.
+Every gold query is executed once and its result is written as dictionary-encoded
+columns: each distinct value gets an integer id, and the ids of each result are stored
+column by column in one .npy array. Evaluation workers open the arrays with
+mmap_mode="r", so all workers share one copy through the page cache and nothing is
+pickled per question. EX compares predictions against the pre-sorted unique gold rows
+in id space; Soft F1 reads gold rows back through the dictionary.
+
+Layout of a store directory:
+    index.npy       int64 (N, 5): cell offset, rows, columns, unique offset, unique rows
+    cells.npy       int64 value ids, column-major per result
+    unique.npy      int64 sorted unique rows of each result, column-major
+    dictionary.json distinct values as [type, value] pairs, in id order
+    meta.json       gold file hash, dialect and database versions the store was built from
+"""
+
+import os
+import json
+import base64
+import decimal
+import hashlib
+import datetime
+import multiprocessing as mp
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from func_timeout import func_timeout, FunctionTimedOut
+from evaluation.backends import get_backend
+
+# index rows value for a gold query that failed, and for a result the store cannot encode
+FAILED = -1
+NOT_STORED = -2
+
+def _encode_value(value: Any) -> List[Any]:
+    if value is None:
+        return ["n", None]
+    if isinstance(value, bool):
+        return ["i", int(value)]
+    if isinstance(value, int):
+        return ["i", value]
+    if isinstance(value, float):
+        return ["f", value]
+    if isinstance(value, str):
+        return ["s", value]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return ["b", base64.b64encode(bytes(value)).decode("ascii")]
+    if isinstance(value, decimal.Decimal):
+        return ["d", str(value)]
+    if isinstance(value, datetime.datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, datetime.date):
+        return ["da", value.isoformat()]
+    if isinstance(value, datetime.time):
+        return ["tm", value.isoformat()]
+    if isinstance(value, datetime.timedelta):
+        return ["td", value.total_seconds()]
+    raise TypeError(f"cannot store {type(value).__name__} values")
+
+def _decode_value(entry: List[Any]) -> Any:
+    kind, value = entry
+    if kind == "b":
+        return base64.b64decode(value)
+    if kind == "d":
+        return decimal.Decimal(value)
+    if kind == "dt":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "da":
+        return datetime.date.fromisoformat(value)
+    if kind == "tm":
+        return datetime.time.fromisoformat(value)
+    if kind == "td":
+        return datetime.timedelta(seconds=value)
+    return value
+
+def _fingerprint(gold_path: str, db_paths: List[str], sql_dialect: str,
+                 indices: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    with open(gold_path, "rb") as f:
+        gold_hash = hashlib.sha1(f.read()).hexdigest()
+    databases = {}
+    for path in sorted(set(db_paths)):
+        if os.path.exists(path):
+            st = os.stat(path)
+            databases[path] = [st.st_size, st.st_mtime_ns]
+    # questions: positions the store holds, None for all of them
+    questions = sorted(indices) if indices is not None else None
+    return {"gold": gold_hash, "sql_dialect": sql_dialect, "databases": databases, "questions": questions}
+
+def _gold_task(task: Tuple[int, str, str, str, float]) -> Tuple[int, Optional[List[tuple]], Optional[str]]:
+    idx, sql, db_path, sql_dialect, meta_time_out = task
+    try:
+        rows = func_timeout(meta_time_out, get_backend(sql_dialect).fetch, args=(sql, db_path))
+        return idx, [tuple(row) for row in rows], None
+    except FunctionTimedOut:
+        return idx, None, "timeout"
+    except Exception as e:
+        return idx, None, str(e)
+
+def build_gold_store(store_path: str, gold_path: str, queries: List[str], db_paths: List[str],
+                     sql_dialect: str = "SQLite", num_cpus: int = 1, meta_time_out: float = 30.0,
+                     indices: Optional[Iterable[int]] = None) -> None:
+    """Execute every gold query once and write the store. With indices (the questions of
+    one shard), only those gold queries are run and stored."""
+    ids: Dict[Any, int] = {}
+    dictionary: List[List[Any]] = []
+    index = np.zeros((len(queries), 5), dtype=np.int64)
+    index[:, 1] = NOT_STORED
+    cells: List[np.ndarray] = []
+    uniques: List[np.ndarray] = []
+    cell_offset = unique_offset = 0
+
+    positions = sorted(indices) if indices is not None else range(len(queries))
+    tasks = [(i, queries[i], db_paths[i], sql_dialect, meta_time_out) for i in positions]
+    with mp.Pool(processes=num_cpus) as pool:
+        results = sorted(pool.imap_unordered(_gold_task, tasks), key=lambda result: result[0])
+
+    for idx, rows, error in results:
+        if rows is None:
+            index[idx] = (cell_offset, FAILED, 0, unique_offset, 0)
+            continue
+        width = len(rows[0]) if rows else 0
+        try:
+            encoded = np.empty((len(rows), width), dtype=np.int64)
+            new_values = []
+            for r, row in enumerate(rows):
+                for c, value in enumerate(row):
+                    value_id = ids.get(value)
+                    if value_id is None:
+                        new_values.append(_encode_value(value))
+                        value_id = ids[value] = len(dictionary) + len(new_values) - 1
+                    encoded[r, c] = value_id
+        except TypeError:
+            for value in list(ids)[len(dictionary):]:
+                del ids[value]
+            index[idx] = (cell_offset, NOT_STORED, 0, unique_offset, 0)
+            continue
+        dictionary.extend(new_values)
+        unique = np.unique(encoded, axis=0) if len(rows) else encoded
+        index[idx] = (cell_offset, len(rows), width, unique_offset, len(unique))
+        cells.append(encoded.T.ravel())
+        uniques.append(unique.T.ravel())
+        cell_offset += encoded.size
+        unique_offset += unique.size
+
+    os.makedirs(store_path, exist_ok=True)
+    np.save(os.path.join(store_path, "index.npy"), index)
+    np.save(os.path.join(store_path, "cells.npy"), np.concatenate(cells) if cells else np.empty(0, np.int64))
+    np.save(os.path.join(store_path, "unique.npy"), np.concatenate(uniques) if uniques else np.empty(0, np.int64))
+    with open(os.path.join(store_path, "dictionary.json"), "w") as f:
+        json.dump(dictionary, f)
+    # Written last: a store without meta.json is incomplete and gets rebuilt
+    with open(os.path.join(store_path, "meta.json"), "w") as f:
+        json.dump(_fingerprint(gold_path, db_paths, sql_dialect, indices), f, indent=1)
+
+def ensure_gold_store(store_path: str, gold_path: str, queries: List[str], db_paths: List[str],
+                      sql_dialect: str = "SQLite", num_cpus: int = 1, meta_time_out: float = 30.0,
+                      indices: Optional[Iterable[int]] = None) -> bool:
+    """Build the store unless an up-to-date one holding every question in indices (all of
+    them when None) exists; returns True when it was built."""
+    meta_path = os.path.join(store_path, "meta.json")
+    wanted = _fingerprint(gold_path, db_paths, sql_dialect, indices)
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        held = meta.pop("questions", None)
+        needed = wanted.pop("questions")
+        if meta == wanted and (held is None or (needed is not None and set(needed) <= set(held))):
+            return False
+    build_gold_store(store_path, gold_path, queries, db_paths, sql_dialect, num_cpus, meta_time_out, indices)
+    return True
+
+class GoldResult:
+    """Rows of one gold result, backed by the store's memory-mapped columns.
+
+    Iterating yields the rows as tuples, so metrics written for lists of tuples work
+    unchanged; same_set compares a prediction without decoding the gold rows at all.
+    """
+
+    __slots__ = ("store", "columns", "unique")
+
+    def __init__(self, store: "GoldStore", columns: np.ndarray, unique: np.ndarray):
+        self.store = store
+        # (columns, rows) views into the mapped arrays
+        self.columns = columns
+        self.unique = unique
+
+    def __len__(self) -> int:
+        return self.columns.shape[1]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[tuple]:
+        values = self.store.values
+        for row in self.columns.T.tolist():
+            yield tuple(values[value_id] for value_id in row)
+
+    def same_set(self, predicted: List[tuple]) -> bool:
+        """set(predicted) == set(gold), compared as sorted unique value ids."""
+        if not predicted or not len(self):
+            return not predicted and not len(self)
+        width = self.columns.shape[0]
+        ids = self.store.ids
+        encoded = np.empty((len(predicted), width), dtype=np.int64)
+        for r, row in enumerate(predicted):
+            if len(row) != width:
+                return False
+            for c, value in enumerate(row):
+                value_id = ids.get(value)
+                if value_id is None:
+                    # A value that never occurs in any gold result cannot match
+                    return False
+                encoded[r, c] = value_id
+        unique = np.unique(encoded, axis=0)
+        return unique.shape == self.unique.T.shape and np.array_equal(unique, self.unique.T)
+
+class GoldStoreError(Exception):
+    """The gold query of a question failed when the store was built."""
+
+class GoldStore:
+    def __init__(self, store_path: str):
+        self.path = store_path
+        self.index = np.load(os.path.join(store_path, "index.npy"), mmap_mode="r")
+        self.cells = np.load(os.path.join(store_path, "cells.npy"), mmap_mode="r")
+        self.unique = np.load(os.path.join(store_path, "unique.npy"), mmap_mode="r")
+        with open(os.path.join(store_path, "dictionary.json"), "r") as f:
+            self.values = [_decode_value(entry) for entry in json.load(f)]
+        self.ids: Dict[Any, int] = {}
+        for value_id, value in enumerate(self.values):
+            self.ids.setdefault(value, value_id)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, idx: int) -> Optional[GoldResult]:
+        """Gold result of question idx; None when the store does not hold it."""
+        offset, rows, width, unique_offset, unique_rows = (int(v) for v in self.index[idx])
+        if rows == NOT_STORED:
+            return None
+        if rows == FAILED:
+            raise GoldStoreError(f"gold query {idx} failed when the store was built")
+        columns = self.cells[offset: offset + rows * width].reshape(width, rows)
+        unique = self.unique[unique_offset: unique_offset + unique_rows * width].reshape(width, unique_rows)
+        return GoldResult(self, columns, unique)
+
+_stores: Dict[str, GoldStore] = {}
+
+def open_gold_store(store_path: str) -> GoldStore:
+    """The store at store_path, opened once per process."""
+    store = _stores.get(store_path)
+    if store is None:
+        store = _stores[store_path] = GoldStore(store_path)
+    return store
@@ -0,0 +1,202 @@
+"""
+Foreign-key join graph with minimal join-path lookup.
+The graph of a database is built once per file version from PRAGMA foreign_key_list,
+plus inferred edges where a column is named after another table's single-column
+primary key (account.district_id -> district.district_id) or after the table itself
+(posts.user_id -> users.id). Asking for the join path that connects a set of tables is
+then a small shortest-path search over that graph, and answers are memoized.
+"""
+
+import heapq
+import itertools
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from .schema_render import read_catalog
+from .result_cache import db_version
+
+# Declared foreign keys are preferred over name-based guesses
+DECLARED_WEIGHT = 1.0
+INFERRED_WEIGHT = 1.5
+# Primary key names too common to mean two tables are related
+GENERIC_KEYS = {"id", "name", "code", "key", "type"}
+
+@dataclass(frozen=True, slots=True)
+class JoinEdge:
+    left_table: str
+    left_column: str
+    right_table: str
+    right_column: str
+    inferred: bool = False
+
+    def reversed(self) -> "JoinEdge":
+        return JoinEdge(self.right_table, self.right_column, self.left_table, self.left_column, self.inferred)
+
+    def condition(self) -> str:
+        return f"{_quote(self.left_table)}.{_quote(self.left_column)} = {_quote(self.right_table)}.{_quote(self.right_column)}"
+
+def _quote(name: str) -> str:
+    return name if name.replace("_", "").isalnum() and not name[0].isdigit() else f"`{name}`"
+
+def _singular(name: str) -> str:
+    name = name.lower()
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+class JoinGraph:
+    def __init__(self, catalog: List[Dict[str, Any]]):
+        self.tables = [table["name"] for table in catalog]
+        self._by_lower = {name.lower(): name for name in self.tables}
+        self.adjacency: Dict[str, List[JoinEdge]] = {name: [] for name in self.tables}
+        self._paths: Dict[FrozenSet[str], Tuple[List[JoinEdge], List[str]]] = {}
+
+        primary_keys = {
+            table["name"]: [col["name"] for col in table["columns"] if col["pk"]] for table in catalog
+        }
+        linked = set()
+        for table in catalog:
+            for col in table["columns"]:
+                if not col.get("fk"):
+                    continue
+                parent = self._by_lower.get(col["fk"][0].lower())
+                if parent is None:
+                    continue
+                parent_column = col["fk"][1] or (primary_keys[parent][0] if len(primary_keys[parent]) == 1 else None)
+                if parent_column:
+                    self._add(JoinEdge(table["name"], col["name"], parent, parent_column))
+                    linked.add((table["name"], col["name"]))
+
+        # Inferred edges for databases that do not declare their foreign keys
+        single_pk = {name: keys[0] for name, keys in primary_keys.items() if len(keys) == 1}
+        pk_owner: Dict[str, List[str]] = {}
+        for name, key in single_pk.items():
+            pk_owner.setdefault(key.lower(), []).append(name)
+        for table in catalog:
+            for col in table["columns"]:
+                if (table["name"], col["name"]) in linked:
+                    continue
+                lowered = col["name"].lower()
+                # Same name as another table's primary key (also links 1:1 split tables)
+                targets = []
+                if lowered not in GENERIC_KEYS:
+                    targets = [t for t in pk_owner.get(lowered, []) if t != table["name"]]
+                if not targets and lowered.endswith("id"):
+                    # <table>_id / <table>id pointing at that table's primary key
+                    stem = lowered[:-3] if lowered.endswith("_id") else lowered[:-2]
+                    targets = [
+                        t for t in single_pk
+                        if t != table["name"] and stem and _singular(t) == _singular(stem)
+                    ]
+                for target in targets[:1]:
+                    if not any(e.right_table == target for e in self.adjacency[table["name"]]):
+                        self._add(JoinEdge(table["name"], col["name"], target, single_pk[target], inferred=True))
+
+    def _add(self, edge: JoinEdge) -> None:
+        self.adjacency[edge.left_table].append(edge)
+        self.adjacency[edge.right_table].append(edge.reversed())
+
+    def resolve(self, name: str) -> Optional[str]:
+        return self._by_lower.get(name.strip(" `\"'[]").lower())
+
+    def _terminals(self, tables: List[str]) -> List[str]:
+        # Sorted so that a memoized path does not depend on the order tables were named in
+        return sorted({t for t in (self.resolve(name) for name in tables) if t})
+
+    def _nearest(self, sources: set, targets: set) -> Tuple[Optional[str], List[JoinEdge]]:
+        """Dijkstra from a set of tree nodes to the closest remaining terminal."""
+        counter = itertools.count()
+        heap = [(0.0, next(counter), node, []) for node in sorted(sources)]
+        seen = set()
+        while heap:
+            cost, _, node, path = heapq.heappop(heap)
+            if node in seen:
+                continue
+            seen.add(node)
+            if node in targets:
+                return node, path
+            for edge in self.adjacency[node]:
+                if edge.right_table not in seen:
+                    weight = INFERRED_WEIGHT if edge.inferred else DECLARED_WEIGHT
+                    heapq.heappush(heap, (cost + weight, next(counter), edge.right_table, path + [edge]))
+        return None, []
+
+    def join_path(self, tables: List[str]) -> Tuple[List[JoinEdge], List[str]]:
+        """Edges of a small tree connecting the given tables, plus the tables it cannot reach.
+
+        Terminals are attached one at a time along the cheapest path to the tree built so
+        far, which is optimal for two tables and near-optimal for the handful a query uses.
+        """
+        terminals = self._terminals(tables)
+        key = frozenset(terminals)
+        if key in self._paths:
+            return self._paths[key]
+        edges: List[JoinEdge] = []
+        unreachable: List[str] = []
+        if terminals:
+            tree = {terminals[0]}
+            remaining = set(terminals[1:]) - tree
+            while remaining:
+                reached, path = self._nearest(tree, remaining)
+                if reached is None:
+                    unreachable = sorted(remaining)
+                    break
+                for edge in path:
+                    tree.add(edge.right_table)
+                edges.extend(path)
+                remaining -= tree
+        self._paths[key] = (edges, unreachable)
+        return edges, unreachable
+
+    def join_clause(self, tables: List[str]) -> str:
+        """FROM ... JOIN ... ON ... fragment that joins the given tables."""
+        edges, _ = self.join_path(tables)
+        terminals = self._terminals(tables)
+        if not terminals:
+            return ""
+        clause = f"FROM {_quote(terminals[0])}"
+        for edge in edges:
+            clause += f"\nJOIN {_quote(edge.right_table)} ON {edge.condition()}"
+        return clause
+
+    def describe(self, tables: List[str]) -> str:
+        """Human-readable join path for prompts; empty when fewer than two tables are known."""
+        terminals = self._terminals(tables)
+        if len(terminals) < 2:
+            return ""
+        edges, unreachable = self.join_path(terminals)
+        lines = [
+            f"{edge.condition()}{'  (inferred from column names)' if edge.inferred else ''}"
+            for edge in edges
+        ]
+        if unreachable:
+            lines.append(f"No join path found to: {', '.join(unreachable)}")
+        return "\n".join(lines)
+
+_graphs: Dict[str, Tuple[Any, JoinGraph]] = {}
+
+def join_graph(db_path: str) -> JoinGraph:
+    """Join graph of a SQLite database, built once per file version."""
+    version = db_version(db_path)
+    cached = _graphs.get(db_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    graph = JoinGraph(read_catalog(db_path, sample_rows=0, use_profile=False))
+    _graphs[db_path] = (version, graph)
+    return graph
+
+def join_hint(db_path: str, tables: List[str]) -> str:
+    """Join path text for the given tables, or an empty string when there is nothing to join."""
+    return join_graph(db_path).describe(tables)
+
+def join_path_text(db_path: Optional[str], tables: str, dialect: str = "SQLite") -> str:
+    """Answer to the agents' find_join_path tool: the JOIN clause for comma-separated tables."""
+    if not db_path or dialect != "SQLite":
+        return "Join paths are only available for SQLite databases."
+    graph = join_graph(db_path)
+    names = [name for name in tables.split(",") if name.strip()]
+    _, unreachable = graph.join_path(names)
+    if unreachable:
+        return f"No join path found to: {', '.join(unreachable)}"
+    return graph.join_clause(names) or f"Unknown tables: {tables}"
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible mock chat-completions server for offline throughput testing.
+
+Answers /v1/chat/completions with canned SQL taken from a gold SQL file or a
+replay log of predictions, with configurable latency, error and rate-limit
+behaviour and optional streaming. Point a client at it with
+base_url="http://<host>:<port>/v1" and any API key. Run it with
+python -m evaluation.mock_server.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def load_canned_answers(gold_path=None, replay_path=None):
+    """Load canned SQL from a gold file (sql<TAB>db_id) or a prediction replay log."""
+    answers = []
+    if replay_path:
+        with open(replay_path, "r") as f:
+            for _, sql_str in json.load(f).items():
+                answers.append(sql_str.split("\t----- bird -----\t")[0].strip())
+    elif gold_path:
+        with open(gold_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    answers.append(line.rstrip("\n").split("\t")[0].strip())
+    return answers or ["SELECT 1"]
+
+
+class LatencyModel:
+    """Samples response latency (seconds) from a fixed, uniform or lognormal distribution."""
+
+    def __init__(self, dist="lognormal", median_ms=300.0, sigma=0.5, seed=None):
+        self.dist = dist
+        self.median = median_ms / 1000.0
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        with self.lock:
+            if self.dist == "fixed":
+                return self.median
+            if self.dist == "uniform":
+                return self.rng.uniform(0, 2 * self.median)
+            return self.rng.lognormvariate(0, self.sigma) * self.median
+
+
+class MockState:
+    def __init__(self, answers, latency, error_rate=0.0, rate_limit_rate=0.0,
+                 tokens_per_second=200.0, seed=None, max_cached_prefixes=100000):
+        self.answers = answers
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.tokens_per_second = tokens_per_second
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Prefix block hashes in least recently used order, bounded like a provider cache
+        self.seen_prefixes = OrderedDict()
+        self.max_cached_prefixes = max_cached_prefixes
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "streamed": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def roll(self):
+        """Decide the outcome of one request: 'ok', 'error' or 'rate_limited'."""
+        with self.lock:
+            r = self.rng.random()
+        if r < self.rate_limit_rate:
+            return "rate_limited"
+        if r < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def answer_for(self, prompt):
+        # The same prompt always gets the same answer, so replays are deterministic
+        digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+        return self.answers[int.from_bytes(digest[:8], "big") % len(self.answers)]
+
+    def cached_tokens(self, prompt):
+        """Simulate provider prefix caching in 128-token blocks after the first 1024 tokens."""
+        block = 128 * 4  # characters, at about four characters per token
+        # One pass over the prompt: the hash of each prefix extends the previous one
+        digest = hashlib.sha1()
+        keys = []
+        for end in range(block, len(prompt) + 1, block):
+            digest.update(prompt[end - block:end].encode("utf-8"))
+            keys.append((end, digest.copy().digest()))
+        cached = 0
+        with self.lock:
+            for end, key in keys:
+                if key in self.seen_prefixes:
+                    self.seen_prefixes.move_to_end(key)
+                    # Only an unbroken run of cached blocks from the start counts
+                    if cached == end // 4 - 128:
+                        cached = end // 4
+                else:
+                    self.seen_prefixes[key] = None
+            while len(self.seen_prefixes) > self.max_cached_prefixes:
+                self.seen_prefixes.popitem(last=False)
+        return cached if cached >= 1024 else 0
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock-sql", "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.state.stats)
+        else:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        state = self.state
+        state.count("requests")
+        time.sleep(state.latency.sample())
+
+        outcome = state.roll()
+        if outcome == "rate_limited":
+            state.count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                headers={"Retry-After": "1", "x-ratelimit-remaining-requests": "0"},
+            )
+            return
+        if outcome == "error":
+            state.count("errors")
+            self._send_json(500, {"error": {"message": "Internal server error", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+        content = state.answer_for(prompt)
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": estimate_tokens(prompt) + estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": state.cached_tokens(prompt)},
+        }
+        model = request.get("model", "mock-sql")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+        if request.get("stream"):
+            self._stream(completion_id, model, content, usage, request)
+        else:
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        state.count("ok")
+
+    def _stream(self, completion_id, model, content, usage, request):
+        self.state.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None, include_usage=False):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if include_usage:
+                payload["choices"] = []
+                payload["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            # Roughly one token per four characters, paced at tokens_per_second
+            delay = 1.0 / self.state.tokens_per_second if self.state.tokens_per_second > 0 else 0
+            for start in range(0, len(content), 4):
+                chunk({"content": content[start:start + 4]})
+                time.sleep(delay)
+            chunk({}, finish_reason="stop")
+            if (request.get("stream_options") or {}).get("include_usage"):
+                chunk({}, include_usage=True)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream early
+            pass
+
+
+def make_server(host, port, state):
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    args_parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    args_parser.add_argument("--host", type=str, default="127.0.0.1")
+    args_parser.add_argument("--port", type=int, default=8000)
+    args_parser.add_argument("--gold_path", type=str, default="")
+    args_parser.add_argument("--replay_path", type=str, default="")
+    args_parser.add_argument("--latency_dist", type=str, default="lognormal",
+                             choices=["fixed", "uniform", "lognormal"])
+    args_parser.add_argument("--latency_ms", type=float, default=300.0, help="median latency")
+    args_parser.add_argument("--latency_sigma", type=float, default=0.5)
+    args_parser.add_argument("--error_rate", type=float, default=0.0)
+    args_parser.add_argument("--rate_limit_rate", type=float, default=0.0)
+    args_parser.add_argument("--tokens_per_second", type=float, default=200.0)
+    args_parser.add_argument("--seed", type=int, default=None)
+    args_parser.add_argument("--max_cached_prefixes", type=int, default=100000,
+                             help="prompt prefix blocks remembered for cached_tokens, least recently used dropped first")
+    args = args_parser.parse_args()
+
+    state = MockState(
+        load_canned_answers(args.gold_path, args.replay_path),
+        LatencyModel(args.latency_dist, args.latency_ms, args.latency_sigma, args.seed),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+        max_cached_prefixes=args.max_cached_prefixes,
+    )
+    server = make_server(args.host, args.port, state)
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1 "
+          f"with {len(state.answers)} canned answers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline performance benchmark for the evaluators and the prompt pipeline.
+Measures, against local SQLite databases:
+
+  evaluator throughput  questions per second for EX, Soft F1 and R-VES at 1..N workers
+  schema latency        catalog read (cold), schema rendering and prompt building per database
+  Soft F1 cost          time per calculate_f1_score call as the result size grows
+  peak RSS              of the benchmark process and of its pool workers
+  import time           cold start of the evaluator CLIs (python -X importtime)
+
+Results are written as JSON. With --baseline, every metric is compared against an earlier
+run and the exit status is 1 when one of them got worse by more than --tolerance. The
+exit status is also 1 when an evaluator CLI imports one of LAZY_IMPORTS at startup:
+drivers, numpy and the LLM frameworks are only loaded by the runs that use them.
+
+Usage:
+    python -m evaluation.perf_benchmark --output bench.json
+    python -m evaluation.perf_benchmark --baseline bench.json --tolerance 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import platform
+import argparse
+import timeit
+import subprocess
+import multiprocessing as mp
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from evaluation import evaluation_ex, evaluation_f1, evaluation_ves, schema_render
+from evaluation.evaluation_utils import package_sqls
+from evaluation.prompt_builder import PromptBuilder
+from evaluation.schema_render import read_catalog, schema_prompt
+from evaluation.backends import close_backends
+
+EVALUATORS = {"ex": evaluation_ex, "f1": evaluation_f1, "ves": evaluation_ves}
+F1_SIZES = [10, 100, 1000, 10000]
+PROMPT_QUESTION = "How many users are older than 30?"
+IMPORT_TARGETS = ["evaluation.evaluation_ex", "evaluation.evaluation_f1", "evaluation.evaluation_ves",
+                  "evaluation.sharding"]
+# Packages a SQLite evaluation must start without
+LAZY_IMPORTS = ["numpy", "psycopg2", "pymysql", "autogen", "openai"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _metric(value: float, unit: str, better: str) -> Dict[str, Any]:
+    return {"value": value, "unit": unit, "better": better}
+
+def _time_call(fn: Callable[[], Any], repeat: int) -> float:
+    """Seconds per call: best of `repeat` timeit rounds, each long enough to be measurable."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def worker_counts(max_workers: int) -> List[int]:
+    """1, 2, 4, ... up to and including max_workers."""
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+def load_workload(gold_path: str, db_root_path: str, predicted_sql_path: Optional[str],
+                  queries: int) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Question pairs repeated up to `queries`; predictions default to the gold queries."""
+    gold, db_paths = package_sqls(gold_path, db_root_path, mode="gt")
+    if predicted_sql_path:
+        predicted, _ = package_sqls(predicted_sql_path, db_root_path, mode="pred")
+    else:
+        # Every prediction is correct, so R-VES also runs its timing loop for each one
+        predicted = list(gold)
+    pairs = list(zip(predicted, gold))
+    reps = max(1, -(-queries // len(pairs)))
+    return (pairs * reps)[:queries], (db_paths * reps)[:queries]
+
+def bench_evaluators(pairs: List[Tuple[str, str]], db_paths: List[str], max_workers: int,
+                     ves_iterations: int, meta_time_out: float) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, module in EVALUATORS.items():
+        for workers in worker_counts(max_workers):
+            # result_callback appends to the module's exec_result, as under __main__
+            module.exec_result = []
+            kwargs = {"iterate_num": ves_iterations} if name == "ves" else {}
+            start = time.perf_counter()
+            module.run_sqls_parallel(pairs, db_places=db_paths, num_cpus=workers,
+                                     meta_time_out=meta_time_out, **kwargs)
+            elapsed = time.perf_counter() - start
+            if len(module.exec_result) != len(pairs):
+                raise RuntimeError(f"{name}: {len(module.exec_result)} of {len(pairs)} questions finished")
+            results[f"{name}.qps.workers={workers}"] = _metric(len(pairs) / elapsed, "questions/s", "higher")
+            print(f"{name:<4} {workers:>3} workers  {len(pairs) / elapsed:10.1f} questions/s")
+    return results
+
+def bench_schema(db_paths: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for db_path in sorted(set(db_paths)):
+        db_id = os.path.splitext(os.path.basename(db_path))[0]
+
+        def cold_catalog():
+            schema_render._catalogs.clear()
+            read_catalog(db_path)
+
+        builder = PromptBuilder(lambda path: schema_prompt(path, "table"), system_text="You are a SQL expert.")
+
+        def cold_prompt():
+            schema_render._catalogs.clear()
+            builder.clear()
+            builder.build(db_path, PROMPT_QUESTION)
+
+        timings = {
+            "catalog_cold_ms": _time_call(cold_catalog, repeat),
+            "render_ms": _time_call(lambda: schema_prompt(db_path, "table"), repeat),
+            "prompt_cold_ms": _time_call(cold_prompt, repeat),
+            "prompt_warm_ms": _time_call(lambda: builder.build(db_path, PROMPT_QUESTION), repeat),
+        }
+        for key, seconds in timings.items():
+            results[f"schema.{key}.{db_id}"] = _metric(seconds * 1000, "ms", "lower")
+        print(f"schema {db_id}: " + ", ".join(f"{key} {seconds * 1000:.3f}" for key, seconds in timings.items()))
+    return results
+
+def synthetic_rows(n: int, rng: random.Random) -> List[tuple]:
+    return [(i, f"name {rng.randrange(n)}", round(rng.random() * 1000, 2)) for i in range(n)]
+
+def bench_f1(sizes: List[int], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    rng = random.Random(0)
+    for n in sizes:
+        gold = synthetic_rows(n, rng)
+        # Half of the rows differ in one column, so row matching does real work
+        predicted = [row if i % 2 else (row[0], row[1], -row[2]) for i, row in enumerate(gold)]
+        seconds = _time_call(lambda: evaluation_f1.calculate_f1_score(predicted, gold), repeat)
+        results[f"f1.call_ms.rows={n}"] = _metric(seconds * 1000, "ms", "lower")
+        print(f"soft f1 {n:>7} rows  {seconds * 1000:10.3f} ms")
+    return results
+
+def import_profile(module: str) -> Tuple[float, List[str]]:
+    """(milliseconds, top-level packages loaded) for `import module` in a fresh interpreter."""
+    code = f"import sys; before = set(sys.modules); import {module}; print(*sorted(set(sys.modules) - before))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT,
+                          capture_output=True, text=True, check=True)
+    milliseconds = 0.0
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            milliseconds = int(fields[1]) / 1000
+    return milliseconds, sorted({name.split(".")[0] for name in proc.stdout.split()})
+
+def bench_imports(repeat: int) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Import-time metrics, and the targets that load a package of LAZY_IMPORTS."""
+    results, violations = {}, []
+    for module in IMPORT_TARGETS:
+        timings = []
+        for _ in range(repeat):
+            milliseconds, packages = import_profile(module)
+            timings.append(milliseconds)
+        results[f"import.ms.{module}"] = _metric(min(timings), "ms", "lower")
+        eager = [package for package in LAZY_IMPORTS if package in packages]
+        if eager:
+            violations.append(f"{module} imports {', '.join(eager)}")
+        print(f"import {module:<28} {min(timings):8.1f} ms" + (f"  eager: {', '.join(eager)}" if eager else ""))
+    return results, violations
+
+def peak_rss() -> Dict[str, Dict[str, Any]]:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    return {
+        "rss.peak_mb.main": _metric(own, "MiB", "lower"),
+        "rss.peak_mb.worker": _metric(children, "MiB", "lower"),
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than tolerance (relative)."""
+    regressions = []
+    for name, metric in sorted(current["metrics"].items()):
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        worse = -change if metric["better"] == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {base['value']:12.3f} -> {metric['value']:12.3f} {metric['unit']:<12} {change:+7.1%}{flag}")
+    return regressions
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    metrics: Dict[str, Dict[str, Any]] = {}
+    violations: List[str] = []
+    if not args.skip_imports:
+        # First, while nothing else has warmed the page cache for this run
+        import_metrics, violations = bench_imports(args.repeat)
+        metrics.update(import_metrics)
+    pairs, db_paths = load_workload(args.ground_truth_path, args.db_root_path, args.predicted_sql_path,
+                                    args.queries)
+    if not args.skip_evaluators:
+        metrics.update(bench_evaluators(pairs, db_paths, args.max_workers, args.ves_iterations,
+                                        args.meta_time_out))
+    metrics.update(bench_schema(db_paths, args.repeat))
+    metrics.update(bench_f1(args.f1_sizes, args.repeat))
+    close_backends()
+    metrics.update(peak_rss())
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": mp.cpu_count(),
+            "queries": len(pairs),
+            "databases": sorted(set(db_paths)),
+        },
+        "metrics": metrics,
+        "import_violations": violations,
+    }
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="Benchmark the evaluators and schema prompts offline")
+    args_parser.add_argument("--ground_truth_path", type=str, default="./data/mini_dev_sqlite_gold.sql")
+    args_parser.add_argument("--db_root_path", type=str, default="./data/dev_databases/")
+    args_parser.add_argument("--predicted_sql_path", type=str, default=None,
+                             help="predictions to evaluate (default: the gold queries themselves)")
+    args_parser.add_argument("--queries", type=int, default=200,
+                             help="questions per evaluator run; the workload is repeated to reach it")
+    args_parser.add_argument("--max_workers", type=int, default=mp.cpu_count())
+    args_parser.add_argument("--ves_iterations", type=int, default=10)
+    args_parser.add_argument("--meta_time_out", type=float, default=30.0)
+    args_parser.add_argument("--repeat", type=int, default=5, help="timing rounds per latency measurement (best is kept)")
+    args_parser.add_argument("--f1_sizes", type=int, nargs="*", default=F1_SIZES)
+    args_parser.add_argument("--skip_evaluators", action="store_true")
+    args_parser.add_argument("--skip_imports", action="store_true", help="skip the import-time check")
+    args_parser.add_argument("--output", type=str, default="", help="write the results to this JSON file")
+    args_parser.add_argument("--baseline", type=str, default="", help="compare against this earlier result file")
+    args_parser.add_argument("--tolerance", type=float, default=0.25,
+                             help="relative change in the bad direction that counts as a regression")
+    args = args_parser.parse_args()
+
+    current = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+        print(f"Saved {len(current['metrics'])} metrics to {args.output}")
+    failed = False
+    if current["import_violations"]:
+        print(f"Loaded at startup but must stay lazy: {'; '.join(current['import_violations'])}")
+        failed = True
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            failed = True
+        else:
+            print(f"No regressions beyond {args.tolerance:.0%}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,251 @@
+"""
+Offline column statistics for schema prompts.
+Every table is read in a single scan that computes, per column, the null fraction, a
+distinct-count estimate (k minimum values), min/max and the most frequent values.
+Tables are profiled in parallel and each database's profile is saved next to it as
+<db_id>_profile.json, where the schema renderer picks it up for value hints.
+
+Usage:
+    python -m evaluation.profiler --db_root_path ./data/dev_databases/ --num_cpus 8
+"""
+
+import os
+import sys
+import json
+import heapq
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing as mp
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+HASH_SPACE = float(2 ** 64)
+# Longest value stored in a profile; longer TEXT values are cut
+MAX_VALUE_CHARS = 60
+
+def _short(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[: MAX_VALUE_CHARS - 3] + "..."
+    return value
+
+def _value_hash(value: Any) -> int:
+    # A stable 64-bit hash, so estimates do not depend on PYTHONHASHSEED
+    data = repr(value).encode("utf-8", "replace")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+class ColumnProfile:
+    """Streaming statistics for one column."""
+
+    def __init__(self, name: str, declared_type: str, top_k: int = 5, kmv_k: int = 256,
+                 max_tracked: int = 10000):
+        self.name = name
+        self.declared_type = declared_type
+        self.top_k = top_k
+        self.kmv_k = kmv_k
+        self.max_tracked = max_tracked
+        self.rows = 0
+        self.nulls = 0
+        self.blobs = 0
+        self.numeric = 0
+        self.num_min = None
+        self.num_max = None
+        self.text_min = None
+        self.text_max = None
+        self.counts = Counter()
+        # Max-heap (negated) of the kmv_k smallest distinct hashes
+        self._kmv: List[int] = []
+        self._kmv_set = set()
+
+    def add(self, value: Any) -> None:
+        self.rows += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, bytes):
+            self.blobs += 1
+            return
+        if isinstance(value, (int, float)):
+            self.numeric += 1
+            if self.num_min is None or value < self.num_min:
+                self.num_min = value
+            if self.num_max is None or value > self.num_max:
+                self.num_max = value
+        else:
+            if self.text_min is None or value < self.text_min:
+                self.text_min = value
+            if self.text_max is None or value > self.text_max:
+                self.text_max = value
+
+        h = _value_hash(value)
+        if h not in self._kmv_set:
+            if len(self._kmv) < self.kmv_k:
+                heapq.heappush(self._kmv, -h)
+                self._kmv_set.add(h)
+            elif h < -self._kmv[0]:
+                evicted = -heapq.heappushpop(self._kmv, -h)
+                self._kmv_set.discard(evicted)
+                self._kmv_set.add(h)
+
+        self.counts[value] += 1
+        if len(self.counts) > self.max_tracked:
+            # Keep the heaviest half; frequent values survive, counts become lower bounds
+            self.counts = Counter(dict(self.counts.most_common(self.max_tracked // 2)))
+
+    def distinct(self) -> int:
+        if len(self._kmv) < self.kmv_k:
+            return len(self._kmv)
+        kth = -self._kmv[0] / HASH_SPACE
+        return int((self.kmv_k - 1) / kth)
+
+    def to_dict(self) -> Dict[str, Any]:
+        non_null = self.rows - self.nulls
+        numeric = non_null > 0 and self.numeric >= (non_null - self.blobs) / 2
+        return {
+            "type": self.declared_type,
+            "rows": self.rows,
+            "null_fraction": self.nulls / self.rows if self.rows else 0.0,
+            "distinct": self.distinct(),
+            "min": _short(self.num_min if numeric else self.text_min),
+            "max": _short(self.num_max if numeric else self.text_max),
+            "numeric": numeric,
+            "blob": self.blobs > 0 and self.blobs == non_null,
+            "top": [[_short(value), count] for value, count in self.counts.most_common(self.top_k)],
+        }
+
+def profile_table(db_path: str, table: str, top_k: int = 5, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Profile every column of a table in one scan."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        quoted = '"' + table.replace('"', '""') + '"'
+        columns = conn.execute(f"PRAGMA table_info({quoted})").fetchall()
+        profiles = [ColumnProfile(col[1], col[2] or "", top_k=top_k) for col in columns]
+        query = f"SELECT * FROM {quoted}" + (f" LIMIT {int(max_rows)}" if max_rows else "")
+        rows = 0
+        cursor = conn.execute(query)
+        while True:
+            batch = cursor.fetchmany(10000)
+            if not batch:
+                break
+            rows += len(batch)
+            for row in batch:
+                for profile, value in zip(profiles, row):
+                    profile.add(value)
+    finally:
+        conn.close()
+    return {"rows": rows, "columns": {p.name: p.to_dict() for p in profiles}}
+
+def _profile_task(task: Tuple[str, str, int, Optional[int]]) -> Tuple[str, str, Dict[str, Any]]:
+    db_path, table, top_k, max_rows = task
+    try:
+        return db_path, table, profile_table(db_path, table, top_k, max_rows)
+    except sqlite3.Error as e:
+        return db_path, table, {"rows": 0, "columns": {}, "error": str(e)}
+
+def schema_fingerprint(db_path: str) -> str:
+    """Hash of the CREATE statements; used with the file size to detect stale profiles."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        ddl = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    finally:
+        conn.close()
+    return hashlib.sha1(repr(ddl).encode("utf-8")).hexdigest()
+
+def list_tables(db_path: str) -> List[str]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+def profile_path(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + "_profile.json"
+
+def save_profile(profile: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=1, default=str)
+
+def load_profile(db_path: str) -> Optional[Dict[str, Any]]:
+    """The saved profile of a database, or None when it is missing or stale."""
+    path = profile_path(db_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        profile = json.load(f)
+    if profile.get("size") != os.path.getsize(db_path) or profile.get("schema") != schema_fingerprint(db_path):
+        return None
+    return profile
+
+def profile_databases(db_paths: List[str], num_cpus: int = 1, top_k: int = 5,
+                      max_rows: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Profile all tables of all databases in one process pool and save each profile."""
+    tasks = [(db_path, table, top_k, max_rows) for db_path in db_paths for table in list_tables(db_path)]
+    profiles = {
+        db_path: {
+            "db_path": db_path,
+            "size": os.path.getsize(db_path),
+            "schema": schema_fingerprint(db_path),
+            "tables": {},
+        }
+        for db_path in db_paths
+    }
+    # Largest tables first so one big table does not finish last on its own
+    tasks.sort(key=lambda task: os.path.getsize(task[0]), reverse=True)
+    with mp.Pool(processes=num_cpus) as pool:
+        for db_path, table, stats in pool.imap_unordered(_profile_task, tasks):
+            profiles[db_path]["tables"][table] = stats
+            print(f"profiled {os.path.basename(db_path)}.{table}: {stats['rows']} rows")
+    for db_path, profile in profiles.items():
+        save_profile(profile, profile_path(db_path))
+    return profiles
+
+def _number(value: Any) -> str:
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+def value_hint(stats: Dict[str, Any], max_values: int = 3, max_width: Optional[int] = 40) -> str:
+    """Compact description of a column's values, e.g. "'M', 'F' (~2 distinct, 10% null)"."""
+    if stats.get("blob") or not stats.get("rows"):
+        return ""
+    parts = []
+    if stats["numeric"] and stats["min"] is not None:
+        parts.append(f"{_number(stats['min'])}..{_number(stats['max'])}")
+        extras = []
+    else:
+        values = []
+        for value, _ in stats["top"][:max_values]:
+            text = str(value)
+            if max_width is not None and len(text) > max_width:
+                text = text[: max(0, max_width - 3)] + "..."
+            values.append(repr(text))
+        parts.append(", ".join(values))
+        extras = [f"~{stats['distinct']} distinct"] if stats["distinct"] > len(values) else []
+    if stats["null_fraction"] >= 0.01:
+        extras.append(f"{stats['null_fraction']:.0%} null")
+    hint = " ".join(p for p in parts if p)
+    if extras:
+        hint += f" ({', '.join(extras)})"
+    return hint
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="Profile column statistics of BIRD databases")
+    args_parser.add_argument("--db_root_path", type=str, default="./data/dev_databases/")
+    args_parser.add_argument("--db_path", type=str, nargs="*", default=None,
+                             help="profile only these database files")
+    args_parser.add_argument("--num_cpus", type=int, default=mp.cpu_count())
+    args_parser.add_argument("--top_k", type=int, default=5)
+    args_parser.add_argument("--max_rows", type=int, default=None,
+                             help="profile at most this many rows per table")
+    args = args_parser.parse_args()
+
+    db_paths = args.db_path or [
+        os.path.join(args.db_root_path, db_id, f"{db_id}.sqlite")
+        for db_id in sorted(os.listdir(args.db_root_path))
+        if os.path.exists(os.path.join(args.db_root_path, db_id, f"{db_id}.sqlite"))
+    ]
+    if not db_paths:
+        sys.exit(f"No databases found under {args.db_root_path}")
+    profile_databases(db_paths, args.num_cpus, args.top_k, args.max_rows)
+    print(f"Saved profiles for {len(db_paths)} databases")
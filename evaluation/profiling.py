@@ -0,0 +1,170 @@
+"""
+Profiling for evaluation and generation runs.
+
+profile() runs a block under cProfile in the thread that executes it, which is what an
+outer profiler misses: evaluator work happens in pool workers, inside the threads
+func_timeout starts. Each call also records the SQLite VM steps its queries ran and the
+Python allocation peak while it ran. Records are shipped out of pool workers with their
+results (drain/collect, like tracing spans) and export() merges them into one pstats file
+plus a text report broken down per database.
+
+Profiling is only active when enabled (start() or the BIRD_PROFILE environment variable,
+which worker processes inherit); otherwise profile() does nothing.
+"""
+
+import io
+import os
+import time
+import pstats
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .backends import vm_steps, reset_vm_steps
+
+_enabled = False
+_records: List[Dict[str, Any]] = []
+
+def is_enabled() -> bool:
+    return _enabled
+
+def start(path: Optional[str]) -> None:
+    """Enable profiling for this process and any worker processes it starts."""
+    global _enabled
+    if path:
+        os.environ["BIRD_PROFILE"] = path
+        # SQLite connections opened from now on count their VM steps, per 1000
+        os.environ.setdefault("BIRD_SQLITE_COUNT_STEPS", "1000")
+        _enabled = True
+
+def enable_from_env() -> None:
+    global _enabled
+    if os.environ.get("BIRD_PROFILE"):
+        _enabled = True
+
+def database_name(db_path: str) -> str:
+    """Group key for a database file: its file name without the extension."""
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+@contextmanager
+def profile(group: str, name: str = "call") -> Iterator[None]:
+    """Profile the block; group is the key of the per-database breakdown."""
+    if not _enabled:
+        yield
+        return
+    # Imported here so that runs without profiling do not load them
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        profiling = True
+    except ValueError:
+        # Python 3.12+ allows one active profiler at a time; concurrent calls go unprofiled
+        profiling = False
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    reset_vm_steps()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start_time
+        stats = {}
+        if profiling:
+            profiler.disable()
+            profiler.create_stats()
+            stats = profiler.stats
+        _records.append({
+            "group": group,
+            "name": name,
+            "pid": os.getpid(),
+            "seconds": seconds,
+            "vm_steps": vm_steps(),
+            # Process-wide: other threads allocating at the same time are included
+            "alloc_peak": tracemalloc.get_traced_memory()[1],
+            "stats": stats,
+        })
+
+def wrap(func: Callable[..., Any], group: str, name: Optional[str] = None) -> Callable[..., Any]:
+    """func run under profile(); pass this to func_timeout so the profile covers its thread."""
+    if not _enabled:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with profile(group, name or func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def drain() -> List[Dict[str, Any]]:
+    """Return and clear the records of this process (used to ship them out of pool workers)."""
+    records = list(_records)
+    del _records[:]
+    return records
+
+def collect(records: List[Dict[str, Any]]) -> None:
+    """Add records made in another process."""
+    _records.extend(records)
+
+class _RawStats:
+    """Adapter that lets pstats.Stats load a raw cProfile stats dict."""
+
+    def __init__(self, stats: Dict[Any, Any]):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+def merge_stats(records: List[Dict[str, Any]]) -> Optional[pstats.Stats]:
+    merged = None
+    for record in records:
+        if not record["stats"]:
+            continue
+        if merged is None:
+            # Stats adopts the dict it loads and adds into it, so start from a copy
+            merged = pstats.Stats(_RawStats(dict(record["stats"])))
+        else:
+            merged.add(_RawStats(record["stats"]))
+    return merged
+
+def _top(stats: Optional[pstats.Stats], sort: str, limit: int) -> str:
+    if stats is None:
+        return "  (no profile data)\n"
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def report(records: List[Dict[str, Any]], limit: int = 25, group_limit: int = 10) -> str:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(record["group"], []).append(record)
+    lines = [
+        f"Profile: {len(records)} calls in {len({r['pid'] for r in records})} processes, "
+        f"{sum(r['seconds'] for r in records):.2f}s profiled",
+        "",
+        f"{'database':<28} {'calls':>6} {'seconds':>9} {'vm steps':>14} {'max steps':>12} {'max alloc MiB':>14}",
+    ]
+    for group, items in sorted(groups.items(), key=lambda item: -sum(r["seconds"] for r in item[1])):
+        lines.append(
+            f"{group:<28} {len(items):>6} {sum(r['seconds'] for r in items):>9.2f} "
+            f"{sum(r['vm_steps'] for r in items):>14} {max(r['vm_steps'] for r in items):>12} "
+            f"{max(r['alloc_peak'] for r in items) / 2 ** 20:>14.1f}"
+        )
+    lines += ["", "Top functions, all databases (cumulative time):", _top(merge_stats(records), "cumulative", limit)]
+    for group, items in sorted(groups.items()):
+        lines += [f"Top functions, {group} (own time):", _top(merge_stats(items), "tottime", group_limit)]
+    return "\n".join(lines)
+
+def export(path: str, records: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Write the merged profile to path (pstats format) and the report next to it as .txt."""
+    records = _records if records is None else records
+    merged = merge_stats(records)
+    if merged is not None:
+        merged.dump_stats(path)
+    report_path = os.path.splitext(path)[0] + ".txt"
+    with open(report_path, "w") as f:
+        f.write(report(records))
+    return report_path
+
+enable_from_env()
@@ -0,0 +1,75 @@
+"""
+Prompt assembly with a byte-stable per-database prefix.
+The long static part of every prompt (system text + schema) is built once per
+database and memoized, and question-specific parts are appended after it, so
+provider-side prefix caching can reuse the prefix across questions.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+class PromptBuilder:
+    """Builds prompts as a memoized per-database prefix followed by question parts."""
+
+    def __init__(self, schema_fn: Callable[[str], str], system_text: str = "", separator: str = "\n\n"):
+        self.schema_fn = schema_fn
+        self.system_text = system_text
+        self.separator = separator
+        self._prefixes: Dict[str, str] = {}
+
+    def prefix(self, db_path: str) -> str:
+        """Return the static prefix for a database, building it on first use."""
+        cached = self._prefixes.get(db_path)
+        if cached is None:
+            parts = [self.system_text, self.schema_fn(db_path)]
+            cached = self.separator.join(part for part in parts if part) + self.separator
+            self._prefixes[db_path] = cached
+        return cached
+
+    def build(self, db_path: str, *parts: Optional[str]) -> str:
+        """Append the question-specific parts to the database prefix."""
+        return self.prefix(db_path) + self.separator.join(part for part in parts if part)
+
+    def clear(self) -> None:
+        self._prefixes.clear()
+
+def _usage_field(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+class PromptCacheStats:
+    """Accumulates provider prompt-cache hits from API usage responses."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        # record() is called from the self-consistency and gpt_request.py worker threads
+        self._lock = threading.Lock()
+
+    def record(self, usage: Any) -> int:
+        """Record one response's usage block and return its cached token count."""
+        prompt_tokens = _usage_field(usage, "prompt_tokens") or 0
+        details = _usage_field(usage, "prompt_tokens_details")
+        cached_tokens = _usage_field(details, "cached_tokens") or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        return cached_tokens
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def summary(self) -> str:
+        with self._lock:
+            requests, prompt_tokens, cached_tokens = self.requests, self.prompt_tokens, self.cached_tokens
+        hit_rate = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+        return (
+            f"Prompt cache: {cached_tokens}/{prompt_tokens} prompt tokens cached "
+            f"({hit_rate * 100:.1f}%) over {requests} requests"
+        )
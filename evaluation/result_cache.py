@@ -0,0 +1,175 @@
+"""
+Query-result cache for agent and chat executions.
+Results are kept in a byte-bounded LRU keyed by the database content version
+(path, size and modification time of the file and its WAL) and a canonical form of
+the SQL, so re-running the same query against an unchanged database is free.
+Entries for a database are dropped as soon as its file changes.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Rows measured when estimating the memory footprint of a result
+SIZE_SAMPLE_ROWS = 200
+
+# Quoted literals and identifiers are kept (group 1); runs of comments and whitespace match
+# outside them only, since the scan moves past each literal before looking further
+_QUOTED_OR_SPACE = re.compile(
+    r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])|(?:--[^\n]*|/\*.*?(?:\*/|$)|\s+)+", re.DOTALL
+)
+
+def canonical_sql(sql: str) -> str:
+    """Canonical cache key for a query: comments removed, whitespace collapsed outside
+    quoted literals and identifiers, trailing semicolons dropped. Case is kept, since
+    string literals are case-sensitive."""
+    sql = _QUOTED_OR_SPACE.sub(lambda m: m.group(1) or " ", sql)
+    return sql.strip().rstrip(";").strip()
+
+def db_version(db_path: str) -> Tuple[Any, ...]:
+    """Content version of a SQLite database; changes whenever the file (or its WAL) is written."""
+    st = os.stat(db_path)
+    version = (st.st_mtime_ns, st.st_size)
+    try:
+        wal = os.stat(db_path + "-wal")
+        version += (wal.st_mtime_ns, wal.st_size)
+    except OSError:
+        pass
+    return version
+
+def estimate_bytes(rows: List[tuple]) -> int:
+    """Approximate memory held by a result set, extrapolated from a sample of rows."""
+    if not rows:
+        return sys.getsizeof(rows)
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    sample_bytes = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample
+    )
+    return sys.getsizeof(rows) + sample_bytes * len(rows) // len(sample)
+
+class ResultCache:
+    """Thread-safe LRU of query results bounded by their estimated size in bytes."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        # A single result may take at most a quarter of the cache by default
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._entries = OrderedDict()
+        self._versions: Dict[str, Tuple[Any, ...]] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key(self, db_path: str, sql: str, namespace: str) -> Tuple[str, Tuple[Any, ...], str, str]:
+        path = os.path.realpath(db_path)
+        version = db_version(path)
+        if self._versions.get(path, version) != version:
+            self._invalidate(path)
+        self._versions[path] = version
+        return (path, version, namespace, canonical_sql(sql))
+
+    def _invalidate(self, path: str) -> None:
+        stale = [key for key in self._entries if key[0] == path]
+        for key in stale:
+            self.bytes -= self._entries.pop(key)[1]
+        self.invalidations += len(stale)
+
+    def get(self, db_path: str, sql: str, namespace: str = "rows") -> Optional[Any]:
+        """Cached value for a query, or None. Callers that cache something other than
+        the plain row list (e.g. rows plus column names) use their own namespace."""
+        with self._lock:
+            key = self._key(db_path, sql, namespace)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, db_path: str, sql: str, value: Any, namespace: str = "rows",
+            size: Optional[int] = None) -> bool:
+        """Store a result; returns False when it is too large to cache."""
+        if size is None:
+            size = estimate_bytes(value)
+        if size > self.max_entry_bytes:
+            return False
+        with self._lock:
+            key = self._key(db_path, sql, namespace)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return True
+
+    def get_or_execute(self, db_path: str, sql: str, execute: Callable[[], List[tuple]]) -> List[tuple]:
+        """Return the cached result, or run execute() and cache what it returns.
+
+        Exceptions from execute() propagate and are never cached, so timeouts and
+        transient errors are retried on the next call.
+        """
+        rows = self.get(db_path, sql)
+        if rows is None:
+            rows = execute()
+            self.put(db_path, sql, rows)
+        return rows
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"Result cache: {s['hits']} hits / {s['hits'] + s['misses']} lookups "
+            f"({s['hit_rate']:.1%}), {s['entries']} entries, {s['bytes'] / 2**20:.1f}/"
+            f"{s['max_bytes'] / 2**20:.0f} MiB, {s['evictions']} evicted, {s['invalidations']} invalidated"
+        )
+
+_default_cache: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+def default_cache() -> Optional[ResultCache]:
+    """Process-wide cache sized by BIRD_RESULT_CACHE_MB (default 64); 0 disables caching."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                megabytes = float(os.environ.get("BIRD_RESULT_CACHE_MB", "64"))
+                if megabytes <= 0:
+                    return None
+                _default_cache = ResultCache(int(megabytes * 1024 * 1024))
+    return _default_cache
+
+def cached_execute(db_path: str, sql: str, execute: Callable[[], List[tuple]]) -> List[tuple]:
+    """Run execute() through the process-wide cache (or directly when caching is disabled)."""
+    cache = default_cache()
+    if cache is None:
+        return execute()
+    return cache.get_or_execute(db_path, sql, execute)
@@ -0,0 +1,131 @@
+"""
+Difficulty-aware model cascade.
+Questions are bucketed locally (no LLM call) from question features and the size of
+the schema they touch. Easy questions go to a fast, cheap model and are escalated to
+the larger model only when the fast model's query fails validation.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+DIFFICULTY_LEVELS = ["simple", "moderate", "challenging"]
+
+# Phrases that usually mean aggregation, arithmetic or ranking in the gold SQL
+COMPLEX_PHRASES = [
+    "percentage", "percent", "ratio", "proportion", "rate", "average", "difference",
+    "how many more", "how much more", "times", "compare", "increase", "decrease",
+    "highest", "lowest", "most", "least", "top", "rank", "each", "per", "consecutive",
+    "between", "at least", "more than", "less than", "total", "sum",
+]
+
+def schema_columns(schema: str) -> Dict[str, List[str]]:
+    """Map table name -> column names for 'Table:/Columns:', compact or CREATE TABLE schema text."""
+    tables = {}
+    for block in re.split(r"\n\s*\n", schema):
+        match = re.search(r"^Table:\s*(\S+)", block, re.MULTILINE)
+        if match:
+            columns = re.search(r"^Columns:\s*(.*)$", block, re.MULTILINE)
+            names = [col.split()[0] for col in columns.group(1).split(",") if col.strip()] if columns else []
+            tables[match.group(1)] = names
+            continue
+        match = re.match(r"\s*`?([\w ]+?)`?\((.*)\)\s*$", block.split("\n")[0])
+        if match:
+            # Compact format: table(col:type pk, col:type -> other.col)
+            tables[match.group(1)] = [name.strip("`") for name in re.findall(r"(`[^`]+`|\w+):", match.group(2))]
+            continue
+        match = re.search(r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?[`\"\[]?([\w ]+?)[`\"\]]?\s*\(", block, re.IGNORECASE)
+        if match:
+            body = block[match.end():]
+            names = re.findall(r"^\s*[`\"\[]?(\w[\w ]*?)[`\"\]]?\s+\w+", body, re.MULTILINE)
+            tables[match.group(1).strip()] = [
+                name for name in names if name.upper() not in ("PRIMARY", "FOREIGN", "UNIQUE", "CONSTRAINT", "CHECK")
+            ]
+    return tables
+
+def relevant_tables(question: str, evidence: str, schema: str) -> List[str]:
+    """Tables whose name or one of whose columns is mentioned in the question or evidence."""
+    text = f"{question} {evidence}".lower()
+    words = set(re.findall(r"\w+", text))
+    relevant = []
+    for table, columns in schema_columns(schema).items():
+        # Table names also match in the singular ("user" for users)
+        names = [table, table[:-1] if table.lower().endswith("s") else table] + columns
+        if any(_mentions(name.lower(), words, text) for name in names):
+            relevant.append(table)
+    return relevant
+
+def _mentions(name: str, words: set, text: str) -> bool:
+    if name in words:
+        return True
+    # Multi-word names ("free_meal_count") must appear as a whole phrase
+    phrase = name.replace("_", " ")
+    return " " in phrase and re.search(r"\b" + re.escape(phrase) + r"\b", text) is not None
+
+def question_features(question: str, evidence: str = "", schema: str = "") -> Dict[str, Any]:
+    text = f"{question} {evidence}".lower()
+    return {
+        "words": len(question.split()),
+        "complex_phrases": sum(1 for phrase in COMPLEX_PHRASES if re.search(r"\b" + re.escape(phrase) + r"\b", text)),
+        "evidence_formula": len(re.findall(r"[=/*+]|\bdivide\b|\bsubtract\b", evidence or "")),
+        "numbers": len(re.findall(r"\b\d+(?:\.\d+)?\b", question)),
+        "tables": len(relevant_tables(question, evidence, schema)) if schema else 0,
+    }
+
+def estimate_difficulty(question: str, evidence: str = "", schema: str = "") -> str:
+    """Estimate the BIRD difficulty bucket of a question from local features only."""
+    features = question_features(question, evidence, schema)
+    score = (
+        features["complex_phrases"]
+        + 0.5 * features["evidence_formula"]
+        + (1 if features["words"] > 25 else 0)
+        + max(0, features["tables"] - 1)
+    )
+    if score <= 1:
+        return "simple"
+    if score <= 3:
+        return "moderate"
+    return "challenging"
+
+class CascadeRouter:
+    """Routes questions to a fast model first and escalates to a strong model on failure."""
+
+    def __init__(self, fast_model: str, strong_model: str, fast_levels=("simple", "moderate")):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.fast_levels = set(fast_levels)
+        self.stats = Counter()
+        # run() is called from the worker threads of gpt_request.py
+        self._lock = threading.Lock()
+
+    def choose_model(self, difficulty: str) -> str:
+        return self.fast_model if difficulty in self.fast_levels else self.strong_model
+
+    def run(self, question: str, evidence: str, schema: str,
+            generate: Callable[[str], str], accept: Callable[[str], bool]) -> Dict[str, Any]:
+        """Generate with the routed model, escalating once if accept() rejects the result.
+
+        generate(model) returns a SQL query; accept(sql) returns True when the query
+        passes validation (or self-consistency) and does not need the larger model.
+        """
+        difficulty = estimate_difficulty(question, evidence, schema)
+        model = self.choose_model(difficulty)
+        sql = generate(model)
+        escalated = False
+        if model != self.strong_model and not accept(sql):
+            escalated = True
+            model = self.strong_model
+            sql = generate(model)
+        with self._lock:
+            self.stats[f"difficulty:{difficulty}"] += 1
+            self.stats[f"model:{model}"] += 1
+            self.stats["escalated"] += int(escalated)
+        return {"sql": sql, "model": model, "difficulty": difficulty, "escalated": escalated}
+
+    def summary(self) -> str:
+        with self._lock:
+            stats = dict(self.stats)
+        total = sum(v for k, v in stats.items() if k.startswith("model:"))
+        parts = [f"{k.split(':', 1)[1]}={v}" for k, v in sorted(stats.items()) if k.startswith("model:")]
+        return f"Router: {total} questions ({', '.join(parts)}), {stats.get('escalated', 0)} escalated"
@@ -0,0 +1,281 @@
+"""
+Token-budgeted schema serialization.
+A SQLite catalog (columns, keys, foreign keys and a few sample rows) is read once per
+database version and rendered in one of several formats:
+
+  ddl      CREATE TABLE statements, with sample rows in a comment
+  table    'Table: / Columns: / Sample data:' blocks (the agents' schema format)
+  compact  users(id:INTEGER pk, name:TEXT, team_id:INTEGER -> teams.id)
+
+When the database has been profiled (python -m evaluation.profiler), representative
+value hints from the saved column statistics replace the first-rows samples.
+
+Long cells are truncated. When a token budget is given the output degrades step by step
+until it fits: fewer sample rows, no sample rows or value hints, then the least relevant
+columns, then the least relevant tables. Key and foreign-key columns are kept as long as
+possible.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .result_cache import db_version
+from .profiler import load_profile, value_hint
+from .tracing import span
+
+SCHEMA_FORMATS = ["ddl", "table", "compact"]
+
+_catalogs: Dict[Tuple[str, int], Tuple[Tuple[Any, ...], List[Dict[str, Any]]]] = {}
+_catalogs_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English and SQL)."""
+    return (len(text) + 3) // 4
+
+def quote_identifier(name: str) -> str:
+    return name if re.fullmatch(r"[A-Za-z_]\w*", name) else f"`{name}`"
+
+def truncate_value(value: Any, max_width: Optional[int] = None) -> Any:
+    """Shorten long TEXT cells and replace BLOBs by their size, keeping other values as is."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<blob {len(value)} bytes>"
+    if max_width is not None and isinstance(value, str) and len(value) > max_width:
+        return value[: max(0, max_width - 3)] + "..."
+    return value
+
+def read_catalog(db_path: str, sample_rows: int = 3, use_profile: bool = True) -> List[Dict[str, Any]]:
+    """Tables of a SQLite database with columns, foreign keys and sample rows.
+
+    With a saved profile, columns carry their statistics under "stats" and no sample
+    rows are read. The result is memoized per database file version, so repeated
+    prompts for the same database do not touch it again.
+    """
+    path = os.path.realpath(db_path)
+    version = db_version(path)
+    key = (path, sample_rows, use_profile)
+    with _catalogs_lock:
+        cached = _catalogs.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    profile = load_profile(path) if use_profile else None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )
+        catalog = []
+        for name, create_sql in cursor.fetchall():
+            quoted = '"' + name.replace('"', '""') + '"'
+            columns = [
+                {"name": col[1], "type": col[2] or "", "notnull": bool(col[3]), "pk": col[5] > 0}
+                for col in cursor.execute(f"PRAGMA table_info({quoted})").fetchall()
+            ]
+            foreign_keys = {}
+            for fk in cursor.execute(f"PRAGMA foreign_key_list({quoted})").fetchall():
+                # Columns without an explicit target refer to the parent's primary key
+                foreign_keys[fk[3]] = (fk[2], fk[4])
+            table_stats = profile["tables"].get(name, {}).get("columns", {}) if profile else {}
+            for column in columns:
+                column["fk"] = foreign_keys.get(column["name"])
+                column["stats"] = table_stats.get(column["name"])
+            samples = []
+            if sample_rows and profile is None:
+                try:
+                    samples = cursor.execute(f"SELECT * FROM {quoted} LIMIT {int(sample_rows)}").fetchall()
+                except sqlite3.Error:
+                    samples = []
+            catalog.append({"name": name, "sql": create_sql, "columns": columns, "samples": samples})
+    finally:
+        conn.close()
+
+    with _catalogs_lock:
+        _catalogs[key] = (version, catalog)
+    return catalog
+
+def _column_relevance(column: Dict[str, Any], words: set, text: str) -> int:
+    # Columns named in the question outrank join keys, which outrank everything else
+    score = 0
+    if column["pk"] or column["fk"]:
+        score += 4
+    name = column["name"].lower()
+    if name in words or name.replace("_", " ") in text:
+        score += 5
+    elif any(part in words for part in re.findall(r"[a-z]{3,}", name)):
+        score += 1
+    return score
+
+def _table_relevance(table: Dict[str, Any], words: set, text: str) -> int:
+    name = table["name"].lower()
+    score = 3 if name in words or name.replace("_", " ") in text else 0
+    return score + sum(1 for col in table["columns"] if col["name"].lower() in words)
+
+def _render_rows(rows: List[tuple], keep: List[int], max_width: Optional[int]) -> List[str]:
+    return [str(tuple(truncate_value(row[i], max_width) for i in keep)) for row in rows]
+
+def _render_table(table: Dict[str, Any], fmt: str, keep: List[int], sample_rows: int,
+                  max_width: Optional[int], value_hints: bool = True) -> str:
+    columns = [table["columns"][i] for i in keep]
+    hidden = len(table["columns"]) - len(keep)
+    rows = _render_rows(table["samples"][:sample_rows], keep, max_width) if sample_rows else []
+    name = table["name"]
+    hints = {}
+    if value_hints:
+        for col in columns:
+            hint = value_hint(col["stats"], max_width=max_width) if col.get("stats") else ""
+            if hint:
+                hints[col["name"]] = hint
+
+    if fmt == "compact":
+        parts = []
+        for col in columns:
+            part = f"{quote_identifier(col['name'])}:{col['type'] or 'ANY'}"
+            if col["pk"]:
+                part += " pk"
+            if col["fk"]:
+                part += f" -> {col['fk'][0]}.{col['fk'][1] or 'pk'}"
+            if col["name"] in hints:
+                part += f" [{hints[col['name']]}]"
+            parts.append(part)
+        if hidden:
+            parts.append(f"...{hidden} more")
+        text = f"{quote_identifier(name)}({', '.join(parts)})"
+        if rows:
+            text += "\n  e.g. " + "\n  e.g. ".join(rows)
+        return text
+
+    if fmt == "table":
+        column_info = [
+            f"{col['name']} {col['type']} {'PRIMARY KEY' if col['pk'] else ''}".strip()
+            for col in columns
+        ]
+        if hidden:
+            column_info.append(f"... {hidden} more columns")
+        text = f"Table: {name}\nColumns: {', '.join(column_info)}"
+        if hints:
+            text += "\nValues: " + "; ".join(f"{col}: {hint}" for col, hint in hints.items())
+        if sample_rows and table["samples"]:
+            text += "\nSample data:\n" + "\n".join(rows)
+        return text
+
+    # ddl: the original CREATE statement while every column is shown, rebuilt otherwise
+    if not hidden and table["sql"]:
+        text = table["sql"]
+    else:
+        lines = []
+        for col in columns:
+            line = f"    {quote_identifier(col['name'])} {col['type']}".rstrip()
+            if col["pk"]:
+                line += " PRIMARY KEY"
+            if col["fk"]:
+                line += f" REFERENCES {quote_identifier(col['fk'][0])}"
+                if col["fk"][1]:
+                    line += f"({quote_identifier(col['fk'][1])})"
+            lines.append(line)
+        if hidden:
+            lines.append(f"    -- {hidden} more columns")
+        text = f"CREATE TABLE {quote_identifier(name)}\n(\n" + ",\n".join(lines) + "\n)"
+    if hints:
+        text += "\n/* column values:\n" + "\n".join(f"{col}: {hint}" for col, hint in hints.items()) + "\n*/"
+    if rows:
+        text += f"\n/* {len(rows)} example rows:\n" + "\n".join(rows) + "\n*/"
+    return text
+
+def render_catalog(catalog: List[Dict[str, Any]], fmt: str = "compact", sample_rows: int = 3,
+                   max_cell_width: Optional[int] = 40,
+                   kept_columns: Optional[Dict[str, List[int]]] = None,
+                   tables: Optional[List[str]] = None, value_hints: bool = True) -> str:
+    """Render a catalog without any budget; kept_columns and tables restrict the output."""
+    if fmt not in SCHEMA_FORMATS:
+        raise ValueError(f"Unsupported schema format: {fmt}")
+    blocks = []
+    for table in catalog:
+        if tables is not None and table["name"] not in tables:
+            continue
+        keep = (kept_columns or {}).get(table["name"], list(range(len(table["columns"]))))
+        blocks.append(_render_table(table, fmt, keep, sample_rows, max_cell_width, value_hints))
+    return "\n\n".join(blocks)
+
+def render_schema(catalog: List[Dict[str, Any]], fmt: str = "compact", token_budget: Optional[int] = None,
+                  sample_rows: int = 3, max_cell_width: Optional[int] = 40,
+                  question: str = "", evidence: str = "") -> str:
+    """Render a catalog within token_budget, degrading as little as possible.
+
+    Relevance of columns and tables is judged from the question and evidence when they
+    are given; key columns always rank first.
+    """
+    with span("render_schema", format=fmt, token_budget=token_budget) as sp:
+        fits = lambda text: token_budget is None or estimate_tokens(text) <= token_budget
+
+        # 1. Everything, then fewer sample rows, then none, then no value hints either
+        levels = [(rows, True) for rows in sorted({sample_rows, min(sample_rows, 1), 0}, reverse=True)]
+        if any(col.get("stats") for table in catalog for col in table["columns"]):
+            levels.append((0, False))
+        for rows, hints in levels:
+            text = render_catalog(catalog, fmt, rows, max_cell_width, value_hints=hints)
+            if fits(text):
+                sp.set(tokens=estimate_tokens(text), level=f"samples={rows},hints={hints}")
+                return text
+
+        text_lower = f"{question} {evidence}".lower()
+        words = set(re.findall(r"\w+", text_lower))
+
+        # 2. Drop the least relevant columns (last ones first among equals)
+        droppable = sorted(
+            (
+                (_column_relevance(col, words, text_lower), -index, table["name"], index)
+                for table in catalog
+                for index, col in enumerate(table["columns"])
+            ),
+        )
+        # Every table keeps at least its first column
+        droppable = [d for d in droppable if d[3] != 0]
+
+        def kept_after(dropped: int) -> Dict[str, List[int]]:
+            removed = {(name, index) for _, _, name, index in droppable[:dropped]}
+            return {
+                table["name"]: [i for i in range(len(table["columns"])) if (table["name"], i) not in removed]
+                for table in catalog
+            }
+
+        lo, hi = 1, len(droppable)
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            text = render_catalog(catalog, fmt, 0, max_cell_width, kept_after(mid), value_hints=False)
+            if fits(text):
+                best, hi = (mid, text), mid - 1
+            else:
+                lo = mid + 1
+        if best is not None:
+            sp.set(tokens=estimate_tokens(best[1]), level=f"columns_dropped={best[0]}")
+            return best[1]
+
+        # 3. Keep only the most relevant tables (at least one)
+        kept = kept_after(len(droppable))
+        ranked = [
+            table["name"] for table in sorted(
+                catalog, key=lambda t: _table_relevance(t, words, text_lower), reverse=True
+            )
+        ]
+        for count in range(len(ranked) - 1, 0, -1):
+            text = render_catalog(catalog, fmt, 0, max_cell_width, kept, ranked[:count], value_hints=False)
+            if fits(text):
+                sp.set(tokens=estimate_tokens(text), level=f"tables={count}")
+                return text
+
+        # 4. Hard cut so the budget is never exceeded
+        text = render_catalog(catalog, fmt, 0, max_cell_width, kept, ranked[:1], value_hints=False)
+        text = text[: max(0, token_budget * 4 - 4)].rstrip() + "\n..."
+        sp.set(tokens=estimate_tokens(text), level="truncated")
+        return text
+
+def schema_prompt(db_path: str, fmt: str = "compact", token_budget: Optional[int] = None,
+                  sample_rows: int = 3, max_cell_width: Optional[int] = 40,
+                  question: str = "", evidence: str = "") -> str:
+    """Read and render the schema of a SQLite database."""
+    catalog = read_catalog(db_path, sample_rows)
+    return render_schema(catalog, fmt, token_budget, sample_rows, max_cell_width, question, evidence)
@@ -0,0 +1,80 @@
+"""
+Execution-based self-consistency for SQL generation.
+Candidate queries are executed in parallel against a read-only connection and the
+final query is chosen by majority vote over result fingerprints.
+"""
+
+import re
+import time
+import hashlib
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from .result_cache import cached_execute
+from .sql_lint import lint_sql
+
+def extract_sql(text: str) -> str:
+    """Extract the SQL statement from a model response."""
+    if not text:
+        return ""
+    if "FINAL SQL QUERY:" in text:
+        text = text.split("FINAL SQL QUERY:")[-1]
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1)
+    return text.strip().rstrip(";").strip()
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """Open a read-only SQLite connection that can be shared across threads."""
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+def result_fingerprint(rows: List[tuple]) -> str:
+    """Order-insensitive fingerprint of a result set (set semantics, like EX)."""
+    canonical = sorted(repr(tuple(row)) for row in set(rows))
+    return hashlib.sha1("\n".join(canonical).encode("utf-8")).hexdigest()
+
+def execute_candidate(sql: str, db_path: str, timeout: float = 30.0) -> Optional[str]:
+    """Execute a candidate query and return its result fingerprint, or None on failure."""
+    if not sql or lint_sql(sql, db_path):
+        # Candidates that reference unknown tables or columns cannot take part in the vote
+        return None
+
+    def run():
+        deadline = time.monotonic() + timeout
+        conn = connect_readonly(db_path)
+        # Abort long-running candidates instead of letting them hold up the vote
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    try:
+        return result_fingerprint(cached_execute(db_path, sql, run))
+    except sqlite3.Error:
+        # The candidate failed or ran out of time; anything else is a bug and is raised
+        return None
+
+def vote(candidates: List[str], db_path: str, max_workers: Optional[int] = None,
+         timeout: float = 30.0) -> Dict[str, Any]:
+    """Pick the candidate whose execution result is shared by the most candidates.
+
+    Ties are broken in favour of the group whose first member was generated earliest.
+    If no candidate executes, the first non-empty candidate is returned with zero votes.
+    """
+    max_workers = max_workers or max(1, len(candidates))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fingerprints = list(executor.map(
+            lambda sql: execute_candidate(sql, db_path, timeout), candidates
+        ))
+
+    counts = Counter(fp for fp in fingerprints if fp is not None)
+    if not counts:
+        fallback = next((sql for sql in candidates if sql), "")
+        return {"sql": fallback, "votes": 0, "fingerprint": None, "fingerprints": fingerprints}
+
+    best_votes = max(counts.values())
+    for sql, fp in zip(candidates, fingerprints):
+        if fp is not None and counts[fp] == best_votes:
+            return {"sql": sql, "votes": best_votes, "fingerprint": fp, "fingerprints": fingerprints}
@@ -0,0 +1,151 @@
+"""
+Sharded evaluation: split one evaluation across machines and merge the results.
+Each evaluator accepts --shard k/N and then runs only the questions of shard k,
+writing them to a shard file keyed by question_id instead of by position. Shards are
+balanced by an estimate of the gold query cost, so the assignment depends only on the
+gold file and the databases: every model evaluated against the same gold set gets the
+same questions in each shard. merge joins the shard files in the order of the
+difficulty file and prints the same tables as a single run over the whole file.
+
+Usage:
+    python -m evaluation.evaluation_ex ... --shard 1/4 --shard_output ex_1.json
+    python -m evaluation.sharding merge ex_*.json --diff_json_path mini_dev_sqlite.jsonl
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import importlib
+from typing import Any, Dict, List, Tuple
+from evaluation.evaluation_utils import load_jsonl, print_data
+from evaluation.sql_lint import LintStats
+
+# Evaluator module, its function that turns results in difficulty-file order into scores,
+# and the name it prints before the table
+METRICS = {
+    "EX": ("evaluation.evaluation_ex", "compute_acc_by_diff", "EX"),
+    "Soft-F1": ("evaluation.evaluation_f1", "compute_f1_by_diff", "Soft F1"),
+    "R-VES": ("evaluation.evaluation_ves", "compute_ves_by_diff", "R-VES"),
+}
+
+_QUERY_PARTS = re.compile(r"\b(SELECT|JOIN)\b", re.IGNORECASE)
+
+class ShardError(Exception):
+    pass
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """'k/N' -> (k, N), with shards numbered from 1."""
+    try:
+        k, n = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ShardError(f"shard must look like k/N, got {text!r}")
+    if not 1 <= k <= n:
+        raise ShardError(f"shard {k} is not between 1 and {n}")
+    return k, n
+
+def estimate_cost(sql: str, db_path: str) -> float:
+    """Relative cost of a gold query without running it: database size times the number of
+    SELECTs and JOINs, which is enough to keep the big multi-join questions apart."""
+    size = os.path.getsize(db_path) if os.path.exists(db_path) else 1
+    return size * max(1, len(_QUERY_PARTS.findall(sql)))
+
+def assign_shards(costs: List[float], num_shards: int) -> List[int]:
+    """Shard (1..num_shards) of each question: most expensive first, each to the shard with
+    the least total cost so far. Ties go by position and shard number, so it is deterministic."""
+    loads = [0.0] * num_shards
+    shards = [0] * len(costs)
+    for i in sorted(range(len(costs)), key=lambda i: (-costs[i], i)):
+        shard = min(range(num_shards), key=lambda s: (loads[s], s))
+        loads[shard] += costs[i]
+        shards[i] = shard + 1
+    return shards
+
+def select_shard(gold_queries: List[str], db_paths: List[str], shard: str) -> List[int]:
+    """Positions of the questions that belong to shard 'k/N'."""
+    k, n = parse_shard(shard)
+    costs = [estimate_cost(sql, db_path) for sql, db_path in zip(gold_queries, db_paths)]
+    return [i for i, s in enumerate(assign_shards(costs, n)) if s == k]
+
+def question_ids(diff_json_path: str, count: int) -> List[str]:
+    """question_id of each question in file order; the position when the file has none."""
+    contents = load_jsonl(diff_json_path) if diff_json_path else []
+    ids = [str(contents[i].get("question_id", i)) if i < len(contents) else str(i) for i in range(count)]
+    if len(set(ids)) != len(ids):
+        raise ShardError(f"{diff_json_path} has duplicate question ids")
+    return ids
+
+def write_shard(path: str, metric: str, sql_dialect: str, shard: str, exec_results: List[Dict[str, Any]],
+                diff_json_path: str, num_questions: int) -> str:
+    k, n = parse_shard(shard)
+    path = path or f"{metric.lower()}_shard_{k}_of_{n}.json"
+    ids = question_ids(diff_json_path, num_questions)
+    results = []
+    for result in exec_results:
+        result = dict(result)
+        result["question_id"] = ids[result.pop("sql_idx")]
+        results.append(result)
+    with open(path, "w") as f:
+        json.dump({"metric": metric, "sql_dialect": sql_dialect, "shard": k, "num_shards": n,
+                   "questions": num_questions, "results": results}, f)
+    return path
+
+def merge_results(shard_files: List[Dict[str, Any]], diff_json_path: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """(metric, results of every question in difficulty-file order) from a full set of shards."""
+    first = shard_files[0]
+    for shard_file in shard_files:
+        for key in ("metric", "sql_dialect", "num_shards", "questions"):
+            if shard_file[key] != first[key]:
+                raise ShardError(f"shards disagree on {key}: {first[key]!r} and {shard_file[key]!r}")
+    shards = sorted(shard_file["shard"] for shard_file in shard_files)
+    if shards != list(range(1, first["num_shards"] + 1)):
+        raise ShardError(f"expected shards 1..{first['num_shards']} once each, got {shards}")
+    ids = question_ids(diff_json_path, first["questions"])
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for shard_file in shard_files:
+        for result in shard_file["results"]:
+            if result["question_id"] in by_id:
+                raise ShardError(f"question {result['question_id']} is in more than one shard")
+            by_id[result["question_id"]] = result
+    missing = [question_id for question_id in ids if question_id not in by_id]
+    if missing:
+        raise ShardError(f"{len(missing)} questions have no result, e.g. {missing[:5]}")
+    results = []
+    for i, question_id in enumerate(ids):
+        result = dict(by_id[question_id])
+        del result["question_id"]
+        result["sql_idx"] = i
+        results.append(result)
+    return first["metric"], results
+
+def merge(paths: List[str], diff_json_path: str, output_log_path: str = None) -> None:
+    shard_files = []
+    for path in paths:
+        with open(path, "r") as f:
+            shard_files.append(json.load(f))
+    metric, exec_results = merge_results(shard_files, diff_json_path)
+    module_name, function_name, label = METRICS[metric]
+    compute_by_diff = getattr(importlib.import_module(module_name), function_name)
+    print(f"start calculate {label}")
+    *score_lists, count_lists = compute_by_diff(exec_results, diff_json_path)
+    print_data(score_lists, count_lists, metric=metric, result_log_file=output_log_path)
+    lint_stats = LintStats()
+    for result in exec_results:
+        lint_stats.record(result.get("lint"))
+    if lint_stats.checked:
+        print(lint_stats.summary())
+    print(f"Merged {len(shard_files)} shards, {len(exec_results)} questions")
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="Merge the shard files of a sharded evaluation")
+    subparsers = args_parser.add_subparsers(dest="command", required=True)
+    merge_parser = subparsers.add_parser("merge", help="print the tables of a single run from all of its shards")
+    merge_parser.add_argument("shard_paths", nargs="+")
+    merge_parser.add_argument("--diff_json_path", type=str, required=True)
+    merge_parser.add_argument("--output_log_path", type=str, default=None)
+    args = args_parser.parse_args()
+    try:
+        merge(args.shard_paths, args.diff_json_path, args.output_log_path)
+    except ShardError as e:
+        sys.exit(f"Cannot merge: {e}")
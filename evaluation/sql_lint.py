@@ -0,0 +1,408 @@
+"""
+Static pre-execution check of SQL queries against the schema catalog.
+Queries are tokenized locally and every table and column reference is resolved
+against the cached catalog (tables, aliases, CTEs and subqueries, scope by scope).
+Only errors the database itself would raise are reported: unknown tables, unknown
+columns and ambiguous unqualified columns. Anything the checker cannot follow
+(columns of derived tables, compound selects, double-quoted SQLite strings) is left to the
+database, so a query with no issues is not guaranteed to run, but a query with
+issues is guaranteed not to.
+"""
+
+import os
+import re
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .schema_render import read_catalog
+from .result_cache import db_version
+
+TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<dquote>"(?:[^"]|"")*")
+    |(?P<bquote>`(?:[^`]|``)*`)
+    |(?P<bracket>\[[^\]]*\])
+    |(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)
+    |(?P<ident>[^\W\d]\w*)
+    |(?P<op>::|<>|!=|<=|>=|\|\||==|[-+*/%<>=~!&|^.,;()?])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Reserved words, type names and bare-word functions; never treated as column references.
+# Erring on the side of too many keywords only means fewer references get checked.
+KEYWORDS = set("""
+ABORT ACTION ADD AFTER ALL ALTER ALWAYS ANALYZE AND ANY AS ASC ATTACH AUTOINCREMENT BEFORE BEGIN
+BETWEEN BOTH BY CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT CONSTRAINT CREATE CROSS
+CURRENT CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP DATABASE DEFAULT DEFERRED DELETE DESC DETACH
+DISTINCT DO DROP EACH ELSE END ESCAPE EXCEPT EXCLUDE EXCLUSIVE EXISTS EXPLAIN FALSE FILTER FIRST
+FOLLOWING FOR FOREIGN FROM FULL GENERATED GLOB GROUP GROUPS HAVING IF IGNORE ILIKE IMMEDIATE IN
+INDEX INDEXED INITIALLY INNER INSERT INSTEAD INTERSECT INTERVAL INTO IS ISNULL JOIN KEY LAST
+LATERAL LEADING LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT NOTHING NOTNULL NULL NULLS OF
+OFFSET ON ONLY OR ORDER OTHERS OUTER OVER PARTITION PLAN PRAGMA PRECEDING PRIMARY QUERY RAISE
+RANGE RECURSIVE REFERENCES REGEXP REINDEX RELEASE RENAME REPLACE RESTRICT RETURNING RIGHT
+ROLLBACK ROW ROWS SAVEPOINT SELECT SET SIMILAR SOME TABLE TEMP TEMPORARY THEN TIES TO TRAILING
+TRANSACTION TRIGGER TRUE UNBOUNDED UNION UNIQUE UNKNOWN UPDATE USING VACUUM VALUES VIEW VIRTUAL
+WHEN WHERE WINDOW WITH WITHOUT
+ROWID OID _ROWID_ NOCASE BINARY RTRIM UNSIGNED SIGNED SEPARATOR DIV MOD XOR REGEXP RLIKE
+INT INTEGER TINYINT SMALLINT MEDIUMINT BIGINT REAL DOUBLE PRECISION FLOAT NUMERIC DECIMAL BOOLEAN
+BOOL TEXT CHAR VARCHAR NCHAR NVARCHAR CHARACTER VARYING CLOB BLOB BYTEA DATE TIME TIMESTAMP
+DATETIME YEAR MONTH DAY HOUR MINUTE SECOND WEEK QUARTER EPOCH DOW DOY ZONE SIGNED JSON JSONB
+UUID SERIAL BIGSERIAL MONEY
+""".split())
+
+JOIN_PREFIXES = {"LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS", "NATURAL"}
+EXPR_CLAUSES = {"SELECT", "ON", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "RETURNING", "SET"}
+COMPOUND = {"UNION", "INTERSECT", "EXCEPT"}
+
+class _Scope:
+    __slots__ = ("parent", "tables", "refs", "aliases", "lenient", "using")
+
+    def __init__(self, parent: Optional["_Scope"]):
+        self.parent = parent
+        # alias or table name (lower case) -> catalog table (lower case), or None when opaque
+        self.tables: Dict[str, Optional[str]] = {}
+        # (qualifier, column, text as written), lower case except the text
+        self.refs: List[Tuple[Optional[str], str, str]] = []
+        self.aliases: Set[str] = set()
+        self.lenient = False
+        self.using = False
+
+def _tokenize(sql: str, sql_dialect: str) -> Optional[List[Tuple[str, str]]]:
+    tokens = []
+    pos = 0
+    while pos < len(sql):
+        match = TOKEN.match(sql, pos)
+        if not match:
+            return None
+        pos = match.end()
+        kind = match.lastgroup
+        text = match.group()
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "dquote":
+            # SQLite falls back to a string literal for unknown "names"; MySQL reads them as strings
+            if sql_dialect == "PostgreSQL":
+                tokens.append(("qident", text[1:-1].replace('""', '"')))
+            else:
+                tokens.append(("dquote", text[1:-1].replace('""', '"')))
+        elif kind == "bquote":
+            tokens.append(("qident", text[1:-1].replace("``", "`")))
+        elif kind == "bracket":
+            tokens.append(("qident", text[1:-1]))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+def _is_name(token: Tuple[str, str]) -> bool:
+    return token[0] in ("qident", "dquote") or (token[0] == "ident" and token[1].upper() not in KEYWORDS)
+
+def _unquote(token: Tuple[str, str]) -> str:
+    # String literals keep their quotes; every other name token is already bare
+    return token[1][1:-1].replace("''", "'") if token[0] == "string" else token[1]
+
+def _alias_follows(prev: Tuple[str, str]) -> bool:
+    """Whether a name right after prev can only be a column alias, with or without AS
+    (CASE ... END g like f(x) g)."""
+    return (prev[0] == "ident" and prev[1].upper() in ("AS", "END")) or (
+        prev[0] in ("ident", "qident", "number", "string", "dquote") and not (prev[0] == "ident" and prev[1].upper() in KEYWORDS)
+    ) or prev == ("op", ")")
+
+def catalog_columns(catalog: List[Dict[str, Any]], views: Optional[List[str]] = None) -> Dict[str, Optional[Set[str]]]:
+    """Lower-case table name -> lower-case column names; views map to None (not checked)."""
+    columns: Dict[str, Optional[Set[str]]] = {name.lower(): None for name in views or []}
+    for table in catalog:
+        columns[table["name"].lower()] = {col["name"].lower() for col in table["columns"]}
+    return columns
+
+_columns: Dict[str, Tuple[Any, Dict[str, Optional[Set[str]]]]] = {}
+
+def schema_columns(db_path: str) -> Dict[str, Optional[Set[str]]]:
+    """Column sets of a SQLite database, built once per file version."""
+    path = os.path.realpath(db_path)
+    version = db_version(path)
+    cached = _columns.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        views = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='view'")]
+    finally:
+        conn.close()
+    columns = catalog_columns(read_catalog(path, sample_rows=0, use_profile=False), views)
+    _columns[path] = (version, columns)
+    return columns
+
+def lint_tokens(tokens: List[Tuple[str, str]], columns: Dict[str, Optional[Set[str]]]) -> List[str]:
+    """Resolve the references in a tokenized SELECT; returns database-style error messages."""
+    root = _Scope(None)
+    scopes = [root]
+    # Stack entries: (scope, is_scope_paren); the root scope has no paren
+    stack: List[Tuple[_Scope, bool]] = [(root, True)]
+    cte_names: Set[str] = set()
+    all_aliases: Set[str] = set()
+    issues: List[str] = []
+
+    mode = "expr"          # clause of the innermost scope: expr, from, cte
+    expect_table = False
+    pending_alias: Optional[str] = None   # table waiting for an optional alias
+    derived = False        # a derived table just closed; the next name is its alias
+    modes: List[Tuple[str, bool]] = []
+
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text = tokens[i]
+        upper = text.upper() if kind == "ident" else ""
+        scope, _ = stack[-1]
+        at_scope_level = stack[-1][1]
+        prev = tokens[i - 1] if i else ("op", "")
+        nxt = tokens[i + 1] if i + 1 < n else ("op", "")
+
+        if kind == "op" and text == "(":
+            opens_query = nxt[0] == "ident" and nxt[1].upper() in ("SELECT", "WITH", "VALUES")
+            if opens_query:
+                child = _Scope(scope)
+                scopes.append(child)
+                modes.append((mode, expect_table))
+                stack.append((child, True))
+                mode, expect_table = "expr", False
+            else:
+                # Function arguments, IN lists and parenthesized joins stay in this scope
+                stack.append((scope, False))
+            i += 1
+            continue
+
+        if kind == "op" and text == ")":
+            if len(stack) == 1:
+                return []
+            _, was_scope = stack.pop()
+            if was_scope:
+                mode, expect_table = modes.pop()
+                if mode == "from" and expect_table:
+                    # The derived table's columns are unknown, whether or not an alias follows
+                    outer = stack[-1][0]
+                    outer.tables[f"<derived {len(outer.tables)}>"] = None
+                    derived, expect_table = True, False
+            elif mode == "using":
+                mode = "expr"
+            i += 1
+            continue
+
+        if kind == "op" and text == ";":
+            if any(tok[0] != "op" or tok[1] != ";" for tok in tokens[i + 1:]):
+                return []  # several statements; leave them to the database
+            break
+
+        if kind == "ident" and upper in COMPOUND and at_scope_level:
+            # Each SELECT of a compound query gets its own scope; ORDER BY may name result columns
+            scope.lenient = True
+            sibling = _Scope(scope.parent)
+            sibling.lenient = True
+            scopes.append(sibling)
+            stack[-1] = (sibling, True)
+            mode, expect_table, pending_alias, derived = "expr", False, None, False
+            i += 1
+            continue
+
+        if kind == "ident" and upper == "WITH" and at_scope_level:
+            mode = "cte"
+            i += 1
+            continue
+
+        if mode == "cte":
+            if kind == "ident" and upper == "SELECT":
+                mode = "expr"
+            elif _is_name(tokens[i]) and (prev == ("op", ",") or prev[1].upper() in ("WITH", "RECURSIVE")):
+                cte_names.add(text.lower())
+            i += 1
+            continue
+
+        if kind == "ident" and at_scope_level and (upper == "FROM" or upper == "JOIN"):
+            mode, expect_table, pending_alias, derived = "from", True, None, False
+            i += 1
+            continue
+
+        if kind == "ident" and at_scope_level and upper in EXPR_CLAUSES:
+            mode, expect_table, pending_alias, derived = "expr", False, None, False
+            i += 1
+            continue
+
+        if kind == "ident" and upper in ("USING", "NATURAL"):
+            scope.using = True
+            if upper == "USING":
+                mode = "using"
+            i += 1
+            continue
+
+        if mode == "using":
+            i += 1
+            continue
+
+        if mode == "from":
+            if kind == "op" and text == "," and at_scope_level:
+                expect_table, pending_alias, derived = True, None, False
+            elif kind == "ident" and upper in JOIN_PREFIXES:
+                pass
+            elif expect_table and kind in ("ident", "qident", "dquote"):
+                name = text
+                j = i
+                # schema.table: keep the last part
+                while j + 2 < n and tokens[j + 1] == ("op", ".") and tokens[j + 2][0] in ("ident", "qident", "dquote"):
+                    j += 2
+                    name = tokens[j][1]
+                if j + 1 < n and tokens[j + 1] == ("op", "("):
+                    # Table-valued function such as json_each(...)
+                    scope.tables[name.lower()] = None
+                    pending_alias = name.lower()
+                else:
+                    lowered = name.lower()
+                    if lowered in cte_names:
+                        scope.tables[lowered] = None
+                    elif lowered in columns:
+                        scope.tables[lowered] = lowered if columns[lowered] is not None else None
+                    else:
+                        issues.append(f"no such table: {name}")
+                        scope.tables[lowered] = None
+                    pending_alias = lowered
+                expect_table = False
+                i = j + 1
+                continue
+            elif kind == "ident" and upper == "AS":
+                pass
+            elif (pending_alias is not None or derived) and (
+                _is_name(tokens[i]) or (kind == "string" and at_scope_level)
+            ):
+                # SQLite also takes "u" and 'u' as table aliases
+                alias = _unquote(tokens[i]).lower()
+                scope.tables[alias] = scope.tables.get(pending_alias) if pending_alias is not None else None
+                all_aliases.add(alias)
+                pending_alias, derived = None, False
+            i += 1
+            continue
+
+        # Expression context
+        if kind in ("dquote", "string"):
+            if _alias_follows(prev):
+                # Quoted column alias such as name AS "nm" or COUNT(*) 'n'
+                scope.aliases.add(_unquote(tokens[i]).lower())
+                all_aliases.add(_unquote(tokens[i]).lower())
+            elif kind == "dquote" and nxt == ("op", ".") and i + 2 < n:
+                # "u".name is qualified like u.name
+                target = tokens[i + 2]
+                if target[0] in ("ident", "qident", "dquote") or target == ("op", "*"):
+                    scope.refs.append((text.lower(), target[1].lower(), f"{text}.{target[1]}"))
+                i += 3
+                continue
+            i += 1
+            continue
+        if kind in ("ident", "qident") and not (kind == "ident" and upper in KEYWORDS):
+            if nxt == ("op", "(") and kind == "ident":
+                i += 1  # function call
+                continue
+            if prev == ("op", "::") or (prev[0] == "ident" and prev[1].upper() in ("COLLATE", "OVER", "WINDOW")):
+                i += 1  # type name, collation or window name
+                continue
+            if _alias_follows(prev):
+                # Column alias, with or without AS
+                scope.aliases.add(text.lower())
+                all_aliases.add(text.lower())
+                i += 1
+                continue
+            if nxt == ("op", ".") and i + 2 < n:
+                target = tokens[i + 2]
+                if target[0] in ("ident", "qident", "dquote") or target == ("op", "*"):
+                    scope.refs.append((text.lower(), target[1].lower(), f"{text}.{target[1]}"))
+                    i += 3
+                    continue
+            scope.refs.append((None, text.lower(), text))
+        i += 1
+
+    if len(stack) != 1:
+        return []
+
+    for scope in scopes:
+        for qualifier, name, written in scope.refs:
+            issue = _resolve(scope, qualifier, name, written, columns, all_aliases, cte_names)
+            if issue and issue not in issues:
+                issues.append(issue)
+    return issues
+
+def _resolve(scope: _Scope, qualifier: Optional[str], name: str, written: str, columns: Dict[str, Optional[Set[str]]],
+             all_aliases: Set[str], cte_names: Set[str]) -> Optional[str]:
+    if name in ("rowid", "oid", "_rowid_"):
+        return None
+    if qualifier is not None:
+        level = scope
+        while level is not None:
+            if qualifier in level.tables:
+                table = level.tables[qualifier]
+                if table is None or name == "*" or name in columns.get(table, ()):
+                    return None
+                return f"no such column: {written}"
+            level = level.parent
+        if qualifier in all_aliases or qualifier in cte_names:
+            return None
+        return f"no such column: {written}"
+
+    if name in all_aliases:
+        return None
+    level = scope
+    unsure = False
+    while level is not None:
+        matches = {table for table in level.tables.values() if table is not None and name in columns.get(table, ())}
+        if matches:
+            if len(matches) > 1 and not level.using and not level.lenient:
+                return f"ambiguous column name: {written}"
+            return None
+        if level.lenient or any(table is None for table in level.tables.values()):
+            unsure = True
+        level = level.parent
+    if unsure:
+        return None
+    return f"no such column: {written}"
+
+def lint_sql(sql: str, db_path: str, sql_dialect: str = "SQLite") -> List[str]:
+    """Errors the database would certainly raise for this query; empty when none are found.
+
+    The catalog comes from the SQLite file of the database, which BIRD ships for every
+    dialect, so MySQL and PostgreSQL predictions are checked without a server round trip.
+    """
+    if not sql or not sql.strip():
+        return []
+    tokens = _tokenize(sql, sql_dialect)
+    if not tokens or tokens[0][0] != "ident" or tokens[0][1].upper() not in ("SELECT", "WITH"):
+        return []
+    try:
+        columns = schema_columns(db_path)
+    except Exception:
+        return []
+    return lint_tokens(tokens, columns)
+
+class LintStats:
+    """Counts of predictions rejected before execution."""
+
+    def __init__(self):
+        self.checked = 0
+        self.rejected = 0
+        self.kinds = Counter()
+
+    def record(self, issues: Optional[List[str]]) -> None:
+        if issues is None:
+            return
+        self.checked += 1
+        if issues:
+            self.rejected += 1
+            for issue in issues:
+                self.kinds[issue.split(":")[0]] += 1
+
+    def summary(self) -> str:
+        rate = self.rejected / self.checked if self.checked else 0.0
+        kinds = ", ".join(f"{kind}: {count}" for kind, count in self.kinds.most_common())
+        return (
+            f"Lint: {self.rejected}/{self.checked} predictions rejected before execution ({rate:.1%})"
+            + (f" [{kinds}]" if kinds else "")
+        )
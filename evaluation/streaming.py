@@ -0,0 +1,184 @@
+"""
+Streaming chat completions with early SQL cut-off.
+
+SQLStreamDetector scans streamed text incrementally and reports as soon as a
+complete SQL statement has arrived (balanced quotes and parentheses, followed by a
+terminating ';' or a closing code fence), so the rest of the stream can be
+cancelled instead of paying for the model's trailing explanation. SQL inside a code
+fence wins over anything before the fence; outside one, only SQL-shaped text counts.
+"""
+import re
+import time
+from . import tracing
+from .self_consistency import extract_sql
+
+# Inside a code fence any line starting with SELECT or WITH begins the SQL
+SQL_START = re.compile(r"^[ \t]*(SELECT|WITH)\b", re.IGNORECASE | re.MULTILINE)
+# Outside a fence only a SQL-shaped start counts, at the start of a line or after a colon:
+# SELECT and the first item of a select list, or WITH <name> AS (. This keeps prose such
+# as "Select the rows..." or "With the users table..." from being taken for the query.
+SQL_SHAPED_START = re.compile(
+    r"""(?:^|(?<=:))[ \t]*(
+        SELECT\s+(?:(?:DISTINCT|ALL)\s+)?
+            (?:\*|CASE\b|'|[\w"`\[\]]+(?:\.[\w"`\[\]*]+)?[ \t]*(?:[-,(+*/%|=<>;\n]|(?:FROM|AS)\b))
+        |WITH\s+(?:RECURSIVE\s+)?[\w"`\[\]]+\s*(?:\([^)]*\)\s*)?AS\s*\(
+    )""",
+    re.IGNORECASE | re.MULTILINE | re.VERBOSE,
+)
+
+
+class SQLStreamDetector:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.start = None
+        self.in_fence = False
+        self.search_from = 0
+        self.quote = None
+        self.line_comment = False
+        self.block_comment = False
+        self.depth = 0
+        self.sql = None
+
+    def feed(self, text):
+        """Add streamed text; returns the SQL statement once it is complete, else None."""
+        if self.sql is not None:
+            return self.sql
+        self.buffer += text
+        if self.start is None:
+            self._find_start()
+            if self.start is None:
+                return None
+        self._scan()
+        return self.sql
+
+    def _find_start(self):
+        pattern = SQL_START if self.in_fence else SQL_SHAPED_START
+        if not self.in_fence:
+            fence = self.buffer.find("```", self.search_from)
+            if fence != -1:
+                # A fenced query is preferred over anything before the fence; wait for the
+                # rest of the opening fence line (e.g. ```sql)
+                newline = self.buffer.find("\n", fence)
+                if newline == -1:
+                    self.search_from = fence
+                    return
+                self.in_fence = True
+                self.search_from = newline + 1
+                pattern = SQL_START
+        match = pattern.search(self.buffer, self.search_from)
+        if match:
+            self.start = match.start(1)
+            self.pos = self.start
+
+    def _restart_at_fence(self, fence):
+        # Text before an opening fence was not the answer; look for the SQL inside it
+        self.start = None
+        self.search_from = fence
+        self.quote = None
+        self.line_comment = self.block_comment = False
+        self.depth = 0
+        self._find_start()
+
+    def _scan(self):
+        buf = self.buffer
+        # Keep two characters of lookahead so '--', '/*', '*/' and '```' are not split
+        end = len(buf) - 2
+        i = self.pos
+        while i < end:
+            ch = buf[i]
+            if self.line_comment:
+                if ch == "\n":
+                    self.line_comment = False
+            elif self.block_comment:
+                if buf.startswith("*/", i):
+                    self.block_comment = False
+                    i += 1
+            elif self.quote:
+                if ch == self.quote:
+                    self.quote = None
+            elif ch in ("'", '"', "`") and not buf.startswith("```", i):
+                self.quote = ch
+            elif buf.startswith("--", i):
+                self.line_comment = True
+            elif buf.startswith("/*", i):
+                self.block_comment = True
+                i += 1
+            elif ch == "(":
+                self.depth += 1
+            elif ch == ")":
+                self.depth = max(0, self.depth - 1)
+            elif ch == ";" and self.depth == 0:
+                self.sql = buf[self.start:i].strip()
+                return
+            elif buf.startswith("```", i) and self.depth == 0:
+                if not self.in_fence:
+                    self._restart_at_fence(i)
+                    if self.start is not None:
+                        self._scan()
+                    return
+                self.sql = buf[self.start:i].strip()
+                return
+            i += 1
+        self.pos = i
+
+    def finish(self):
+        """Best-effort SQL once the stream has ended without an explicit terminator."""
+        if self.sql is not None:
+            return self.sql
+        if self.start is not None and self.quote is None and self.depth == 0:
+            return extract_sql(self.buffer[self.start:])
+        return extract_sql(self.buffer)
+
+
+def stream_sql(client, engine, messages, max_tokens=512, temperature=0, on_token=None):
+    """Stream a chat completion, cancelling it as soon as a complete SQL statement arrives.
+
+    Returns the SQL, the text received, time to first token, time to SQL and whether
+    the stream was cut off early. on_token(text) is called for every streamed delta.
+    """
+    detector = SQLStreamDetector()
+    started = time.perf_counter()
+    ttft = None
+    time_to_sql = None
+    chunks = 0
+    cut_off = False
+    with tracing.span("llm.stream", engine=engine) as sp:
+        stream = client.chat.completions.create(
+            model=engine,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not delta:
+                    continue
+                chunks += 1
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                if on_token is not None:
+                    on_token(delta)
+                if detector.feed(delta) is not None:
+                    time_to_sql = time.perf_counter() - started
+                    cut_off = True
+                    break
+        finally:
+            # Closing the response cancels the rest of the generation
+            stream.close()
+        sql = detector.finish()
+        if time_to_sql is None:
+            time_to_sql = time.perf_counter() - started
+        sp.set(ttft=ttft, time_to_sql=time_to_sql, chunks=chunks, cut_off=cut_off)
+    return {
+        "sql": sql,
+        "text": detector.buffer,
+        "ttft": ttft,
+        "time_to_sql": time_to_sql,
+        "chunks": chunks,
+        "cut_off": cut_off,
+    }
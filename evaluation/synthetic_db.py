@@ -0,0 +1,463 @@
+"""
+Synthetic, scaled copies of BIRD databases for scalability testing.
+Builds SQLite databases with the table layouts of the BIRD `financial` and `formula_1`
+databases (the tables listed in db_table_map) at any scale factor. At --scale 1 row counts
+are close to the BIRD dev databases; fact tables grow linearly with the scale, while
+fixed lookup tables (districts, seasons, statuses) keep their size. Foreign keys always
+point at existing rows, and references are skewed toward low ids so some accounts,
+drivers and races are much busier than others, as in the real data.
+
+Every scale gets a paired workload in the evaluators' input formats: gold.sql,
+predicted.json (equivalent rewrites, wrong answers and slower plans) and difficulty.jsonl.
+
+Usage:
+    python -m evaluation.synthetic_db --scale 1 10 --output_root ./data/synthetic/
+    python -m evaluation.evaluation_ex --db_root_path ./data/synthetic/x10/ \\
+        --ground_truth_path ./data/synthetic/x10/gold.sql \\
+        --predicted_sql_path ./data/synthetic/x10/predicted.json \\
+        --diff_json_path ./data/synthetic/x10/difficulty.jsonl
+"""
+
+import os
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+INSERT_BATCH_ROWS = 10000
+
+class Context:
+    """Row counts of the tables generated so far, and the shared random source."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.rows: Dict[str, int] = {}
+        # Row counts every table will have, for tables laid out by their final size
+        self.target: Dict[str, int] = {}
+
+    def ref(self, table: str, skew: float = 2.0) -> int:
+        """A valid id of `table`, drawn with more weight on low ids."""
+        return 1 + int(self.rows[table] * self.rng.random() ** skew)
+
+    def choice(self, values: List[Any]) -> Any:
+        return self.rng.choice(values)
+
+    def day(self, start: str, end: str) -> str:
+        first = date.fromisoformat(start)
+        span = (date.fromisoformat(end) - first).days
+        return (first + timedelta(days=self.rng.randrange(span + 1))).isoformat()
+
+    def lap_time(self, millis: int) -> str:
+        return f"{millis // 60000}:{millis // 1000 % 60:02d}.{millis % 1000:03d}"
+
+class Table:
+    """One table of a layout.
+
+    row(ctx, i) returns the values of the (i+1)-th row; ids are 1..rows, so every
+    foreign key drawn with ctx.ref lands on an existing row.
+    """
+
+    def __init__(self, name: str, ddl: str, rows: int, row: Callable[[Context, int], tuple],
+                 scales: bool = True):
+        self.name = name
+        self.ddl = ddl
+        self.rows = rows
+        self.row = row
+        self.scales = scales
+
+    def count(self, scale: float) -> int:
+        return max(1, int(self.rows * scale)) if self.scales else self.rows
+
+REGIONS = ["Prague", "central Bohemia", "south Bohemia", "west Bohemia", "north Bohemia",
+           "east Bohemia", "south Moravia", "north Moravia"]
+NATIONALITIES = ["British", "German", "Italian", "French", "Brazilian", "Finnish", "Spanish",
+                 "Australian", "Austrian", "American", "Dutch", "Japanese"]
+COUNTRIES = ["UK", "Germany", "Italy", "France", "Brazil", "Spain", "Australia", "Austria",
+             "USA", "Netherlands", "Japan", "Monaco", "Belgium", "Hungary", "Canada"]
+SURNAMES = ["Hamilton", "Schumacher", "Alonso", "Vettel", "Senna", "Prost", "Button", "Raikkonen",
+            "Rosberg", "Verstappen", "Webber", "Massa", "Barrichello", "Coulthard", "Hill"]
+FORENAMES = ["Lewis", "Michael", "Fernando", "Sebastian", "Ayrton", "Alain", "Jenson", "Kimi",
+             "Nico", "Max", "Mark", "Felipe", "Rubens", "David", "Damon"]
+
+def _district(ctx: Context, i: int) -> tuple:
+    inhabitants = ctx.rng.randrange(40000, 400000)
+    return (i + 1, f"District {i + 1}", REGIONS[i % len(REGIONS)], str(inhabitants),
+            str(ctx.rng.randrange(0, 100)), str(ctx.rng.randrange(0, 70)), str(ctx.rng.randrange(0, 25)),
+            ctx.rng.randrange(0, 10), ctx.rng.randrange(1, 12), round(ctx.rng.uniform(30, 100), 1),
+            ctx.rng.randrange(8000, 12600), round(ctx.rng.uniform(0.2, 7.5), 2),
+            round(ctx.rng.uniform(0.4, 9.5), 2), ctx.rng.randrange(80, 170),
+            ctx.rng.randrange(800, 90000), ctx.rng.randrange(800, 100000))
+
+def _account(ctx: Context, i: int) -> tuple:
+    frequency = ctx.choice(["POPLATEK MESICNE"] * 8 + ["POPLATEK TYDNE", "POPLATEK PO OBRATU"])
+    return (i + 1, ctx.ref("district"), frequency, ctx.day("1993-01-01", "1997-12-29"))
+
+def _client(ctx: Context, i: int) -> tuple:
+    return (i + 1, ctx.choice(["F", "M"]), ctx.day("1911-08-20", "1987-09-27"), ctx.ref("district"))
+
+def _disp(ctx: Context, i: int) -> tuple:
+    # One disposition per client; every account has an owner and some have a disponent
+    accounts = ctx.rows["account"]
+    if i < accounts:
+        return (i + 1, i + 1, i + 1, "OWNER")
+    return (i + 1, i + 1, ctx.ref("account"), "DISPONENT")
+
+def _card(ctx: Context, i: int) -> tuple:
+    return (i + 1, ctx.ref("disp", 1.0), ctx.choice(["classic"] * 6 + ["junior", "gold"]),
+            ctx.day("1993-11-07", "1998-12-29"))
+
+def _loan(ctx: Context, i: int) -> tuple:
+    duration = ctx.choice([12, 24, 36, 48, 60])
+    amount = ctx.rng.randrange(4980, 590820)
+    return (i + 1, ctx.ref("account", 1.0), ctx.day("1993-07-05", "1998-12-08"), amount, duration,
+            round(amount / duration, 1), ctx.choice(["A", "B", "C", "D"]))
+
+def _order(ctx: Context, i: int) -> tuple:
+    return (i + 1, ctx.ref("account"), ctx.choice(["AB", "CD", "EF", "GH", "IJ", "KL", "MN", "OP"]),
+            ctx.rng.randrange(399, 99994749), round(ctx.rng.uniform(1, 14882), 1),
+            ctx.choice(["SIPO", "UVER", "POJISTNE", "LEASING", " "]))
+
+def _trans(ctx: Context, i: int) -> tuple:
+    kind = ctx.choice(["PRIJEM", "VYDAJ", "VYDAJ", "VYBER"])
+    operation = ctx.choice(["VKLAD", "PREVOD Z UCTU", "VYBER", "PREVOD NA UCET", "VYBER KARTOU", None])
+    amount = ctx.rng.randrange(0, 87400)
+    bank, account = (None, None) if ctx.rng.random() < 0.7 else (ctx.choice(["AB", "CD", "EF", "GH"]),
+                                                                 ctx.rng.randrange(1, 99994199))
+    return (i + 1, ctx.ref("account"), ctx.day("1993-01-01", "1998-12-31"), kind, operation, amount,
+            ctx.rng.randrange(-41126, 209637), ctx.choice(["SIPO", "SLUZBY", "UROK", "DUCHOD", None]),
+            bank, account)
+
+FINANCIAL = [
+    Table("district", """CREATE TABLE district (
+    district_id INTEGER PRIMARY KEY, A2 TEXT NOT NULL, A3 TEXT NOT NULL, A4 TEXT NOT NULL,
+    A5 TEXT NOT NULL, A6 TEXT NOT NULL, A7 TEXT NOT NULL, A8 INTEGER NOT NULL, A9 INTEGER NOT NULL,
+    A10 REAL NOT NULL, A11 INTEGER NOT NULL, A12 REAL, A13 REAL NOT NULL, A14 INTEGER NOT NULL,
+    A15 INTEGER, A16 INTEGER NOT NULL)""", 77, _district, scales=False),
+    Table("account", """CREATE TABLE account (
+    account_id INTEGER PRIMARY KEY, district_id INTEGER NOT NULL REFERENCES district (district_id),
+    frequency TEXT NOT NULL, date DATE NOT NULL)""", 4500, _account),
+    Table("client", """CREATE TABLE client (
+    client_id INTEGER PRIMARY KEY, gender TEXT NOT NULL, birth_date DATE NOT NULL,
+    district_id INTEGER NOT NULL REFERENCES district (district_id))""", 5369, _client),
+    Table("disp", """CREATE TABLE disp (
+    disp_id INTEGER PRIMARY KEY, client_id INTEGER NOT NULL REFERENCES client (client_id),
+    account_id INTEGER NOT NULL REFERENCES account (account_id), type TEXT NOT NULL)""", 5369, _disp),
+    Table("card", """CREATE TABLE card (
+    card_id INTEGER PRIMARY KEY, disp_id INTEGER NOT NULL REFERENCES disp (disp_id),
+    type TEXT NOT NULL, issued DATE NOT NULL)""", 892, _card),
+    Table("loan", """CREATE TABLE loan (
+    loan_id INTEGER PRIMARY KEY, account_id INTEGER NOT NULL REFERENCES account (account_id),
+    date DATE NOT NULL, amount INTEGER NOT NULL, duration INTEGER NOT NULL, payments REAL NOT NULL,
+    status TEXT NOT NULL)""", 682, _loan),
+    Table("order", """CREATE TABLE "order" (
+    order_id INTEGER PRIMARY KEY, account_id INTEGER NOT NULL REFERENCES account (account_id),
+    bank_to TEXT NOT NULL, account_to INTEGER NOT NULL, amount REAL NOT NULL, k_symbol TEXT NOT NULL)""",
+          6471, _order),
+    Table("trans", """CREATE TABLE trans (
+    trans_id INTEGER PRIMARY KEY, account_id INTEGER DEFAULT 0 NOT NULL REFERENCES account (account_id),
+    date DATE NOT NULL, type TEXT NOT NULL, operation TEXT, amount INTEGER NOT NULL,
+    balance INTEGER NOT NULL, k_symbol TEXT, bank TEXT, account INTEGER)""", 1056320, _trans),
+]
+
+def _circuit(ctx: Context, i: int) -> tuple:
+    country = COUNTRIES[i % len(COUNTRIES)]
+    return (i + 1, f"circuit_{i + 1}", f"Circuit {i + 1}", f"Town {i + 1}", country,
+            round(ctx.rng.uniform(-40, 60), 4), round(ctx.rng.uniform(-120, 150), 4), None,
+            f"http://en.wikipedia.org/wiki/Circuit_{i + 1}")
+
+def _season(ctx: Context, i: int) -> tuple:
+    return (1950 + i, f"http://en.wikipedia.org/wiki/{1950 + i}_Formula_One_season")
+
+def _race(ctx: Context, i: int) -> tuple:
+    seasons = ctx.rows["seasons"]
+    year = 1950 + i % seasons
+    rnd = i // seasons + 1
+    day = date(year, 3, 1) + timedelta(days=(7 * rnd) % 270)
+    return (i + 1, year, rnd, ctx.ref("circuits", 1.5), f"Grand Prix {rnd}", day.isoformat(),
+            "14:00:00" if year >= 2005 else None, f"http://en.wikipedia.org/wiki/{year}_Grand_Prix_{rnd}")
+
+def _constructor(ctx: Context, i: int) -> tuple:
+    return (i + 1, f"constructor_{i + 1}", f"Constructor {i + 1}", ctx.choice(NATIONALITIES),
+            f"http://en.wikipedia.org/wiki/Constructor_{i + 1}")
+
+def _driver(ctx: Context, i: int) -> tuple:
+    surname = SURNAMES[i % len(SURNAMES)]
+    modern = ctx.rng.random() < 0.1
+    return (i + 1, f"{surname.lower()}_{i + 1}", ctx.rng.randrange(1, 100) if modern else None,
+            surname[:3].upper() if modern else None, ctx.choice(FORENAMES), surname,
+            ctx.day("1896-12-28", "1998-10-10"), ctx.choice(NATIONALITIES),
+            f"http://en.wikipedia.org/wiki/Driver_{i + 1}")
+
+def _constructor_result(ctx: Context, i: int) -> tuple:
+    return (i + 1, ctx.ref("races", 0.7), ctx.ref("constructors"), float(ctx.rng.randrange(0, 44)), None)
+
+def _standing(entity: str) -> Callable[[Context, int], tuple]:
+    def row(ctx: Context, i: int) -> tuple:
+        position = ctx.rng.randrange(1, 25)
+        return (i + 1, ctx.ref("races", 0.7), ctx.ref(entity), float(ctx.rng.randrange(0, 400)),
+                position, str(position), ctx.rng.randrange(0, 4))
+    return row
+
+def _race_slot(ctx: Context, i: int, per_slot: int) -> Tuple[int, int, int]:
+    # Rows are laid out race by race and 20 drivers per race, so (race, driver, n) is unique
+    race = i // (20 * per_slot) + 1
+    slot = i // per_slot % 20
+    driver = (race * 7 + slot) % ctx.rows["drivers"] + 1
+    return race, driver, i % per_slot + 1
+
+def _lap_times(ctx: Context, i: int) -> tuple:
+    laps = max(1, math.ceil(ctx.target["lapTimes"] / (ctx.rows["races"] * 20)))
+    race, driver, lap = _race_slot(ctx, i, laps)
+    millis = ctx.rng.randrange(67000, 140000)
+    return (race, driver, lap, ctx.rng.randrange(1, 25), ctx.lap_time(millis), millis)
+
+def _pit_stops(ctx: Context, i: int) -> tuple:
+    stops = max(1, math.ceil(ctx.target["pitStops"] / (ctx.rows["races"] * 20)))
+    race, driver, stop = _race_slot(ctx, i, stops)
+    millis = ctx.rng.randrange(12000, 60000)
+    return (race, driver, stop, ctx.rng.randrange(1, 70), "14:30:00", f"{millis / 1000:.3f}", millis)
+
+def _qualifying(ctx: Context, i: int) -> tuple:
+    times = [ctx.lap_time(ctx.rng.randrange(67000, 100000)) for _ in range(3)]
+    position = ctx.rng.randrange(1, 25)
+    return (i + 1, ctx.ref("races", 0.7), ctx.ref("drivers"), ctx.ref("constructors"),
+            ctx.rng.randrange(1, 100), position, times[0], times[1] if position <= 15 else None,
+            times[2] if position <= 10 else None)
+
+def _status(ctx: Context, i: int) -> tuple:
+    named = ["Finished", "Disqualified", "Accident", "Collision", "Engine", "Gearbox", "Transmission",
+             "Clutch", "Hydraulics", "Electrical", "+1 Lap", "+2 Laps"]
+    return (i + 1, named[i] if i < len(named) else f"Status {i + 1}")
+
+def _result(ctx: Context, i: int) -> tuple:
+    grid = ctx.rng.randrange(0, 25)
+    finished = ctx.rng.random() < 0.6
+    position = ctx.rng.randrange(1, 25) if finished else None
+    millis = ctx.rng.randrange(5000000, 7000000) if finished else None
+    fastest = ctx.rng.randrange(60000, 120000)
+    return (i + 1, ctx.ref("races", 0.7), ctx.ref("drivers"), ctx.ref("constructors"),
+            ctx.rng.randrange(1, 100), grid, position, str(position) if position else "R",
+            position or ctx.rng.randrange(10, 30), float(ctx.rng.choice([0, 0, 0, 1, 2, 4, 6, 8, 10, 25])),
+            ctx.rng.randrange(0, 78), f"+{millis / 1000:.3f}" if millis else None, millis,
+            ctx.rng.randrange(1, 78), ctx.rng.randrange(1, 25), ctx.lap_time(fastest),
+            f"{ctx.rng.uniform(150, 250):.3f}", 1 if finished else ctx.ref("status", 1.0))
+
+FORMULA_1 = [
+    Table("circuits", """CREATE TABLE circuits (
+    circuitId INTEGER PRIMARY KEY AUTOINCREMENT, circuitRef TEXT DEFAULT '' NOT NULL,
+    name TEXT DEFAULT '' NOT NULL, location TEXT, country TEXT, lat REAL, lng REAL, alt INTEGER,
+    url TEXT DEFAULT '' NOT NULL UNIQUE)""", 72, _circuit),
+    Table("seasons", """CREATE TABLE seasons (
+    year INTEGER DEFAULT 0 NOT NULL PRIMARY KEY, url TEXT DEFAULT '' NOT NULL UNIQUE)""",
+          69, _season, scales=False),
+    Table("races", """CREATE TABLE races (
+    raceId INTEGER PRIMARY KEY AUTOINCREMENT, year INTEGER DEFAULT 0 NOT NULL REFERENCES seasons (year),
+    round INTEGER DEFAULT 0 NOT NULL, circuitId INTEGER DEFAULT 0 NOT NULL REFERENCES circuits (circuitId),
+    name TEXT DEFAULT '' NOT NULL, date DATE DEFAULT '0000-00-00' NOT NULL, time TEXT, url TEXT UNIQUE)""",
+          976, _race),
+    Table("constructors", """CREATE TABLE constructors (
+    constructorId INTEGER PRIMARY KEY AUTOINCREMENT, constructorRef TEXT DEFAULT '' NOT NULL,
+    name TEXT DEFAULT '' NOT NULL UNIQUE, nationality TEXT, url TEXT DEFAULT '' NOT NULL)""",
+          208, _constructor),
+    Table("constructorResults", """CREATE TABLE constructorResults (
+    constructorResultsId INTEGER PRIMARY KEY AUTOINCREMENT,
+    raceId INTEGER DEFAULT 0 NOT NULL REFERENCES races (raceId),
+    constructorId INTEGER DEFAULT 0 NOT NULL REFERENCES constructors (constructorId),
+    points REAL, status TEXT)""", 11082, _constructor_result),
+    Table("constructorStandings", """CREATE TABLE constructorStandings (
+    constructorStandingsId INTEGER PRIMARY KEY AUTOINCREMENT,
+    raceId INTEGER DEFAULT 0 NOT NULL REFERENCES races (raceId),
+    constructorId INTEGER DEFAULT 0 NOT NULL REFERENCES constructors (constructorId),
+    points REAL DEFAULT 0 NOT NULL, position INTEGER, positionText TEXT, wins INTEGER DEFAULT 0 NOT NULL)""",
+          11836, _standing("constructors")),
+    Table("drivers", """CREATE TABLE drivers (
+    driverId INTEGER PRIMARY KEY AUTOINCREMENT, driverRef TEXT DEFAULT '' NOT NULL, number INTEGER,
+    code TEXT, forename TEXT DEFAULT '' NOT NULL, surname TEXT DEFAULT '' NOT NULL, dob DATE,
+    nationality TEXT, url TEXT DEFAULT '' NOT NULL UNIQUE)""", 840, _driver),
+    Table("driverStandings", """CREATE TABLE driverStandings (
+    driverStandingsId INTEGER PRIMARY KEY AUTOINCREMENT,
+    raceId INTEGER DEFAULT 0 NOT NULL REFERENCES races (raceId),
+    driverId INTEGER DEFAULT 0 NOT NULL REFERENCES drivers (driverId),
+    points REAL DEFAULT 0 NOT NULL, position INTEGER, positionText TEXT, wins INTEGER DEFAULT 0 NOT NULL)""",
+          31578, _standing("drivers")),
+    Table("lapTimes", """CREATE TABLE lapTimes (
+    raceId INTEGER NOT NULL REFERENCES races (raceId), driverId INTEGER NOT NULL REFERENCES drivers (driverId),
+    lap INTEGER NOT NULL, position INTEGER, time TEXT, milliseconds INTEGER,
+    PRIMARY KEY (raceId, driverId, lap))""", 420369, _lap_times),
+    Table("pitStops", """CREATE TABLE pitStops (
+    raceId INTEGER NOT NULL REFERENCES races (raceId), driverId INTEGER NOT NULL REFERENCES drivers (driverId),
+    stop INTEGER NOT NULL, lap INTEGER NOT NULL, time TEXT NOT NULL, duration TEXT, milliseconds INTEGER,
+    PRIMARY KEY (raceId, driverId, stop))""", 6070, _pit_stops),
+    Table("qualifying", """CREATE TABLE qualifying (
+    qualifyId INTEGER PRIMARY KEY AUTOINCREMENT, raceId INTEGER DEFAULT 0 NOT NULL REFERENCES races (raceId),
+    driverId INTEGER DEFAULT 0 NOT NULL REFERENCES drivers (driverId),
+    constructorId INTEGER DEFAULT 0 NOT NULL REFERENCES constructors (constructorId),
+    number INTEGER DEFAULT 0 NOT NULL, position INTEGER, q1 TEXT, q2 TEXT, q3 TEXT)""", 7397, _qualifying),
+    Table("status", """CREATE TABLE status (
+    statusId INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT DEFAULT '' NOT NULL)""",
+          134, _status, scales=False),
+    Table("results", """CREATE TABLE results (
+    resultId INTEGER PRIMARY KEY AUTOINCREMENT, raceId INTEGER DEFAULT 0 NOT NULL REFERENCES races (raceId),
+    driverId INTEGER DEFAULT 0 NOT NULL REFERENCES drivers (driverId),
+    constructorId INTEGER DEFAULT 0 NOT NULL REFERENCES constructors (constructorId),
+    number INTEGER, grid INTEGER DEFAULT 0 NOT NULL, position INTEGER, positionText TEXT DEFAULT '' NOT NULL,
+    positionOrder INTEGER DEFAULT 0 NOT NULL, points REAL DEFAULT 0 NOT NULL, laps INTEGER DEFAULT 0 NOT NULL,
+    time TEXT, milliseconds INTEGER, fastestLap INTEGER, rank INTEGER DEFAULT 0, fastestLapTime TEXT,
+    fastestLapSpeed TEXT, statusId INTEGER DEFAULT 0 NOT NULL REFERENCES status (statusId))""",
+          23657, _result),
+]
+
+LAYOUTS = {"financial": FINANCIAL, "formula_1": FORMULA_1}
+
+# (difficulty, gold, predicted) per layout. Predictions mix equivalent rewrites, wrong
+# answers and slower plans for the same answer, so EX, Soft F1 and R-VES all have work to do.
+WORKLOADS = {
+    "financial": [
+        ("simple", "SELECT COUNT(*) FROM client WHERE gender = 'F'",
+         "SELECT SUM(gender = 'F') FROM client"),
+        ("simple", "SELECT account_id FROM loan WHERE amount > 500000",
+         "SELECT account_id FROM loan WHERE amount >= 500000"),
+        ("simple", "SELECT type, COUNT(*) FROM card GROUP BY type",
+         "SELECT type, COUNT(card_id) FROM card GROUP BY type ORDER BY type"),
+        ("moderate", "SELECT T2.A3, COUNT(*) FROM account AS T1 INNER JOIN district AS T2 "
+                     "ON T1.district_id = T2.district_id GROUP BY T2.A3",
+         "SELECT (SELECT A3 FROM district WHERE district_id = account.district_id) AS region, COUNT(*) "
+         "FROM account GROUP BY region"),
+        ("moderate", "SELECT T1.account_id, SUM(T2.amount) FROM account AS T1 INNER JOIN trans AS T2 "
+                     "ON T1.account_id = T2.account_id WHERE T2.type = 'PRIJEM' GROUP BY T1.account_id "
+                     "ORDER BY SUM(T2.amount) DESC LIMIT 10",
+         "SELECT account_id, SUM(amount) FROM trans WHERE type = 'PRIJEM' GROUP BY account_id "
+         "ORDER BY SUM(amount) DESC LIMIT 10"),
+        ("moderate", "SELECT COUNT(DISTINCT T1.client_id) FROM client AS T1 INNER JOIN disp AS T2 "
+                     "ON T1.client_id = T2.client_id INNER JOIN card AS T3 ON T2.disp_id = T3.disp_id "
+                     "WHERE T3.type = 'gold'",
+         "SELECT COUNT(T1.client_id) FROM client AS T1 INNER JOIN disp AS T2 "
+         "ON T1.client_id = T2.client_id INNER JOIN card AS T3 ON T2.disp_id = T3.disp_id "
+         "WHERE T3.type = 'gold'"),
+        ("challenging", "SELECT T1.district_id, AVG(T2.amount) FROM account AS T1 INNER JOIN loan AS T2 "
+                        "ON T1.account_id = T2.account_id WHERE T2.status IN ('B', 'D') "
+                        "GROUP BY T1.district_id",
+         "SELECT T1.district_id, AVG(T2.amount) FROM account AS T1 INNER JOIN loan AS T2 "
+         "ON T1.account_id = T2.account_id WHERE T2.status = 'D' GROUP BY T1.district_id"),
+        ("challenging", "SELECT STRFTIME('%Y', date), COUNT(*), SUM(amount) FROM trans "
+                        "WHERE operation = 'VYBER KARTOU' GROUP BY STRFTIME('%Y', date)",
+         "SELECT SUBSTR(date, 1, 4), COUNT(*), SUM(amount) FROM trans "
+         "WHERE trans_id IN (SELECT trans_id FROM trans WHERE operation = 'VYBER KARTOU') "
+         "GROUP BY SUBSTR(date, 1, 4)"),
+    ],
+    "formula_1": [
+        ("simple", "SELECT COUNT(*) FROM races WHERE year = 2008",
+         "SELECT COUNT(raceId) FROM races WHERE year = 2008"),
+        ("simple", "SELECT forename, surname FROM drivers WHERE nationality = 'Finnish'",
+         "SELECT forename, surname, dob FROM drivers WHERE nationality = 'Finnish'"),
+        ("simple", "SELECT name FROM circuits WHERE country = 'Italy'",
+         "SELECT name FROM circuits WHERE country LIKE 'italy'"),
+        ("moderate", "SELECT T2.surname, COUNT(*) FROM results AS T1 INNER JOIN drivers AS T2 "
+                     "ON T1.driverId = T2.driverId WHERE T1.position = 1 GROUP BY T2.driverId "
+                     "ORDER BY COUNT(*) DESC LIMIT 5",
+         "SELECT T2.surname, COUNT(*) FROM results AS T1 INNER JOIN drivers AS T2 "
+         "ON T1.driverId = T2.driverId WHERE T1.positionOrder = 1 GROUP BY T2.driverId "
+         "ORDER BY COUNT(*) DESC LIMIT 5"),
+        ("moderate", "SELECT T1.raceId, MIN(T1.milliseconds) FROM lapTimes AS T1 INNER JOIN races AS T2 "
+                     "ON T1.raceId = T2.raceId WHERE T2.year = 2009 GROUP BY T1.raceId",
+         "SELECT raceId, MIN(milliseconds) FROM lapTimes WHERE raceId IN "
+         "(SELECT raceId FROM races WHERE year = 2009) GROUP BY raceId"),
+        ("moderate", "SELECT T2.name, SUM(T1.points) FROM constructorResults AS T1 INNER JOIN constructors AS T2 "
+                     "ON T1.constructorId = T2.constructorId GROUP BY T2.constructorId "
+                     "ORDER BY SUM(T1.points) DESC LIMIT 3",
+         "SELECT T2.name, SUM(T1.points) FROM constructorResults AS T1 INNER JOIN constructors AS T2 "
+         "ON T1.constructorId = T2.constructorId GROUP BY T2.name ORDER BY SUM(T1.points) DESC LIMIT 3"),
+        ("challenging", "SELECT T3.status, COUNT(*) FROM results AS T1 INNER JOIN races AS T2 "
+                        "ON T1.raceId = T2.raceId INNER JOIN status AS T3 ON T1.statusId = T3.statusId "
+                        "WHERE T2.year BETWEEN 2000 AND 2010 GROUP BY T3.statusId",
+         "SELECT T3.status, COUNT(*) FROM results AS T1, races AS T2, status AS T3 "
+         "WHERE T1.raceId = T2.raceId AND T1.statusId = T3.statusId AND T2.year >= 2000 AND T2.year <= 2010 "
+         "GROUP BY T3.status"),
+        ("challenging", "SELECT T1.driverId, AVG(T1.milliseconds) FROM pitStops AS T1 INNER JOIN drivers AS T2 "
+                        "ON T1.driverId = T2.driverId WHERE T2.nationality = 'German' GROUP BY T1.driverId",
+         "SELECT T1.driverId, AVG(T1.milliseconds) FROM pitStops AS T1 INNER JOIN drivers AS T2 "
+         "ON T1.driverId = T2.driverId WHERE T2.nationality = 'German' AND T1.stop = 1 GROUP BY T1.driverId"),
+    ],
+}
+
+def _rows(table: Table, ctx: Context, count: int) -> Iterator[tuple]:
+    for i in range(count):
+        yield table.row(ctx, i)
+
+def generate_database(layout: str, db_path: str, scale: float = 1.0, seed: int = 0) -> Dict[str, int]:
+    """Write one scaled database and return its row count per table."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    ctx = Context(random.Random(f"{layout}:{scale}:{seed}"))
+    ctx.target = {table.name: table.count(scale) for table in LAYOUTS[layout]}
+    conn = sqlite3.connect(db_path)
+    try:
+        # A throwaway file: no journal or fsync while loading
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        for table in LAYOUTS[layout]:
+            conn.execute(table.ddl)
+            count = ctx.target[table.name]
+            rows = _rows(table, ctx, count)
+            batch = [next(rows)]
+            insert = f'INSERT INTO "{table.name}" VALUES ({", ".join("?" * len(batch[0]))})'
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= INSERT_BATCH_ROWS:
+                    conn.executemany(insert, batch)
+                    batch = []
+            conn.executemany(insert, batch)
+            ctx.rows[table.name] = count
+        conn.commit()
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            raise AssertionError(f"{layout}: {len(violations)} foreign key violations, first {violations[0]}")
+    finally:
+        conn.close()
+    return dict(ctx.rows)
+
+def write_workload(output_dir: str, layouts: List[str]) -> int:
+    """Write gold.sql, predicted.json and difficulty.jsonl for the given layouts."""
+    gold_lines, predicted, difficulties = [], {}, []
+    for layout in layouts:
+        for difficulty, gold, prediction in WORKLOADS[layout]:
+            idx = len(gold_lines)
+            gold_lines.append(f"{gold}\t{layout}\n")
+            predicted[str(idx)] = f"{prediction}\t----- bird -----\t{layout}"
+            difficulties.append(json.dumps({"question_id": idx, "difficulty": difficulty}) + "\n")
+    with open(os.path.join(output_dir, "gold.sql"), "w") as f:
+        f.writelines(gold_lines)
+    with open(os.path.join(output_dir, "predicted.json"), "w") as f:
+        json.dump(predicted, f, indent=4)
+    with open(os.path.join(output_dir, "difficulty.jsonl"), "w") as f:
+        f.writelines(difficulties)
+    return len(gold_lines)
+
+def scale_dir(output_root: str, scale: float) -> str:
+    return os.path.join(output_root, f"x{scale:g}")
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="Generate scaled synthetic BIRD-layout SQLite databases")
+    args_parser.add_argument("--layout", type=str, nargs="*", default=sorted(LAYOUTS), choices=sorted(LAYOUTS))
+    args_parser.add_argument("--scale", type=float, nargs="*", default=[1.0],
+                             help="scale factors; 1 is about the size of the BIRD dev database")
+    args_parser.add_argument("--output_root", type=str, default="./data/synthetic/")
+    args_parser.add_argument("--seed", type=int, default=0)
+    args = args_parser.parse_args()
+
+    for scale in args.scale:
+        output_dir = scale_dir(args.output_root, scale)
+        for layout in args.layout:
+            db_path = os.path.join(output_dir, layout, f"{layout}.sqlite")
+            start = time.perf_counter()
+            rows = generate_database(layout, db_path, scale, args.seed)
+            elapsed = time.perf_counter() - start
+            print(f"x{scale:g} {layout}: {sum(rows.values())} rows in {len(rows)} tables, "
+                  f"{os.path.getsize(db_path) / 2 ** 20:.1f} MiB, {elapsed:.1f}s")
+        questions = write_workload(output_dir, args.layout)
+        print(f"x{scale:g}: {questions} questions in {output_dir}")
@@ -1,43 +1,162 @@
 """
 Implementation of Table-Aware (TA) SQL generation techniques.
 This module enhances SQL generation by providing better table structure understanding.
+
+Schemas are parsed once into slotted dataclasses and cached, and table mentions are
+found with a single Aho-Corasick automaton over all table names, so per-question TA
+work is a cache lookup plus one pass over the query.
 """
 
 import re
-from typing import Dict, List, Any, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+from .join_graph import join_graph
 
-def extract_table_info(schema: str) -> Dict[str, Dict[str, Any]]:
-    """Extract table information from schema string."""
+# Trailing SQL type of a 'Columns:' entry, e.g. 'VARCHAR(20)' or 'DOUBLE PRECISION'
+COLUMN_TYPE = re.compile(r"\s+([A-Za-z]+(?:\s+PRECISION)?(?:\s*\([\d,\s]+\))?)$")
+
+@dataclass(frozen=True, slots=True)
+class Column:
+    name: str
+    type: str = ""
+    primary_key: bool = False
+    definition: str = ""
+
+@dataclass(frozen=True, slots=True)
+class Table:
+    name: str
+    columns: Tuple[Column, ...] = ()
+    sample_data: Tuple[str, ...] = ()
+
+    def column_names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+class TableMatcher:
+    """Aho-Corasick automaton that finds every table name in a text in one pass.
+
+    Matching is case-insensitive and only whole identifiers count, so 'order' does not
+    match inside 'orders' or 'border'.
+    """
+
+    __slots__ = ("names", "_goto", "_fail", "_out")
+
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        for index, name in enumerate(self.names):
+            state = 0
+            for ch in name.lower():
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+
+        # Breadth-first failure links (depth-one states fail to the root);
+        # each state also reports the names ending at its failure state
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[str]:
+        """Names that occur in text as whole identifiers, in first-occurrence order."""
+        text = text.lower()
+        found: Dict[int, None] = {}
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for index in self._out[state]:
+                start = end - len(self.names[index]) + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end + 1] if end + 1 < len(text) else " "
+                if not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_"):
+                    found.setdefault(index, None)
+        return [self.names[index] for index in found]
+
+@dataclass(frozen=True, slots=True)
+class Schema:
+    tables: Dict[str, Table]
+    matcher: TableMatcher
+    # Pre-rendered 'Database Structure' section of the TA prompt
+    structure: str = field(default="", compare=False)
+
+    def tables_in(self, query: str) -> List[str]:
+        return self.matcher.find(query)
+
+def _parse_column(definition: str) -> Column:
+    text = definition.strip()
+    primary_key = text.upper().endswith("PRIMARY KEY")
+    if primary_key:
+        text = text[: -len("PRIMARY KEY")].rstrip()
+    match = COLUMN_TYPE.search(text)
+    if match:
+        return Column(text[: match.start()].strip(), match.group(1), primary_key, definition)
+    return Column(text, "", primary_key, definition)
+
+def _render_structure(tables: Dict[str, Table]) -> str:
+    db_structure = []
+    for table in tables.values():
+        db_structure.append(f"Table: {table.name}")
+        db_structure.append(f"Columns: {', '.join(column.definition for column in table.columns)}")
+        if table.sample_data:
+            db_structure.append("Sample data:")
+            for data in table.sample_data[:3]:  # Limit to 3 samples
+                db_structure.append(f"  {data}")
+    return "\n".join(db_structure)
+
+def _build_schema(tables: Dict[str, Table]) -> Schema:
+    return Schema(tables, TableMatcher(list(tables)), _render_structure(tables))
+
+@lru_cache(maxsize=128)
+def parse_schema(schema: str) -> Schema:
+    """Parse a 'Table:/Columns:/Sample data:' schema string once; repeated calls are a cache hit."""
     tables = {}
-    current_table = None
-    
+    current = None
     for line in schema.split('\n'):
         if line.startswith('Table:'):
-            current_table = line.replace('Table:', '').strip()
-            tables[current_table] = {'columns': [], 'sample_data': []}
-        elif current_table and line.startswith('Columns:'):
+            current = line.replace('Table:', '').strip()
+            tables[current] = {'columns': [], 'sample_data': []}
+        elif current and line.startswith('Columns:'):
             columns_str = line.replace('Columns:', '').strip()
-            columns = [col.strip() for col in columns_str.split(',')]
-            tables[current_table]['columns'] = columns
-        elif current_table and 'sample_data' in tables[current_table] and line and not line.startswith('Sample data:'):
-            tables[current_table]['sample_data'].append(line.strip())
-    
-    return tables
+            tables[current]['columns'] = [col.strip() for col in columns_str.split(',')]
+        elif current and line and not line.startswith('Sample data:'):
+            tables[current]['sample_data'].append(line.strip())
+    return _build_schema({
+        name: Table(name, tuple(_parse_column(col) for col in info['columns'] if col),
+                    tuple(info['sample_data']))
+        for name, info in tables.items()
+    })
+
+def extract_table_info(schema: str) -> Dict[str, Dict[str, Any]]:
+    """Extract table information from schema string."""
+    return {
+        name: {
+            'columns': [column.definition for column in table.columns],
+            'sample_data': list(table.sample_data),
+        }
+        for name, table in parse_schema(schema).tables.items()
+    }
 
 def generate_table_aware_prompt(question: str, schema: str, evidence: str = "") -> str:
     """Generate a table-aware prompt for SQL generation."""
-    table_info = extract_table_info(schema)
-    
-    # Create a structured representation of the database
-    db_structure = []
-    for table_name, info in table_info.items():
-        db_structure.append(f"Table: {table_name}")
-        db_structure.append(f"Columns: {', '.join(info['columns'])}")
-        if info['sample_data']:
-            db_structure.append("Sample data:")
-            for data in info['sample_data'][:3]:  # Limit to 3 samples
-                db_structure.append(f"  {data}")
-                
+    structure = parse_schema(schema).structure
+
     # Build the prompt
     prompt = f"""
     # SQL Generation Task
@@ -46,7 +165,7 @@ def generate_table_aware_prompt(question: str, schema: str, evidence: str = "")
     {question}
     
     ## Database Structure
-    {'\n'.join(db_structure)}
+    {structure}
     """
     
     if evidence:
@@ -70,19 +189,23 @@ def generate_table_aware_prompt(question: str, schema: str, evidence: str = "")
     
     return prompt
 
-def enhance_query_with_ta(query: str, schema: str) -> str:
-    """Enhance a generated SQL query using table-aware techniques."""
-    table_info = extract_table_info(schema)
-    
+def enhance_query_with_ta(query: str, schema: str, db_path: Optional[str] = None) -> str:
+    """Enhance a generated SQL query using table-aware techniques.
+
+    With db_path, the warning for a query without joins carries the join clause from
+    the database's join graph.
+    """
     # Check for missing joins
-    tables_in_query = []
-    for table_name in table_info.keys():
-        if re.search(r'\b' + re.escape(table_name) + r'\b', query, re.IGNORECASE):
-            tables_in_query.append(table_name)
+    tables_in_query = parse_schema(schema).tables_in(query)
     
     # If multiple tables are used but no JOIN is present, suggest adding joins
     if len(tables_in_query) > 1 and "JOIN" not in query.upper():
         # This is a simplified approach - in a real system, you'd need more sophisticated join detection
-        return query + "\n-- Warning: Multiple tables used but no explicit JOIN found"
+        warning = "\n-- Warning: Multiple tables used but no explicit JOIN found"
+        if db_path:
+            clause = join_graph(db_path).join_clause(tables_in_query)
+            if clause:
+                warning += "\n-- Suggested joins:\n" + "\n".join(f"-- {line}" for line in clause.split("\n"))
+        return query + warning
     
     return query
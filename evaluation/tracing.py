@@ -0,0 +1,186 @@
+"""
+Lightweight span tracing for generation and evaluation.
+
+Spans are only recorded when tracing is enabled (enable() or the BIRD_TRACE
+environment variable); otherwise span() returns a shared no-op context manager.
+Recorded spans can be exported as JSONL or in Chrome trace-event format
+(load the .json file in chrome://tracing or Perfetto).
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from typing import Any, Callable, Dict, List, Optional
+
+_enabled = False
+_spans: List[Dict[str, Any]] = []
+_local = threading.local()
+_lock = threading.Lock()
+_next_id = 0
+
+class _NullSpan:
+    """Shared no-op span used while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        global _next_id
+        with _lock:
+            _next_id += 1
+            self.span_id = f"{os.getpid()}-{_next_id}"
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent_id = stack[-1] if stack else None
+        stack.append(self.span_id)
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self._start_perf
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _spans.append({
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ns": duration_ns,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "attrs": self.attrs,
+        })
+        return False
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def span(name: str, **attrs):
+    """Open a span; a shared no-op object is returned while tracing is disabled."""
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+def traced(name: Optional[str] = None, attrs_fn: Optional[Callable[..., Dict[str, Any]]] = None):
+    """Decorator that wraps a function call in a span when tracing is enabled."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            attrs = attrs_fn(*args, **kwargs) if attrs_fn else {}
+            with Span(span_name, attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_agent(agent: Any) -> None:
+    """Record a span for every reply of an autogen agent, with a child span for each LLM
+    request it makes. The group chat calls generate_reply once per turn, so this covers
+    turns that no code of ours runs directly."""
+    def reply_attrs(messages=None, sender=None, **kwargs):
+        return {"agent": agent.name, "sender": getattr(sender, "name", None), "messages": len(messages or ())}
+
+    agent.generate_reply = traced("agent.reply", reply_attrs)(agent.generate_reply)
+    client = getattr(agent, "client", None)
+    if client is None:
+        return
+    create = client.create
+
+    @functools.wraps(create)
+    def traced_create(**config):
+        if not _enabled:
+            return create(**config)
+        with Span("llm.request", {"agent": agent.name}) as sp:
+            response = create(**config)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                sp.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            return response
+
+    client.create = traced_create
+
+def drain() -> List[Dict[str, Any]]:
+    """Return and clear the spans recorded in this process (used to ship spans out of pool workers)."""
+    with _lock:
+        spans = list(_spans)
+        del _spans[:]
+    return spans
+
+def collect(spans: List[Dict[str, Any]]) -> None:
+    """Add spans recorded in another process."""
+    _spans.extend(spans)
+
+def export_jsonl(path: str, spans: Optional[List[Dict[str, Any]]] = None) -> None:
+    spans = _spans if spans is None else spans
+    with open(path, "w") as f:
+        for record in spans:
+            f.write(json.dumps(record, default=str) + "\n")
+
+def export_chrome(path: str, spans: Optional[List[Dict[str, Any]]] = None) -> None:
+    spans = _spans if spans is None else spans
+    events = [
+        {
+            "name": record["name"],
+            "ph": "X",
+            "ts": record["start_ns"] / 1000.0,
+            "dur": record["duration_ns"] / 1000.0,
+            "pid": record["pid"],
+            "tid": record["tid"],
+            "args": record["attrs"],
+        }
+        for record in spans
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+def export(path: str) -> None:
+    """Export all recorded spans; .jsonl paths get JSONL, anything else Chrome trace format."""
+    if path.endswith(".jsonl"):
+        export_jsonl(path)
+    else:
+        export_chrome(path)
+
+def enable_from_env() -> None:
+    """Enable tracing when BIRD_TRACE is set, so multiprocessing workers inherit it."""
+    if os.environ.get("BIRD_TRACE"):
+        enable()
+
+def start(path: Optional[str]) -> None:
+    """Enable tracing for this process and any worker processes it starts."""
+    if path:
+        os.environ["BIRD_TRACE"] = path
+        enable()
+
+enable_from_env()
@@ -1,8 +1,11 @@
 import os
 import json
-import sqlite3
 import subprocess
 from typing import Dict, List, Any, Optional
+from autogen_bird.tracing import span
+from autogen_bird.schema_render import schema_prompt, read_catalog
+from autogen_bird.backends import get_backend
+from autogen_bird.sql_lint import lint_sql
 
 def load_data(file_path: str) -> List[Dict[str, Any]]:
     """Load data from JSON file."""
@@ -15,74 +18,84 @@ def save_results(results: Dict[str, str], output_file: str) -> None:
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(results, f, indent=4)
 
-def get_table_schema(db_path: str, sql_dialect: str) -> str:
+def get_table_schema(db_path: str, sql_dialect: str, schema_format: str = "table",
+                     token_budget: Optional[int] = None) -> str:
     """Extract database schema information."""
-    if sql_dialect == "SQLite":
-        return get_sqlite_schema(db_path)
-    elif sql_dialect == "MySQL":
-        return get_mysql_schema(db_path)
-    elif sql_dialect == "PostgreSQL":
-        return get_postgresql_schema(db_path)
-    else:
-        raise ValueError(f"Unsupported SQL dialect: {sql_dialect}")
+    with span("get_table_schema", db_path=db_path, sql_dialect=sql_dialect) as sp:
+        if sql_dialect == "SQLite":
+            schema = get_sqlite_schema(db_path, schema_format, token_budget)
+        elif sql_dialect == "MySQL":
+            schema = get_mysql_schema(db_path)
+        elif sql_dialect == "PostgreSQL":
+            schema = get_postgresql_schema(db_path)
+        else:
+            raise ValueError(f"Unsupported SQL dialect: {sql_dialect}")
+        sp.set(chars=len(schema))
+    return schema
 
-def get_sqlite_schema(db_path: str) -> str:
-    """Get schema information from SQLite database."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    
-    schema_info = []
-    for table in tables:
-        table_name = table[0]
-        # Get table columns
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        
-        column_info = []
-        for col in columns:
-            col_name = col[1]
-            col_type = col[2]
-            is_pk = "PRIMARY KEY" if col[5] == 1 else ""
-            column_info.append(f"{col_name} {col_type} {is_pk}".strip())
-        
-        # Get sample data (first 3 rows)
-        try:
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT 3;")
-            sample_data = cursor.fetchall()
-            sample_str = "\n".join([str(row) for row in sample_data])
-        except:
-            sample_str = "No sample data available"
-        
-        schema_info.append(f"Table: {table_name}\nColumns: {', '.join(column_info)}\nSample data:\n{sample_str}\n")
-    
-    conn.close()
-    return "\n".join(schema_info)
+def get_sqlite_schema(db_path: str, schema_format: str = "table",
+                      token_budget: Optional[int] = None, max_cell_width: int = 40) -> str:
+    """Get schema information from SQLite database.
+
+    Sample cells are truncated to max_cell_width and the schema is degraded to fit
+    token_budget when one is given (see schema_render).
+    """
+    return schema_prompt(
+        db_path, schema_format, token_budget, sample_rows=3, max_cell_width=max_cell_width
+    )
+
+def get_server_schema(db_path: str, sql_dialect: str) -> str:
+    """Schema of a database served by MySQL or PostgreSQL, in the 'Table:/Columns:' format.
+
+    The server keeps every BIRD database in one schema, so the tables of this database
+    are taken from its SQLite file and their columns from the server.
+    """
+    backend = get_backend(sql_dialect)
+    blocks = []
+    for table in read_catalog(db_path, sample_rows=0, use_profile=False):
+        column_info = [
+            f"{name} {column_type} {'PRIMARY KEY' if pk else ''}".strip()
+            for name, column_type, _, pk in backend.columns(table["name"], db_path)
+        ]
+        blocks.append(f"Table: {table['name']}\nColumns: {', '.join(column_info)}")
+    return "\n\n".join(blocks)
 
 def get_mysql_schema(db_path: str) -> str:
-    """Placeholder for MySQL schema extraction."""
-    # In a real implementation, you would connect to MySQL and extract schema
-    return f"MySQL schema extraction not implemented. Database path: {db_path}"
+    """Get schema information from the MySQL copy of a database."""
+    return get_server_schema(db_path, "MySQL")
 
 def get_postgresql_schema(db_path: str) -> str:
-    """Placeholder for PostgreSQL schema extraction."""
-    # In a real implementation, you would connect to PostgreSQL and extract schema
-    return f"PostgreSQL schema extraction not implemented. Database path: {db_path}"
+    """Get schema information from the PostgreSQL copy of a database."""
+    return get_server_schema(db_path, "PostgreSQL")
 
-def validate_sql(sql_query: str, db_path: str, sql_dialect: str) -> bool:
-    """Validate SQL query by attempting to execute it."""
-    if sql_dialect == "SQLite":
+def _executes(sql_query: str, db_path: str, sql_dialect: str) -> bool:
+    """Whether the query runs. It is executed up to its first row only and its result is
+    not cached, since callers only need a yes or no."""
+    with span("execute_check", db_path=db_path, sql_dialect=sql_dialect) as sp:
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            conn.close()
+            get_backend(sql_dialect).probe(sql_query, db_path)
+            sp.set(valid=True)
             return True
-        except Exception as e:
+        except Exception:
+            sp.set(valid=False)
             return False
-    else:
-        # For MySQL and PostgreSQL, we would need to implement proper validation
-        return True  # Assume valid for now
\ No newline at end of file
+
+def validate_sql(sql_query: str, db_path: str, sql_dialect: str) -> bool:
+    """Validate SQL query by checking it against the schema catalog, then attempting to execute it."""
+    with span("validate_sql", db_path=db_path, sql_dialect=sql_dialect) as sp:
+        if lint_sql(sql_query, db_path, sql_dialect):
+            # Certain to fail, no need to ask the database
+            sp.set(valid=False, lint=True)
+            return False
+        valid = _executes(sql_query, db_path, sql_dialect)
+        sp.set(valid=valid)
+        return valid
+
+def check_sql(sql_query: str, db_path: str, sql_dialect: str) -> str:
+    """Execution check text for the validator agent, naming the errors found before execution."""
+    issues = lint_sql(sql_query, db_path, sql_dialect)
+    if issues:
+        return "Query cannot execute: " + "; ".join(issues) + "."
+    if _executes(sql_query, db_path, sql_dialect):
+        return "Query executed successfully."
+    return "Query failed to execute."
\ No newline at end of file
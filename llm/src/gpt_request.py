@@ -1,39 +1,297 @@
 #!/usr/bin/env python3
 import argparse
-from openai import OpenAI
 import json
 import os
 import sys
-import httpx
 import time
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+from prompt import generate_combined_prompts_one, get_prompt_builder
+from evaluation.prompt_builder import PromptCacheStats
+from evaluation.router import CascadeRouter
+from evaluation.self_consistency import execute_candidate, extract_sql
+from evaluation.result_cache import default_cache
+from evaluation import tracing, profiling
+from evaluation.streaming import stream_sql
+from session import SQLSession
+
+
+def load_eval_data(eval_path):
+    """Load questions either as a BIRD-style list or as {"db_id", "questions"}."""
+    with open(eval_path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return [
+            {"db_id": data["db_id"], "evidence": "", **question}
+            for question in data["questions"]
+        ]
+    return data
+
+
+def decouple_question_schema(datasets, db_root_path):
+    question_list = []
+    db_path_list = []
+    knowledge_list = []
+    for data in datasets:
+        question_list.append(data["question"])
+        db_path_list.append(
+            os.path.join(db_root_path, data["db_id"], data["db_id"] + ".sqlite")
+        )
+        knowledge_list.append(data.get("evidence", ""))
+    return question_list, db_path_list, knowledge_list
+
+
+def connect_gpt(client, engine, prompt, max_tokens, temperature, stop=None):
+    with tracing.span("llm.request", engine=engine) as sp:
+        response = client.chat.completions.create(
+            model=engine,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+        )
+        if response.usage is not None:
+            sp.set(
+                prompt_tokens=response.usage.prompt_tokens,
+                completion_tokens=response.usage.completion_tokens,
+            )
+    return response
+
+
+def post_process_response(sql, db_path):
+    db_id = os.path.basename(db_path).split(".sqlite")[0]
+    sql = sql.strip() if sql else " "
+    return f"{sql}\t----- bird -----\t{db_id}"
+
+
+def generate_sql_file(sql_lst, output_path):
+    result = {str(i): sql for i, sql in enumerate(sql_lst)}
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(result, f, indent=4)
+    return result
+
+
+def collect_response_from_gpt(
+    client, db_path_list, question_list, knowledge_list, args, cache_stats, router=None,
+    latencies=None
+):
+    """Generate one SQL query per question, num_process requests at a time."""
+
+    def worker(i):
+        db_id = os.path.basename(db_path_list[i]).split(".sqlite")[0]
+        with tracing.span("question", idx=i, db_id=db_id), profiling.profile(db_id):
+            return generate_one(i)
+
+    def request_sql(i, prompt, engine):
+        for retry_count in range(3):
+            try:
+                if args.stream:
+                    result = stream_sql(
+                        client, engine, [{"role": "user", "content": prompt}],
+                        max_tokens=512, temperature=0
+                    )
+                    if latencies is not None:
+                        latencies[i] = {
+                            "ttft": result["ttft"],
+                            "time_to_sql": result["time_to_sql"],
+                            "chunks": result["chunks"],
+                            "cut_off": result["cut_off"],
+                        }
+                    return result["sql"]
+                response = connect_gpt(
+                    client, engine, prompt, max_tokens=512, temperature=0
+                )
+                cache_stats.record(response.usage)
+                return response.choices[0].message.content
+            except Exception as e:
+                print(f"\nError for question {i} (attempt {retry_count + 1}/3): {str(e)}")
+                time.sleep(2 ** (retry_count + 1))
+        return None
+
+    def generate_one(i):
+        knowledge = knowledge_list[i] if args.use_knowledge == "True" else None
+        prompt = generate_combined_prompts_one(
+            db_path=db_path_list[i],
+            question=question_list[i],
+            sql_dialect=args.sql_dialect,
+            knowledge=knowledge,
+            schema_format=args.schema_format,
+            token_budget=args.schema_token_budget,
+            join_hints=args.join_hints,
+        )
+        if router is None:
+            return post_process_response(request_sql(i, prompt, args.engine), db_path_list[i])
+
+        def accept(sql):
+            if not sql:
+                return False
+            if args.sql_dialect != "SQLite":
+                return True
+            return execute_candidate(sql, db_path_list[i], timeout=args.validation_time_out) is not None
+
+        routed = router.run(
+            question_list[i],
+            knowledge or "",
+            get_prompt_builder(
+                args.sql_dialect, args.schema_format, args.schema_token_budget
+            ).prefix(db_path_list[i]),
+            generate=lambda engine: request_sql(i, prompt, engine),
+            accept=accept,
+        )
+        return post_process_response(routed["sql"], db_path_list[i])
+
+    with ThreadPoolExecutor(max_workers=args.num_process) as executor:
+        response_list = list(
+            tqdm(executor.map(worker, range(len(question_list))), total=len(question_list))
+        )
+    return response_list
+
+
+def write_latency_report(latencies, output_path):
+    """Write per-request streaming timings and print their medians."""
+    with open(output_path, "w") as f:
+        json.dump({str(i): latencies[i] for i in sorted(latencies)}, f, indent=4)
+    for key in ("ttft", "time_to_sql"):
+        values = sorted(v[key] for v in latencies.values() if v[key] is not None)
+        if values:
+            print(f"median {key}: {values[len(values) // 2]:.3f}s over {len(values)} requests")
+    print(f"streams cut off early: {sum(v['cut_off'] for v in latencies.values())}/{len(latencies)}")
+
+
+def create_client(api_key, base_url):
+    # openai and httpx take over half a second to import, so only runs that call the API load them
+    import httpx
+    from openai import OpenAI
+
+    # Create a custom HTTP client without proxy settings
+    http_client = httpx.Client(timeout=60.0, verify=True)
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+
+
+def run_batch(api_key, args):
+    """Generate SQL for every question in eval_path and write the prediction file."""
+    client = create_client(api_key, args.base_url)
+    cache_stats = PromptCacheStats()
+    router = CascadeRouter(args.fast_engine, args.engine) if args.router else None
+    latencies = {}
+
+    eval_data = load_eval_data(args.eval_path)
+    question_list, db_path_list, knowledge_list = decouple_question_schema(
+        eval_data, args.db_root_path
+    )
+    responses = collect_response_from_gpt(
+        client, db_path_list, question_list, knowledge_list, args, cache_stats, router,
+        latencies
+    )
+
+    cot = "_cot" if args.chain_of_thought == "True" else ""
+    output_name = f"predict_{args.mode}_{args.engine}{cot}_{args.sql_dialect}.json"
+    output_path = os.path.join(args.data_output_path, output_name)
+    generate_sql_file(responses, output_path)
+    print(f"successfully collect results from {args.engine} for {args.mode} evaluation; "
+          f"SQL dialect {args.sql_dialect}, use knowledge: {args.use_knowledge}, use COT: {args.chain_of_thought}")
+    if args.stream:
+        write_latency_report(latencies, output_path.replace(".json", "_latency.json"))
+    else:
+        print(cache_stats.summary())
+    if router is not None:
+        print(router.summary())
+        if default_cache() is not None:
+            print(default_cache().summary())
+    client.close()
+
+
+def parse_args():
+    args_parser = argparse.ArgumentParser()
+    args_parser.add_argument("--eval_path", type=str, default="")
+    args_parser.add_argument("--mode", type=str, default="mini_dev")
+    args_parser.add_argument("--db_root_path", type=str, default="./data/dev_databases/")
+    args_parser.add_argument("--api_key", type=str, default="")
+    args_parser.add_argument(
+        "--base_url", type=str, default=os.getenv("OPENAI_BASE_URL"),
+        help="OpenAI-compatible endpoint, e.g. python -m evaluation.mock_server"
+    )
+    args_parser.add_argument("--engine", type=str, default="gpt-4-turbo")
+    args_parser.add_argument("--data_output_path", type=str, default="./exp_result/")
+    args_parser.add_argument("--use_knowledge", type=str, default="True")
+    args_parser.add_argument("--chain_of_thought", type=str, default="True")
+    args_parser.add_argument("--num_process", type=int, default=1)
+    args_parser.add_argument("--sql_dialect", type=str, default="SQLite")
+    args_parser.add_argument(
+        "--schema_format", type=str, default="ddl", choices=["ddl", "table", "compact"],
+        help="how the database schema is written into the prompt"
+    )
+    args_parser.add_argument(
+        "--join_hints", action="store_true",
+        help="add the join path between the tables a question mentions to its prompt"
+    )
+    args_parser.add_argument(
+        "--schema_token_budget", type=int, default=None,
+        help="degrade the schema (samples, then columns, then tables) to fit this many tokens"
+    )
+    args_parser.add_argument(
+        "--db_path", type=str, default="",
+        help="bind the chat to this database and execute the generated SQL"
+    )
+    args_parser.add_argument("--page_size", type=int, default=20)
+    args_parser.add_argument("--max_rows", type=int, default=1000)
+    args_parser.add_argument("--query_time_out", type=float, default=10.0)
+    args_parser.add_argument("--max_col_width", type=int, default=30)
+    args_parser.add_argument(
+        "--stream", action="store_true",
+        help="stream completions and stop as soon as a complete SQL statement has arrived"
+    )
+    args_parser.add_argument(
+        "--router", action="store_true",
+        help="send easy questions to --fast_engine and escalate to --engine when the SQL fails to execute"
+    )
+    args_parser.add_argument("--fast_engine", type=str, default="gpt-4o-mini")
+    args_parser.add_argument("--validation_time_out", type=float, default=10.0)
+    args_parser.add_argument(
+        "--trace_path", type=str, default="",
+        help="write spans to this file (.jsonl for JSONL, otherwise Chrome trace format)"
+    )
+    args_parser.add_argument(
+        "--profile", type=str, default="",
+        help="profile every question and write the merged pstats to this file, with a .txt report"
+    )
+    return args_parser.parse_args()
+
 
 def main():
-    # Get API key from environment
-    api_key = os.getenv("OPENAI_API_KEY")
+    args = parse_args()
+
+    # Get API key from the command line or the environment
+    api_key = args.api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key and args.base_url:
+        # Local OpenAI-compatible servers accept any key
+        api_key = "mock-key"
     if not api_key:
         print("Error: OPENAI_API_KEY environment variable is not set")
         sys.exit(1)
     
     print(f"Using API key: {api_key[:8]}...")  # Print first 8 chars for verification
     
+    # Batch generation when an evaluation file is given, interactive chat otherwise
+    if args.eval_path:
+        tracing.start(args.trace_path)
+        profiling.start(args.profile)
+        run_batch(api_key, args)
+        if args.trace_path:
+            tracing.export(args.trace_path)
+        if args.profile:
+            print(f"Profile written to {args.profile}, report in {profiling.export(args.profile)}")
+        return
+    
     # Initialize the OpenAI client
     try:
-        # Create a custom HTTP client without proxy settings
-        http_client = httpx.Client(
-            timeout=60.0,  # Increased timeout
-            verify=True
-        )
-        
-        # Initialize the client with the standard OpenAI client
-        client = OpenAI(
-            api_key=api_key,
-            http_client=http_client
-        )
+        client = create_client(api_key, args.base_url)
         
         # Test the connection
         print("Testing API connection...")
         response = client.chat.completions.create(
-            model="gpt-4-turbo",
+            model=args.engine,
             messages=[{"role": "user", "content": "Test connection"}],
             max_tokens=5
         )
@@ -48,6 +306,21 @@ def main():
         print("4. Verify the API version is supported")
         sys.exit(1)
 
+    # Bind the chat to a database so generated SQL is executed and paged
+    session = None
+    pages = None
+    if args.db_path:
+        session = SQLSession(
+            args.db_path,
+            sql_dialect=args.sql_dialect,
+            page_size=args.page_size,
+            max_rows=args.max_rows,
+            time_limit=args.query_time_out,
+            max_col_width=args.max_col_width,
+        )
+        session.connection()
+        print(f"Bound to database: {args.db_path}")
+    
     # Simple chat loop
     print("\nChat Agent (type 'exit' to quit)")
     print("-" * 50)
@@ -56,28 +329,62 @@ def main():
         user_input = input("\nYou: ")
         if user_input.lower() == 'exit':
             break
+        if session is not None and user_input.strip().lower() == 'more':
+            try:
+                page = next(pages, None) if pages is not None else None
+                print(session.render(page) if page is not None else "(no pending results)")
+            except Exception as e:
+                pages = None
+                print(f"Error executing SQL: {str(e)}")
+            continue
             
         # Add retry logic for API calls
         max_retries = 3
         retry_count = 0
         success = False
+        reply_sql = None
         
         while retry_count < max_retries and not success:
             try:
-                # Create a chat completion
-                response = client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful AI assistant specializing in SQL query generation."},
-                        {"role": "user", "content": user_input}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                content = user_input
+                if session is not None:
+                    content = generate_combined_prompts_one(
+                        args.db_path, user_input, args.sql_dialect,
+                        schema_format=args.schema_format,
+                        token_budget=args.schema_token_budget,
+                        join_hints=args.join_hints,
+                    )
+                messages = [
+                    {"role": "system", "content": "You are a helpful AI assistant specializing in SQL query generation."},
+                    {"role": "user", "content": content}
+                ]
                 
-                # Print the response
-                print("\nAssistant:", response.choices[0].message.content)
-                success = True
+                if args.stream:
+                    # Render tokens as they arrive and stop once the SQL is complete
+                    print("\nAssistant: ", end="", flush=True)
+                    result = stream_sql(
+                        client, args.engine, messages, max_tokens=1000, temperature=0.7,
+                        on_token=lambda text: print(text, end="", flush=True)
+                    )
+                    ttft = f"{result['ttft']:.2f}s" if result["ttft"] is not None else "n/a"
+                    print(f"\n[first token {ttft}, SQL complete {result['time_to_sql']:.2f}s"
+                          f"{', rest of the response skipped' if result['cut_off'] else ''}]")
+                    reply_sql = result["sql"]
+                    success = True
+                else:
+                    # Create a chat completion
+                    response = client.chat.completions.create(
+                        model=args.engine,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=1000
+                    )
+                    
+                    # Print the response
+                    reply = response.choices[0].message.content
+                    print("\nAssistant:", reply)
+                    reply_sql = extract_sql(reply)
+                    success = True
                 
             except Exception as e:
                 retry_count += 1
@@ -94,9 +401,26 @@ def main():
                     print("3. Ensure your API key has sufficient permissions")
                     print("4. Check if you've exceeded API rate limits")
                     print("5. Try increasing your API usage limit in your account settings")
+        
+        if success and session is not None and reply_sql:
+            # Show the first page now; 'more' fetches the next one
+            if pages is not None:
+                pages.close()
+            pages = session.execute(reply_sql)
+            try:
+                print(session.render(next(pages)))
+            except Exception as e:
+                pages = None
+                print(f"Error executing SQL: {str(e)}")
     
-    # Close the HTTP client when done
-    http_client.close()
+    # Close the HTTP client and database session when done
+    if pages is not None:
+        pages.close()
+    if session is not None:
+        session.close()
+        if default_cache() is not None:
+            print(default_cache().summary())
+    client.close()
 
 if __name__ == "__main__":
     main()
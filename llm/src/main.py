@@ -3,7 +3,10 @@ import json
 import argparse
 from tqdm import tqdm
 from autogen_bird.agents import create_agent_system
-from autogen_bird.utils import load_data, save_results
+from autogen_bird.utils import load_data, save_results, validate_sql
+from autogen_bird.router import CascadeRouter
+from autogen_bird.result_cache import default_cache
+from autogen_bird import tracing, profiling
 
 def main():
     parser = argparse.ArgumentParser(description="Autogen BIRD-SQL Multi-Agent System")
@@ -16,13 +19,35 @@ def main():
     parser.add_argument("--sql_dialect", type=str, default="SQLite", 
                         choices=["SQLite", "MySQL", "PostgreSQL"],
                         help="SQL dialect to use")
-    parser.add_argument("--api_key", type=str, required=True, 
+    parser.add_argument("--api_key", type=str, default=os.getenv("OPENAI_API_KEY"), 
                         help="OpenAI API key")
+    parser.add_argument("--base_url", type=str, default=os.getenv("OPENAI_BASE_URL"), 
+                        help="OpenAI-compatible endpoint, e.g. python -m evaluation.mock_server")
     parser.add_argument("--model", type=str, default="gpt-4-turbo", 
                         help="OpenAI model to use")
+    parser.add_argument("--router", action="store_true", 
+                        help="Send easy questions to --fast_model and escalate to --model when validation fails")
+    parser.add_argument("--fast_model", type=str, default="gpt-4o-mini", 
+                        help="Cheaper model used by the router for easy questions")
+    parser.add_argument("--schema_format", type=str, default="table", 
+                        choices=["ddl", "table", "compact"],
+                        help="How the database schema is written into the prompt")
+    parser.add_argument("--schema_token_budget", type=int, default=None, 
+                        help="Degrade the schema (samples, then columns, then tables) to fit this many tokens")
+    parser.add_argument("--compact_context", action="store_true", 
+                        help="Run the agents as a pipeline that forwards only each role's structured inputs instead of the group chat transcript")
     parser.add_argument("--num_samples", type=int, default=-1, 
                         help="Number of samples to process (-1 for all)")
+    parser.add_argument("--trace_path", type=str, default="", 
+                        help="Write spans to this file (.jsonl for JSONL, otherwise Chrome trace format)")
+    parser.add_argument("--profile", type=str, default="", 
+                        help="Profile every question and write the merged pstats to this file, with a .txt report")
     args = parser.parse_args()
+    if not args.api_key and not args.base_url:
+        parser.error("--api_key (or OPENAI_API_KEY) is required unless --base_url is set")
+    
+    tracing.start(args.trace_path)
+    profiling.start(args.profile)
     
     # Create output directory if it doesn't exist
     os.makedirs(args.output_path, exist_ok=True)
@@ -34,6 +59,23 @@ def main():
     if args.num_samples > 0:
         data = data[:args.num_samples]
     
+    # Create the agent systems once so per-database schema prefixes stay cached
+    models = [args.model] + ([args.fast_model] if args.router else [])
+    agent_systems = {
+        model: create_agent_system(
+            api_key=args.api_key or "mock-key",
+            model=model,
+            sql_dialect=args.sql_dialect,
+            base_url=args.base_url,
+            schema_format=args.schema_format,
+            schema_token_budget=args.schema_token_budget,
+            compact_context=args.compact_context
+        )
+        for model in models
+    }
+    agent_system = agent_systems[args.model]
+    router = CascadeRouter(args.fast_model, args.model) if args.router else None
+    
     # Process each sample
     results = {}
     for idx, sample in enumerate(tqdm(data, desc="Processing samples")):
@@ -42,21 +84,27 @@ def main():
         evidence = sample.get("evidence", "")
         
         # Get database path
-        db_path = os.path.join(args.db_root_path, db_id)
-        
-        # Create agent system
-        agent_system = create_agent_system(
-            api_key=args.api_key,
-            model=args.model,
-            sql_dialect=args.sql_dialect
-        )
+        db_path = os.path.join(args.db_root_path, db_id, f"{db_id}.sqlite")
         
         # Generate SQL query
-        sql_query = agent_system.generate_sql(
-            question=question,
-            db_path=db_path,
-            evidence=evidence
-        )
+        with tracing.span("question", idx=idx, db_id=db_id), profiling.profile(db_id):
+            if router is None:
+                sql_query = agent_system.generate_sql(
+                    question=question,
+                    db_path=db_path,
+                    evidence=evidence
+                )
+            else:
+                routed = router.run(
+                    question,
+                    evidence,
+                    agent_system.prompt_builder.prefix(db_path),
+                    generate=lambda model: agent_systems[model].generate_sql(
+                        question=question, db_path=db_path, evidence=evidence
+                    ),
+                    accept=lambda sql: bool(sql) and validate_sql(sql, db_path, args.sql_dialect),
+                )
+                sql_query = routed["sql"]
         
         # Store result
         results[str(idx)] = f"{sql_query}\t----- bird -----\t{db_id}"
@@ -69,6 +117,14 @@ def main():
     save_results(results, output_file)
     
     print(f"Results saved to {output_file}")
+    if router is not None:
+        print(router.summary())
+    if default_cache() is not None:
+        print(default_cache().summary())
+    if args.trace_path:
+        tracing.export(args.trace_path)
+    if args.profile:
+        print(f"Profile written to {args.profile}, report in {profiling.export(args.profile)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
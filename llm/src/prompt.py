@@ -1,5 +1,16 @@
+import sys
+from pathlib import Path
 from table_schema import generate_schema_prompt
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from evaluation.prompt_builder import PromptBuilder
+from evaluation.join_graph import join_hint
+from evaluation.router import relevant_tables
+from evaluation.tracing import span
+
+# One builder per dialect and schema format, each memoizing the schema prefix of every database it sees
+prompt_builders = {}
+
 
 def generate_comment_prompt(question, sql_dialect, knowledge=None):
     base_prompt = f"-- Using valid {sql_dialect}"
@@ -14,6 +25,15 @@ def generate_comment_prompt(question, sql_dialect, knowledge=None):
     return combined_prompt
 
 
+def generate_join_prompt(db_path, question, schema, knowledge=None):
+    # Join path between the tables the question mentions, from the precomputed join graph
+    hint = join_hint(db_path, relevant_tables(question, knowledge or "", schema))
+    if not hint:
+        return ""
+    lines = "\n".join(f"-- {line}" for line in hint.split("\n"))
+    return f"-- Join path between the tables mentioned in the question:\n{lines}"
+
+
 def generate_cot_prompt(sql_dialect):
     return f"\nGenerate the {sql_dialect} for the above question after thinking step by step: "
 
@@ -28,13 +48,31 @@ def generate_instruction_prompt(sql_dialect):
         """
 
 
-def generate_combined_prompts_one(db_path, question, sql_dialect, knowledge=None):
-    schema_prompt = generate_schema_prompt(sql_dialect, db_path)
-    comment_prompt = generate_comment_prompt(question, sql_dialect, knowledge)
-    cot_prompt = generate_cot_prompt(sql_dialect)
-    instruction_prompt = generate_instruction_prompt(sql_dialect)
+def get_prompt_builder(sql_dialect, schema_format="ddl", token_budget=None):
+    key = (sql_dialect, schema_format, token_budget)
+    if key not in prompt_builders:
+        prompt_builders[key] = PromptBuilder(
+            lambda db_path: generate_schema_prompt(
+                sql_dialect, db_path, schema_format=schema_format, token_budget=token_budget
+            )
+        )
+    return prompt_builders[key]
 
-    combined_prompts = "\n\n".join(
-        [schema_prompt, comment_prompt, cot_prompt, instruction_prompt]
-    )
+
+def generate_combined_prompts_one(db_path, question, sql_dialect, knowledge=None,
+                                  schema_format="ddl", token_budget=None, join_hints=False):
+    # The schema prefix is built once per database; only the question parts change
+    with span("build_prompt", db_path=db_path) as sp:
+        builder = get_prompt_builder(sql_dialect, schema_format, token_budget)
+        comment_prompt = generate_comment_prompt(question, sql_dialect, knowledge)
+        join_prompt = ""
+        if join_hints and sql_dialect == "SQLite":
+            join_prompt = generate_join_prompt(db_path, question, builder.prefix(db_path), knowledge)
+        cot_prompt = generate_cot_prompt(sql_dialect)
+        instruction_prompt = generate_instruction_prompt(sql_dialect)
+
+        combined_prompts = builder.build(
+            db_path, comment_prompt, join_prompt, cot_prompt, instruction_prompt
+        )
+        sp.set(chars=len(combined_prompts))
     return combined_prompts
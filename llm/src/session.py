@@ -0,0 +1,145 @@
+"""
+Interactive SQL session bound to one database.
+
+Queries run on a warm, read-only connection that is kept open for the whole
+session, and results are fetched page by page with fetchmany under row and time
+caps, so a huge result is never materialized with fetchall. Results that were read
+to the end are kept in the shared result cache, so asking the same question again
+pages through the cached rows without touching the database.
+"""
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from evaluation.result_cache import default_cache, estimate_bytes
+from table_schema import nice_look_table
+
+
+class ResultPage:
+    def __init__(self, columns, rows, page_no, elapsed, done, stop_reason=None):
+        self.columns = columns
+        self.rows = rows
+        self.page_no = page_no
+        self.elapsed = elapsed
+        self.done = done
+        self.stop_reason = stop_reason
+
+
+class SQLSession:
+    def __init__(
+        self,
+        db_path,
+        sql_dialect="SQLite",
+        page_size=20,
+        max_rows=1000,
+        time_limit=10.0,
+        max_col_width=30,
+    ):
+        if sql_dialect != "SQLite":
+            raise ValueError("Interactive sessions only support SQLite databases")
+        self.db_path = db_path
+        self.sql_dialect = sql_dialect
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.time_limit = time_limit
+        self.max_col_width = max_col_width
+        self._conn = None
+        self._deadline = None
+
+    def connection(self):
+        """Return the session's warm read-only connection, opening it on first use."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA query_only = 1")
+            # Abort statements that run past the session's time limit
+            self._conn.set_progress_handler(self._check_deadline, 10000)
+        return self._conn
+
+    def _check_deadline(self):
+        return int(self._deadline is not None and time.monotonic() > self._deadline)
+
+    def execute(self, sql):
+        """Yield ResultPage objects for a query until it is exhausted or a cap is hit.
+
+        time_limit applies to running the query up to its first page and to each page after.
+        """
+        cache = default_cache()
+        cached = cache.get(self.db_path, sql, namespace="session") if cache is not None else None
+        if cached is not None:
+            yield from self._cached_pages(*cached)
+            return
+        started = time.monotonic()
+        self._deadline = started + self.time_limit
+        cursor = self.connection().cursor()
+        try:
+            cursor.execute(sql)
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            fetched = 0
+            page_no = 0
+            seen = []
+            while True:
+                if page_no:
+                    # The time limit covers reading each page, not the time spent looking at the last one
+                    started = time.monotonic()
+                    self._deadline = started + self.time_limit
+                size = min(self.page_size, self.max_rows - fetched)
+                rows = cursor.fetchmany(size) if size > 0 else []
+                fetched += len(rows)
+                if seen is not None:
+                    seen.extend(rows)
+                page_no += 1
+                elapsed = time.monotonic() - started
+                stop_reason = None
+                if len(rows) < size or not columns:
+                    done = True
+                elif fetched >= self.max_rows:
+                    done, stop_reason = True, f"row limit of {self.max_rows} reached"
+                elif elapsed > self.time_limit:
+                    done, stop_reason = True, f"time limit of {self.time_limit:.0f}s reached"
+                else:
+                    done = False
+                if done and stop_reason is None and cache is not None and columns:
+                    # Only complete results are cached; capped ones would replay truncated
+                    cache.put(self.db_path, sql, (columns, seen), namespace="session",
+                              size=estimate_bytes(seen))
+                    seen = None
+                yield ResultPage(columns, rows, page_no, elapsed, done, stop_reason)
+                if done:
+                    break
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                raise TimeoutError(f"Query exceeded the {self.time_limit:.0f}s time limit") from e
+            raise
+        finally:
+            self._deadline = None
+            cursor.close()
+
+    def _cached_pages(self, columns, rows):
+        started = time.monotonic()
+        for page_no, offset in enumerate(range(0, max(len(rows), 1), self.page_size), 1):
+            page = rows[offset:offset + self.page_size]
+            done = offset + self.page_size >= len(rows)
+            yield ResultPage(columns, page, page_no, time.monotonic() - started, done)
+
+    def render(self, page):
+        """Render a page as a bounded-width text table."""
+        if not page.columns:
+            return "(statement executed, no result set)"
+        if not page.rows:
+            return "(no rows)" if page.page_no == 1 else "(no more rows)"
+        table = nice_look_table(page.columns, page.rows, max_width=self.max_col_width)
+        footer = f"-- page {page.page_no}, {len(page.rows)} rows, {page.elapsed:.3f}s"
+        if page.stop_reason:
+            footer += f", stopped: {page.stop_reason}"
+        elif not page.done:
+            footer += " (type 'more' for the next page)"
+        return f"{table}\n{footer}"
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,6 +1,12 @@
+import sys
 import sqlite3
-import pymysql
-import psycopg2
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from evaluation.tracing import span
+from evaluation.schema_render import schema_prompt as render_schema_prompt
+from evaluation.profiler import load_profile
+from evaluation.backends import get_backend
 
 db_table_map = {
     "debit_card_specializing": [
@@ -89,8 +95,18 @@ db_table_map = {
 }
 
 
-def nice_look_table(column_names: list, values: list):
+def truncate_cell(value, max_width=None):
+    text = str(value)
+    if max_width is not None and len(text) > max_width:
+        return text[: max(0, max_width - 3)] + "..."
+    return text
+
+
+def nice_look_table(column_names: list, values: list, max_width=None):
     rows = []
+    # Cap every cell at max_width characters so long TEXT/BLOB values stay readable
+    column_names = [truncate_cell(column, max_width) for column in column_names]
+    values = [[truncate_cell(v, max_width) for v in value] for value in values]
     # Determine the maximum width of each column
     widths = [
         max(len(str(value[i])) for value in values + [column_names])
@@ -157,20 +173,6 @@ def generate_schema_prompt_sqlite(db_path, num_rows=None):
     return schema_prompt
 
 
-def connect_mysql():
-    # Open database connection
-    # Connect to the database"
-    db = pymysql.connect(
-        host="localhost",
-        user="root",
-        password="YOUR_PASSWORD",
-        database="BIRD",
-        unix_socket="/tmp/mysql.sock",
-        # port=3306,
-    )
-    return db
-
-
 def format_mysql_create_table(table_name, columns_info):
     lines = []
     lines.append(f"CREATE TABLE {table_name}\n(")
@@ -211,58 +213,64 @@ def format_postgresql_create_table(table_name, columns_info):
 
 
 def generate_schema_prompt_mysql(db_path):
-    db = connect_mysql()
-    cursor = db.cursor()
+    backend = get_backend("MySQL")
+    database = backend.settings.get("database", "BIRD")
     db_name = db_path.split("/")[-1].split(".sqlite")[0]
     tables = [table for table in db_table_map[db_name]]
     schemas = {}
-    for table in tables:
-        cursor.execute(f"DESCRIBE BIRD.{table}")
-        raw_schema = cursor.fetchall()
-        pretty_schema = format_mysql_create_table(table, raw_schema)
-        schemas[table] = pretty_schema
+    with backend.connection(db_path) as db:
+        cursor = db.cursor()
+        for table in tables:
+            cursor.execute(f"DESCRIBE {database}.{table}")
+            raw_schema = cursor.fetchall()
+            pretty_schema = format_mysql_create_table(table, raw_schema)
+            schemas[table] = pretty_schema
+        cursor.close()
     schema_prompt = "\n\n".join(schemas.values())
-    db.close()
     return schema_prompt
 
 
-def connect_postgresql():
-    # Open database connection
-    # Connect to the database
-    db = psycopg2.connect(
-        "dbname=BIRD user=root host=localhost password=YOUR_PASSWORD port=5432"
-    )
-    return db
-
-
 def generate_schema_prompt_postgresql(db_path):
-    db = connect_postgresql()
-    cursor = db.cursor()
     db_name = db_path.split("/")[-1].split(".sqlite")[0]
     tables = [table for table in db_table_map[db_name]]
     schemas = {}
-    for table in tables:
-        cursor.execute(
-            f"""
-                SELECT column_name, data_type, is_nullable
-                FROM information_schema.columns
-                WHERE table_name = '{table}';
-            """
-        )
-        raw_schema = cursor.fetchall()
-        pretty_schema = format_postgresql_create_table(table, raw_schema)
-        schemas[table] = pretty_schema
+    with get_backend("PostgreSQL").connection(db_path) as db:
+        cursor = db.cursor()
+        for table in tables:
+            cursor.execute(
+                f"""
+                    SELECT column_name, data_type, is_nullable
+                    FROM information_schema.columns
+                    WHERE table_name = '{table}';
+                """
+            )
+            raw_schema = cursor.fetchall()
+            pretty_schema = format_postgresql_create_table(table, raw_schema)
+            schemas[table] = pretty_schema
+        cursor.close()
     schema_prompt = "\n\n".join(schemas.values())
-    db.close()
     return schema_prompt
 
 
-def generate_schema_prompt(sql_dialect, db_path=None, num_rows=None):
-    if sql_dialect == "SQLite":
-        return generate_schema_prompt_sqlite(db_path, num_rows)
-    elif sql_dialect == "MySQL":
-        return generate_schema_prompt_mysql(db_path)
-    elif sql_dialect == "PostgreSQL":
-        return generate_schema_prompt_postgresql(db_path)
-    else:
-        raise ValueError("Unsupported SQL dialect: {}".format(sql_dialect))
+def generate_schema_prompt(sql_dialect, db_path=None, num_rows=None, schema_format="ddl",
+                           token_budget=None, max_cell_width=None):
+    with span("generate_schema_prompt", db_path=db_path, sql_dialect=sql_dialect) as sp:
+        if sql_dialect == "SQLite" and (
+            schema_format != "ddl" or token_budget or max_cell_width
+            or (num_rows and load_profile(db_path))
+        ):
+            # Compact, budgeted or profiled rendering; the plain DDL path below is kept byte-for-byte
+            schema_prompt = render_schema_prompt(
+                db_path, schema_format, token_budget, sample_rows=num_rows or 0,
+                max_cell_width=max_cell_width or 40
+            )
+        elif sql_dialect == "SQLite":
+            schema_prompt = generate_schema_prompt_sqlite(db_path, num_rows)
+        elif sql_dialect == "MySQL":
+            schema_prompt = generate_schema_prompt_mysql(db_path)
+        elif sql_dialect == "PostgreSQL":
+            schema_prompt = generate_schema_prompt_postgresql(db_path)
+        else:
+            raise ValueError("Unsupported SQL dialect: {}".format(sql_dialect))
+        sp.set(chars=len(schema_prompt))
+    return schema_prompt
@@ -214,11 +214,6 @@ _Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}_
         f.write(report)
 
 def main():
-    # Check for OpenAI API key
-    if "OPENAI_API_KEY" not in os.environ:
-        print("Error: OPENAI_API_KEY environment variable is not set")
-        return
-    
     # Load test data
     test_data_path = "sql-chat-agent/data/mini_dev_sqlite.json"
     db_path = "sql-chat-agent/data/dev_databases/sample_db.sqlite"  # Updated path
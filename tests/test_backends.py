@@ -0,0 +1,56 @@
+import sqlite3
+import pytest
+from evaluation import backends
+from evaluation.backends import ResultTooLarge, SQLiteBackend, load_settings
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "numbers.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE numbers (n INTEGER)")
+    conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(50)])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def backend():
+    backend = SQLiteBackend(load_settings("SQLite"))
+    yield backend
+    backend.close()
+
+def test_sqlite_results_are_not_capped_by_default(monkeypatch, db_path, backend):
+    monkeypatch.delenv("BIRD_MAX_RESULT_ROWS", raising=False)
+    monkeypatch.delenv("BIRD_MAX_RESULT_MB", raising=False)
+    monkeypatch.setattr(backends, "DEFAULT_MAX_RESULT_ROWS", 10)
+    assert len(backend.fetch("SELECT n FROM numbers", db_path, batch_size=7)) == 50
+
+def test_sqlite_results_are_capped_when_asked(monkeypatch, db_path, backend):
+    monkeypatch.setenv("BIRD_MAX_RESULT_ROWS", "10")
+    with pytest.raises(ResultTooLarge):
+        backend.fetch("SELECT n FROM numbers", db_path, batch_size=7)
+    assert len(backend.execute("SELECT n FROM numbers", db_path)) == 50
+
+def test_numeric_settings_accept_fractions(monkeypatch):
+    monkeypatch.setenv("BIRD_SQLITE_REPLICA_MB", "0.5")
+    monkeypatch.setenv("BIRD_SQLITE_MMAP_MB", "64")
+    settings = load_settings("SQLite")
+    assert settings["replica_mb"] == 0.5
+    assert settings["mmap_mb"] == 64 and isinstance(settings["mmap_mb"], int)
+
+def test_mysql_host_is_not_overridden_by_a_default_socket(monkeypatch):
+    monkeypatch.delenv("BIRD_DB_CONFIG", raising=False)
+    monkeypatch.setenv("BIRD_MYSQL_HOST", "db.example.com")
+    settings = load_settings("MySQL")
+    assert settings["host"] == "db.example.com"
+    assert settings["unix_socket"] is None
+
+def test_probe_reads_one_row_and_keeps_the_connection(db_path, backend):
+    with backend.connection(db_path) as before:
+        pass
+    backend.probe("SELECT n FROM numbers", db_path)
+    with pytest.raises(sqlite3.OperationalError):
+        backend.probe("SELECT missing FROM numbers", db_path)
+    with backend.connection(db_path) as after:
+        pass
+    assert before is after
@@ -0,0 +1,70 @@
+import sqlite3
+import pytest
+from evaluation.gold_store import GoldStore, GoldStoreError, build_gold_store, ensure_gold_store
+
+QUERIES = [
+    "SELECT id, name, score, photo FROM people ORDER BY id",
+    "SELECT name FROM people",
+    "SELECT missing FROM people",
+    "SELECT id FROM people WHERE id < 0",
+    "SELECT COUNT(*) FROM people",
+]
+
+@pytest.fixture
+def gold(tmp_path):
+    db_path = str(tmp_path / "people.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE people (id INTEGER, name TEXT, score REAL, photo BLOB)")
+    conn.executemany("INSERT INTO people VALUES (?, ?, ?, ?)", [
+        (1, "ann", 2.5, b"\x00\xff"), (2, "bob", None, None), (3, "ann", 2.5, b"\x00\xff"),
+    ])
+    conn.commit()
+    conn.close()
+    gold_path = str(tmp_path / "gold.sql")
+    with open(gold_path, "w") as f:
+        f.write("".join(f"{sql}\tpeople\n" for sql in QUERIES))
+    return gold_path, [db_path] * len(QUERIES), str(tmp_path / "store")
+
+def fetch(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+def test_results_decode_back_to_the_fetched_rows(gold):
+    gold_path, db_paths, store_path = gold
+    build_gold_store(store_path, gold_path, QUERIES, db_paths)
+    store = GoldStore(store_path)
+    assert len(store) == len(QUERIES)
+    for i in (0, 1, 4):
+        assert list(store.get(i)) == fetch(db_paths[i], QUERIES[i])
+    assert list(store.get(3)) == [] and not store.get(3)
+    with pytest.raises(GoldStoreError):
+        store.get(2)
+
+def test_same_set_compares_like_python_sets(gold):
+    gold_path, db_paths, store_path = gold
+    build_gold_store(store_path, gold_path, QUERIES, db_paths)
+    store = GoldStore(store_path)
+    rows = fetch(db_paths[0], QUERIES[0])
+    assert store.get(0).same_set(list(reversed(rows)) + rows[:1])
+    assert not store.get(0).same_set(rows[:1])
+    assert not store.get(0).same_set([row[:3] for row in rows])
+    assert not store.get(0).same_set(rows + [(4, "eve", 1.0, None)])
+    assert store.get(1).same_set([("bob",), ("ann",)])
+    # 3 == 3.0, as in set(predicted) == set(gold)
+    assert store.get(4).same_set([(3.0,)])
+    assert store.get(3).same_set([]) and not store.get(3).same_set([(1,)])
+    assert not store.get(1).same_set([])
+
+def test_shard_store_holds_only_its_questions(gold):
+    gold_path, db_paths, store_path = gold
+    assert ensure_gold_store(store_path, gold_path, QUERIES, db_paths, indices=[1, 4])
+    store = GoldStore(store_path)
+    assert [store.get(i) is not None for i in (0, 1, 3, 4)] == [False, True, False, True]
+    # A store that already holds the questions is reused; one that does not is rebuilt
+    assert not ensure_gold_store(store_path, gold_path, QUERIES, db_paths, indices=[4])
+    assert ensure_gold_store(store_path, gold_path, QUERIES, db_paths, indices=[0, 1])
+    assert ensure_gold_store(store_path, gold_path, QUERIES, db_paths)
+    assert not ensure_gold_store(store_path, gold_path, QUERIES, db_paths, indices=[3])
@@ -0,0 +1,54 @@
+import sqlite3
+import pytest
+from evaluation.join_graph import join_graph, join_path_text
+
+@pytest.fixture
+def db_path(tmp_path):
+    """district <- account <- loan and account <- disp -> client are declared; client.district_id
+    and card.disp_id are only matched by name; lonely joins nothing."""
+    path = str(tmp_path / "bank.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE district (district_id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE account (account_id INTEGER PRIMARY KEY,
+                              district_id INTEGER REFERENCES district (district_id));
+        CREATE TABLE loan (loan_id INTEGER PRIMARY KEY, account_id INTEGER REFERENCES account);
+        CREATE TABLE client (client_id INTEGER PRIMARY KEY, district_id INTEGER);
+        CREATE TABLE disp (disp_id INTEGER PRIMARY KEY, account_id INTEGER REFERENCES account,
+                           client_id INTEGER REFERENCES client);
+        CREATE TABLE card (card_id INTEGER PRIMARY KEY, disp_id INTEGER);
+        CREATE TABLE lonely (x INTEGER);
+    """)
+    conn.close()
+    return path
+
+def test_shortest_path_uses_declared_keys(db_path):
+    edges, unreachable = join_graph(db_path).join_path(["loan", "district"])
+    assert unreachable == []
+    assert [(e.left_table, e.right_table) for e in edges] == [("district", "account"), ("account", "loan")]
+
+def test_declared_keys_are_preferred_over_inferred_ones(db_path):
+    # client -> district -> account has the same length but uses an inferred edge
+    edges, _ = join_graph(db_path).join_path(["client", "loan", "account"])
+    assert len(edges) == 3 and not any(e.inferred for e in edges)
+    assert {e.right_table for e in edges} | {"account"} == {"account", "client", "disp", "loan"}
+
+def test_inferred_edge_from_column_name(db_path):
+    edges, _ = join_graph(db_path).join_path(["card", "disp"])
+    assert len(edges) == 1 and edges[0].inferred
+    assert edges[0].condition() in ("card.disp_id = disp.disp_id", "disp.disp_id = card.disp_id")
+
+def test_join_clause_and_lookup_text(db_path):
+    assert join_graph(db_path).join_clause(["LOAN", "`district`"]) == (
+        "FROM district\nJOIN account ON district.district_id = account.district_id"
+        "\nJOIN loan ON account.account_id = loan.account_id"
+    )
+    assert join_path_text(db_path, "district, loan") == join_graph(db_path).join_clause(["district", "loan"])
+    assert join_path_text(db_path, "loan, lonely") == "No join path found to: lonely"
+    assert join_path_text(db_path, "nowhere") == "Unknown tables: nowhere"
+    assert join_path_text(db_path, "loan", dialect="MySQL").startswith("Join paths are only available")
+
+def test_paths_do_not_depend_on_table_order(db_path):
+    graph = join_graph(db_path)
+    assert graph.join_path(["district", "loan"]) == graph.join_path(["loan", "district"])
+    assert join_graph(db_path) is graph
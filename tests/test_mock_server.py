@@ -0,0 +1,27 @@
+from evaluation.mock_server import LatencyModel, MockState
+
+def state(max_cached_prefixes=100000):
+    return MockState({}, LatencyModel("fixed", 0), max_cached_prefixes=max_cached_prefixes)
+
+def test_repeated_prefix_is_cached_in_blocks():
+    mock = state()
+    prompt = "x" * 512 * 10
+    assert mock.cached_tokens(prompt) == 0
+    assert mock.cached_tokens(prompt + "a new question") == 1280
+    # A prefix shorter than 1024 tokens is never reported as cached
+    assert mock.cached_tokens("x" * 512 * 3) == 0
+
+def test_diverging_prompts_share_only_the_common_blocks():
+    mock = state()
+    mock.cached_tokens("s" * 512 * 9 + "a" * 512 * 4)
+    assert mock.cached_tokens("s" * 512 * 9 + "b" * 512 * 4) == 1152
+
+def test_seen_prefixes_are_bounded_least_recently_used_first():
+    mock = state(max_cached_prefixes=12)
+    first, second = "a" * 512 * 10, "b" * 512 * 10
+    mock.cached_tokens(first)
+    mock.cached_tokens(second)
+    assert len(mock.seen_prefixes) == 12
+    # The second prompt's blocks are still held; the first prompt's oldest were evicted
+    assert mock.cached_tokens(second) == 1280
+    assert mock.cached_tokens(first) == 0
@@ -0,0 +1,13 @@
+from evaluation.result_cache import canonical_sql
+
+def test_comments_and_whitespace_are_dropped():
+    sql = "SELECT  a -- first\nFROM t /* the\ntable */ WHERE b = 1 ;"
+    assert canonical_sql(sql) == "SELECT a FROM t WHERE b = 1"
+
+def test_literals_with_comment_markers_keep_distinct_keys():
+    assert canonical_sql("SELECT * FROM t WHERE name = 'a--b'") != canonical_sql("SELECT * FROM t WHERE name = 'a--zzz'")
+    assert canonical_sql("SELECT * FROM t WHERE name = 'x/*y*/z'") != canonical_sql("SELECT * FROM t WHERE name = 'x/*q*/z'")
+    assert canonical_sql('SELECT "a--b" FROM t') == 'SELECT "a--b" FROM t'
+
+def test_whitespace_inside_literals_is_kept():
+    assert canonical_sql("SELECT 'a   b'  FROM t") == "SELECT 'a   b' FROM t"
@@ -0,0 +1,29 @@
+import sqlite3
+import pytest
+from evaluation import self_consistency
+from evaluation.self_consistency import vote
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "users.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO users (name) VALUES (?)", [("a",), ("b",), ("c",)])
+    conn.commit()
+    conn.close()
+    return path
+
+def test_failing_candidates_do_not_take_part_in_the_vote(db_path):
+    candidates = ["SELECT nope FROM users", "SELECT 1; SELECT 2", "SELECT ?", "",
+                  "SELECT COUNT(*) FROM users", "SELECT count(id) FROM users", "SELECT MAX(id) + 1 FROM users"]
+    result = vote(candidates, db_path)
+    assert result["sql"] == "SELECT COUNT(*) FROM users"
+    assert result["votes"] == 2
+    assert result["fingerprints"][:4] == [None] * 4
+
+def test_unexpected_errors_are_not_swallowed(db_path, monkeypatch):
+    def broken(rows):
+        raise RuntimeError("fingerprint bug")
+    monkeypatch.setattr(self_consistency, "result_fingerprint", broken)
+    with pytest.raises(RuntimeError):
+        vote(["SELECT name FROM users WHERE id = 2"], db_path)
@@ -0,0 +1,98 @@
+"""
+A sharded evaluation of the sample workload, merged, must give the same results as a
+single-node run. The evaluators run as subprocesses, as they would on each machine.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from evaluation.sharding import merge_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "data")
+GOLD = os.path.join(DATA, "mini_dev_sqlite_gold.sql")
+DIFF = os.path.join(DATA, "mini_dev_difficulty.json")
+
+# One unknown column, one wrong answer, one correct rewrite; the rest match the gold SQL
+PREDICTIONS = {
+    1: "SELECT name, agee FROM users WHERE age > 18",
+    2: "SELECT COUNT(*) + 1 FROM orders",
+    5: "SELECT CASE WHEN age < 18 THEN 'Under 18' WHEN age <= 30 THEN '18-30' ELSE 'Over 30' END g, "
+       "COUNT(*) FROM users GROUP BY g",
+}
+
+@pytest.fixture(scope="module")
+def predicted_path(tmp_path_factory):
+    with open(GOLD, "r") as f:
+        gold = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+    predicted = {
+        str(i): f"{PREDICTIONS.get(i, sql)}\t----- bird -----\t{db_id}" for i, (sql, db_id) in enumerate(gold)
+    }
+    path = str(tmp_path_factory.mktemp("shards") / "predicted.json")
+    with open(path, "w") as f:
+        json.dump(predicted, f)
+    return path
+
+def evaluate(metric_module, predicted_path, tmp_path, *extra):
+    command = [
+        sys.executable, "-m", metric_module,
+        "--predicted_sql_path", predicted_path, "--ground_truth_path", GOLD,
+        "--db_root_path", os.path.join(DATA, "dev_databases") + "/", "--diff_json_path", DIFF,
+        "--num_cpus", "2", "--output_log_path", str(tmp_path / "log.txt"), *extra,
+    ]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+@pytest.mark.parametrize("metric_module,gold_store", [
+    ("evaluation.evaluation_ex", False),
+    ("evaluation.evaluation_ex", True),
+    ("evaluation.evaluation_f1", True),
+])
+def test_merged_shards_equal_a_single_node_run(predicted_path, tmp_path, metric_module, gold_store):
+    def run(shard):
+        k = shard.split("/")[0]
+        output = str(tmp_path / f"shard_{k}_of_{shard[-1]}.json")
+        extra = ["--shard", shard, "--shard_output", output]
+        if gold_store:
+            # Each shard gets its own store, as on separate machines
+            extra += ["--gold_store", str(tmp_path / f"store_{k}_of_{shard[-1]}")]
+        evaluate(metric_module, predicted_path, tmp_path, *extra)
+        return load(output)
+
+    _, single = merge_results([run("1/1")], DIFF)
+    shard_files = [run("1/2"), run("2/2")]
+    assert all(shard_file["results"] for shard_file in shard_files)
+    _, merged = merge_results(shard_files, DIFF)
+    assert merged == single
+    assert [result["res"] for result in single] != [1] * len(single)
+
+    if gold_store:
+        # A shard's store only holds its own gold results
+        from evaluation.gold_store import open_gold_store
+        store = open_gold_store(str(tmp_path / "store_1_of_2"))
+        held = {i for i in range(len(store)) if store.get(i) is not None}
+        # The difficulty file has no question_id, so results are keyed by position
+        assert held == {int(result["question_id"]) for result in shard_files[0]["results"]}
+        assert 0 < len(held) < len(store)
+
+def test_merge_prints_the_single_node_table(predicted_path, tmp_path):
+    table = [line for line in evaluate("evaluation.evaluation_ex", predicted_path, tmp_path).splitlines()
+             if line.startswith("EX ")]
+    paths = []
+    for k in (1, 2, 3):
+        path = str(tmp_path / f"ex_{k}.json")
+        evaluate("evaluation.evaluation_ex", predicted_path, tmp_path, "--shard", f"{k}/3", "--shard_output", path)
+        paths.append(path)
+    merged = subprocess.run(
+        [sys.executable, "-m", "evaluation.sharding", "merge", *paths, "--diff_json_path", DIFF],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    assert merged.returncode == 0, merged.stderr
+    assert table and [line for line in merged.stdout.splitlines() if line.startswith("EX ")] == table
@@ -0,0 +1,110 @@
+"""
+lint_sql must only report errors the database would certainly raise: every query in
+VALID runs on SQLite and must lint clean, every query in INVALID fails on SQLite and
+must be reported.
+"""
+
+import sqlite3
+import pytest
+from evaluation.sql_lint import lint_sql
+
+# A cut-down BIRD financial schema
+SCHEMA = """
+CREATE TABLE district (district_id INTEGER PRIMARY KEY, A2 TEXT, A3 TEXT, A11 INTEGER);
+CREATE TABLE account (account_id INTEGER PRIMARY KEY, district_id INTEGER REFERENCES district,
+                      frequency TEXT, date DATE);
+CREATE TABLE client (client_id INTEGER PRIMARY KEY, gender TEXT, birth_date DATE,
+                     district_id INTEGER REFERENCES district);
+CREATE TABLE disp (disp_id INTEGER PRIMARY KEY, client_id INTEGER REFERENCES client,
+                   account_id INTEGER REFERENCES account, type TEXT);
+CREATE TABLE loan (loan_id INTEGER PRIMARY KEY, account_id INTEGER REFERENCES account, date DATE,
+                   amount INTEGER, duration INTEGER, payments REAL, status TEXT);
+CREATE TABLE trans (trans_id INTEGER PRIMARY KEY, account_id INTEGER REFERENCES account, date DATE,
+                    type TEXT, amount INTEGER, balance INTEGER);
+CREATE VIEW big_loans AS SELECT * FROM loan WHERE amount > 100000;
+"""
+
+VALID = [
+    # Derived tables, with and without an alias
+    "SELECT account_id FROM (SELECT account_id, SUM(amount) AS s FROM trans GROUP BY account_id) ORDER BY s DESC LIMIT 1",
+    "SELECT t.account_id, t.s FROM (SELECT account_id, SUM(amount) AS s FROM trans GROUP BY account_id) AS t WHERE t.s > 10",
+    "SELECT s FROM (SELECT SUM(amount) s FROM trans) t",
+    "SELECT a.account_id FROM account a JOIN (SELECT account_id, COUNT(*) n FROM loan GROUP BY account_id) l "
+    "ON a.account_id = l.account_id WHERE n > 1",
+    "SELECT * FROM (SELECT * FROM (SELECT account_id FROM loan)) WHERE account_id > 2",
+    # Bare column aliases after CASE ... END and function calls
+    "SELECT CASE WHEN gender='F' THEN 'w' ELSE 'm' END g, COUNT(*) FROM client GROUP BY g",
+    "SELECT CASE WHEN amount > 1000 THEN 1 ELSE 0 END big FROM loan ORDER BY big",
+    "SELECT COUNT(*) cnt, district_id FROM client GROUP BY district_id ORDER BY cnt DESC",
+    "SELECT CAST(SUM(CASE WHEN gender = 'F' THEN 1 ELSE 0 END) AS REAL) * 100 / COUNT(client_id) FROM client",
+    # Quoted aliases, which SQLite accepts in double or single quotes
+    'SELECT gender AS "g" FROM client ORDER BY g',
+    "SELECT gender AS 'g' FROM client ORDER BY g",
+    'SELECT COUNT(*) "n", district_id FROM client GROUP BY district_id ORDER BY n',
+    'SELECT c.gender FROM client AS "c"',
+    "SELECT c.gender FROM client 'c' WHERE c.client_id > 1",
+    'SELECT "c".gender FROM client "c"',
+    # Joins, aliases and USING
+    "SELECT T1.client_id FROM client AS T1 INNER JOIN disp AS T2 ON T1.client_id = T2.client_id "
+    "WHERE T2.type = 'OWNER'",
+    "SELECT T2.A2, COUNT(T1.client_id) FROM client AS T1 INNER JOIN district AS T2 "
+    "ON T1.district_id = T2.district_id GROUP BY T2.A2",
+    "SELECT account_id FROM account JOIN loan USING (account_id) WHERE status = 'A'",
+    "SELECT district_id FROM account NATURAL JOIN district",
+    "SELECT T1.account_id FROM account T1, loan T2 WHERE T1.account_id = T2.account_id",
+    # Subqueries and CTEs
+    "SELECT account_id FROM loan WHERE amount = (SELECT MAX(amount) FROM loan)",
+    "SELECT client_id FROM client c WHERE EXISTS (SELECT 1 FROM disp d WHERE d.client_id = c.client_id)",
+    "SELECT account_id FROM account WHERE district_id IN (SELECT district_id FROM district WHERE A3 = 'x')",
+    "WITH totals AS (SELECT account_id, SUM(amount) AS total FROM trans GROUP BY account_id) "
+    "SELECT account_id FROM totals WHERE total > 100",
+    "WITH t(a) AS (SELECT 1) SELECT a FROM t",
+    # Compound selects, window functions, dates and literals
+    "SELECT account_id FROM loan UNION SELECT account_id FROM trans ORDER BY account_id",
+    "SELECT account_id, RANK() OVER (PARTITION BY district_id ORDER BY date) r FROM account",
+    "SELECT STRFTIME('%Y', date) yr, COUNT(*) FROM account GROUP BY yr",
+    "SELECT IIF(amount > 1000, 'big', 'small') FROM loan",
+    "SELECT amount FROM trans WHERE type = 'VYDAJ' -- withdrawals\n AND balance < 0",
+    "SELECT /* inline */ `amount` FROM [trans] WHERE \"type\" = 'PRIJEM';",
+    "SELECT amount FROM big_loans",
+    "SELECT rowid FROM loan LIMIT 1 OFFSET 2",
+    "SELECT COUNT(DISTINCT T1.account_id) FROM trans AS T1 WHERE T1.date BETWEEN '1995-01-01' AND '1995-12-31'",
+]
+
+INVALID = [
+    ("SELECT name FROM client", "no such column: name"),
+    ("SELECT * FROM clients", "no such table: clients"),
+    ("SELECT T1.amount FROM client T1", "no such column: T1.amount"),
+    ("SELECT district_id FROM client JOIN account ON client.district_id = account.district_id",
+     "ambiguous column name: district_id"),
+    ("SELECT s FROM (SELECT SUM(amount) s FROM trans) t WHERE t.x = 1 AND missing_table.y = 2",
+     "no such column: missing_table.y"),
+    ('SELECT "c".amount FROM client AS "c"', "no such column: c.amount"),
+]
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("lint") / "financial.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.close()
+    return path
+
+@pytest.mark.parametrize("sql", VALID)
+def test_valid_query_lints_clean(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    assert lint_sql(sql, db_path) == []
+
+@pytest.mark.parametrize("sql,issue", INVALID)
+def test_invalid_query_is_reported(db_path, sql, issue):
+    conn = sqlite3.connect(db_path)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    assert issue in lint_sql(sql, db_path)
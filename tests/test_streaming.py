@@ -0,0 +1,49 @@
+import pytest
+from evaluation.streaming import SQLStreamDetector
+
+def stream(text, size):
+    """Feed text in chunks of size; (sql, whether feed reported it before the stream ended)."""
+    detector = SQLStreamDetector()
+    for i in range(0, len(text), size):
+        sql = detector.feed(text[i:i + size])
+        if sql is not None:
+            return sql, True
+    return detector.finish(), False
+
+CHUNK_SIZES = [1, 3, 7, 4096]
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_fenced_query_wins_over_prose_before_it(size):
+    text = "With the users table we can count rows.\n```sql\nSELECT COUNT(*) FROM users;\n```\nDone."
+    assert stream(text, size) == ("SELECT COUNT(*) FROM users", True)
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_fence_without_semicolon_ends_at_closing_fence(size):
+    text = "Select the rows you need:\n```sql\nSELECT name\nFROM users WHERE id = 1\n```\nThis picks one user."
+    assert stream(text, size) == ("SELECT name\nFROM users WHERE id = 1", True)
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_plain_answer_stops_at_semicolon_outside_literals(size):
+    text = "SELECT name, id FROM users WHERE name = 'a;b' AND (id > 1);\nThis query returns..."
+    assert stream(text, size) == ("SELECT name, id FROM users WHERE name = 'a;b' AND (id > 1)", True)
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_inline_answer_after_colon(size):
+    text = "The query is: SELECT COUNT(*) FROM users; it counts every user."
+    assert stream(text, size) == ("SELECT COUNT(*) FROM users", True)
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_cte_is_one_statement(size):
+    text = "WITH t AS (SELECT 1 AS x; ) SELECT x FROM t;\nExplanation follows."
+    assert stream(text, size) == ("WITH t AS (SELECT 1 AS x; ) SELECT x FROM t", True)
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_prose_alone_is_not_taken_for_sql(size):
+    text = "Select the newest rows first. With that in mind, order by date."
+    detector = SQLStreamDetector()
+    for i in range(0, len(text), size):
+        assert detector.feed(text[i:i + size]) is None
+    assert detector.start is None
+
+def test_unterminated_query_is_returned_by_finish():
+    assert stream("Here you go:\n\nSELECT *\nFROM users", 5) == ("SELECT *\nFROM users", False)
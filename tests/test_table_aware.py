@@ -0,0 +1,52 @@
+import re
+import pytest
+from evaluation.table_aware import TableMatcher, parse_schema
+
+SCHEMA = """Table: orders
+Columns: id INTEGER PRIMARY KEY, user_id INTEGER, amount REAL
+Table: order
+Columns: id INTEGER
+Table: users
+Columns: id INTEGER PRIMARY KEY, name TEXT
+Sample data:
+  (1, 'a')"""
+
+def naive(names, text):
+    """Whole-identifier, case-insensitive matches ordered by where they end, one regex per name."""
+    hits = []
+    for name in names:
+        match = re.search(rf"(?<![A-Za-z0-9_]){re.escape(name)}(?![A-Za-z0-9_])", text, re.IGNORECASE)
+        if match:
+            hits.append((match.start() + len(name), name))
+    return [name for _, name in sorted(hits)]
+
+def test_only_whole_identifiers_match():
+    matcher = TableMatcher(["order", "orders", "users"])
+    assert matcher.find("SELECT * FROM border JOIN users_archive") == []
+    assert matcher.find("SELECT * FROM Orders o JOIN USERS u") == ["orders", "users"]
+    assert matcher.find("order;") == ["order"]
+
+def test_overlapping_names_are_all_reported():
+    # 'b_c' ends inside 'a_b_c', which a failure link must still report
+    matcher = TableMatcher(["a_b_c", "b_c", "c"])
+    assert matcher.find("x a_b_c y") == ["a_b_c"]
+    assert matcher.find("b_c, a_b_c and c") == ["b_c", "a_b_c", "c"]
+
+@pytest.mark.parametrize("text", [
+    "List the names of users with more than 3 orders",
+    "how many ORDER rows? order.id, orders.amount",
+    "userss and _users and users_ and users",
+    "",
+])
+def test_matches_agree_with_a_regex_per_name(text):
+    names = ["orders", "order", "users", "user", "s"]
+    assert TableMatcher(names).find(text) == naive(names, text)
+
+def test_parsed_schema_is_cached_and_finds_its_tables():
+    schema = parse_schema(SCHEMA)
+    assert parse_schema(SCHEMA) is schema
+    assert list(schema.tables) == ["orders", "order", "users"]
+    assert schema.tables["orders"].column_names() == ["id", "user_id", "amount"]
+    assert schema.tables["users"].columns[0].primary_key
+    assert schema.tables["users"].sample_data == ("(1, 'a')",)
+    assert schema.tables_in("SELECT name FROM users JOIN orders ON orders.user_id = users.id") == ["users", "orders"]
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+import pytest
+from evaluation import tracing
+
+class FakeAgent:
+    """Stands in for an autogen agent: generate_reply makes one LLM request through client."""
+
+    def __init__(self, name):
+        self.name = name
+        self.client = SimpleNamespace(create=lambda **config: SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3)))
+
+    def generate_reply(self, messages=None, sender=None, **kwargs):
+        self.client.create(messages=messages)
+        return "SELECT 1"
+
+@pytest.fixture
+def enabled():
+    tracing.drain()
+    tracing.enable()
+    yield
+    tracing.disable()
+    tracing.drain()
+
+def test_every_reply_and_llm_request_gets_a_span(enabled):
+    analyzer, proxy = FakeAgent("SchemaAnalyzer"), FakeAgent("UserProxy")
+    tracing.trace_agent(analyzer)
+    assert analyzer.generate_reply(messages=[{"content": "q"}], sender=proxy) == "SELECT 1"
+    spans = {span["name"]: span for span in tracing.drain()}
+    assert spans["agent.reply"]["attrs"] == {"agent": "SchemaAnalyzer", "sender": "UserProxy", "messages": 1}
+    assert spans["llm.request"]["attrs"] == {"agent": "SchemaAnalyzer", "prompt_tokens": 12, "completion_tokens": 3}
+    assert spans["llm.request"]["parent_id"] == spans["agent.reply"]["span_id"]
+
+def test_traced_agents_record_nothing_while_disabled():
+    tracing.drain()
+    agent = FakeAgent("QueryGenerator")
+    tracing.trace_agent(agent)
+    agent.generate_reply(messages=[])
+    assert tracing.drain() == []